@@ -0,0 +1,281 @@
+# 02_Modeling_Code/Benchmark.py
+
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+from Walker_Constellation import write_walker_tle
+
+# --- BỘ BENCHMARK HIỆU NĂNG (OFFLINE, CHÒM SAO WALKER TỔNG HỢP) ---
+# Mỗi trường hợp (N vệ tinh x số bước thời gian) chạy trong một tiến trình riêng (spawn) để đo bộ nhớ
+# đỉnh (peak RSS) độc lập; kết quả ghi ra JSON để so sánh hồi quy giữa các commit (--compare).
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_DIR = os.path.join(BASE_DIR, '03_Scenarios')
+BENCHMARK_OUTPUT_DIR = os.path.join(BASE_DIR, '04_Output_Dataset', 'benchmarks')
+DEFAULT_CONFIG = os.path.join(SCENARIOS_DIR, 'Starlink_V1_Normal.yaml')
+
+DEFAULT_SIZES = [500, 1000, 2000, 5000, 10000]  # Số vệ tinh N
+DEFAULT_STEPS = [10]                            # Số snapshot mỗi trường hợp
+BENCHMARK_FORMAT_VERSION = 1
+BENCHMARK_SCENARIO = 'Benchmark_Walker'
+
+def _peak_rss_mb() -> float:
+    """Bộ nhớ đỉnh (RSS) của tiến trình hiện tại (MB). ru_maxrss tính bằng KB trên Linux, byte trên macOS."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+@contextlib.contextmanager
+def _quiet(enabled=True):
+    """Tắt các dòng print của pipeline trong lúc đo (chúng làm sai lệch thời gian ở N lớn)."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def _scenario_overrides(config, tle_file, n_steps, output_dir):
+    """Ghi đè kịch bản: dùng file TLE tổng hợp, toàn bộ vệ tinh, đúng n_steps snapshot, ghi vào thư mục tạm."""
+    return {
+        'SCENARIO_NAME': BENCHMARK_SCENARIO,
+        'TLE_FILE': tle_file,
+        'SUBSET_SIZE': 10 ** 9,
+        'DURATION_MINUTES': (n_steps - 1) * config['TIME_STEP_SECONDS'] / 60.0,
+        'OUTPUT_DIR': output_dir,
+        'EXPORT_GEXF': False,
+        'TOPOLOGY_MODE': 'FULL',
+    }
+
+def _time_stages(config_path, tle_file, n_steps, work_dir):
+    """
+    Đo riêng từng tầng: tải Propagator (lần đầu / qua bộ đệm TLE), lan truyền theo lô,
+    LinkModel.create_dynamic_graph và ghi dataset. Chạy trong tiến trình con.
+    """
+    import yaml
+    from Propagator import SatellitePropagator
+    from Link_Model import LinkModel, ISL_ASSIGNMENT_FORWARD
+    from Graph_Dataset import GraphDatasetWriter
+
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    start_time = datetime.fromisoformat(config['START_TIME'].replace('Z', '+00:00'))
+    times = [start_time + timedelta(seconds=k * config['TIME_STEP_SECONDS']) for k in range(n_steps)]
+    cache_dir = os.path.join(work_dir, 'tle_cache')
+    result = {}
+
+    # 1. Tải Propagator: phân tích TLE (bộ đệm trống) rồi nạp lại qua bộ đệm
+    t0 = time.perf_counter()
+    propagator = SatellitePropagator(tle_file, cache_dir=cache_dir)
+    result['propagator_load_cold_s'] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    propagator = SatellitePropagator(tle_file, cache_dir=cache_dir)
+    result['propagator_load_cached_s'] = time.perf_counter() - t0
+
+    # 2. Lan truyền theo lô cho toàn bộ lưới thời gian
+    t0 = time.perf_counter()
+    pos_batch, errors = propagator.propagate_batch(times)
+    result['propagation_s'] = time.perf_counter() - t0
+    result['propagation_failures'] = int(np.count_nonzero(errors))
+
+    # 3. Tạo đồ thị ISL từng snapshot (đầu vào dạng dict như get_all_positions)
+    link_model = LinkModel(
+        is_multi_objective=(config['OBJECTIVE'] == 'MULTI'),
+        max_isl_distance_km=config['MAX_ISL_DISTANCE_KM'],
+        max_isl_per_sat=config['MAX_ISL_PER_SAT'],
+        isl_assignment=config.get('ISL_ASSIGNMENT', ISL_ASSIGNMENT_FORWARD),
+    )
+    names = propagator.sat_names
+    graph_time, n_edges = 0.0, 0
+    for k in range(n_steps):
+        positions = {int(sat_id): {'name': name, 'pos_km': pos_batch[s, k]}
+                     for s, (sat_id, name) in enumerate(zip(propagator.sat_ids, names)) if errors[s, k] == 0}
+        t0 = time.perf_counter()
+        G_t = link_model.create_dynamic_graph(positions)
+        graph_time += time.perf_counter() - t0
+        n_edges += G_t.number_of_edges()
+    result['create_dynamic_graph_s'] = graph_time
+    result['edges_per_snapshot'] = n_edges / n_steps
+
+    # 4. Ghi dataset nhị phân (không qua luồng nền để đo riêng chi phí serialization)
+    edges = [link_model.compute_isl_edges(pos_batch[:, k]) for k in range(n_steps)]
+    t0 = time.perf_counter()
+    with GraphDatasetWriter(os.path.join(work_dir, 'serialization'), propagator.sat_ids) as writer:
+        for k, (i, j, distance) in enumerate(edges):
+            writer.append(times[k], pos_batch[:, k], i, j, link_model.calculate_delay(distance), distance)
+    result['serialization_s'] = time.perf_counter() - t0
+    result['n_satellites'] = propagator.n_satellites
+    return result
+
+def _time_end_to_end(config_path, tle_file, n_steps, work_dir, workers):
+    """Đo DynamicGraphGenerator.generate_graphs từ đầu đến cuối (gồm khởi tạo). Chạy trong tiến trình con."""
+    import yaml
+    from Graph_Generator import DynamicGraphGenerator
+
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    overrides = _scenario_overrides(config, tle_file, n_steps, os.path.join(work_dir, 'end_to_end'))
+    overrides['PARALLEL_WORKERS'] = workers
+    t0 = time.perf_counter()
+    generator = DynamicGraphGenerator(config_path, overrides)
+    init_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    graphs = generator.generate_graphs()
+    return {
+        'generator_init_s': init_time,
+        'generate_graphs_s': time.perf_counter() - t0,
+        'n_snapshots': len(graphs),
+        'edges_per_snapshot': float(np.mean([G.number_of_edges() for G in graphs])) if graphs else 0.0,
+    }
+
+def _run_isolated(target, *args, quiet=True):
+    """Gọi target(*args) trong tiến trình con mới; trả về (kết quả, peak RSS MB của tiến trình con)."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_isolated_call, target, args, quiet).result()
+
+def _isolated_call(target, args, quiet):
+    with _quiet(quiet):
+        result = target(*args)
+    return result, _peak_rss_mb()
+
+def run_case(config_path, n_satellites, n_steps, workers=1, quiet=True):
+    """Một trường hợp benchmark: sinh chòm sao Walker N vệ tinh, đo từng tầng và toàn pipeline."""
+    import yaml
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    epoch = datetime.fromisoformat(config['START_TIME'].replace('Z', '+00:00'))
+
+    with tempfile.TemporaryDirectory(prefix='ntn_benchmark_') as work_dir:
+        tle_file = os.path.join(work_dir, f"WALKER_{n_satellites}.txt")
+        write_walker_tle(tle_file, n_satellites, epoch)
+        stages, stages_rss = _run_isolated(_time_stages, config_path, tle_file, n_steps, work_dir, quiet=quiet)
+        end_to_end, end_to_end_rss = _run_isolated(_time_end_to_end, config_path, tle_file, n_steps, work_dir,
+                                                   workers, quiet=quiet)
+
+    n_snapshots = end_to_end['n_snapshots']
+    total_s = end_to_end['generator_init_s'] + end_to_end['generate_graphs_s']
+    return {
+        'requested_satellites': n_satellites,
+        'n_satellites': stages['n_satellites'],
+        'n_steps': n_steps,
+        'n_snapshots': n_snapshots,
+        'workers': workers,
+        'stages': stages,
+        'end_to_end': end_to_end,
+        'time_per_snapshot_s': {
+            'propagation': stages['propagation_s'] / n_steps,
+            'create_dynamic_graph': stages['create_dynamic_graph_s'] / n_steps,
+            'serialization': stages['serialization_s'] / n_steps,
+            'generate_graphs': end_to_end['generate_graphs_s'] / max(n_snapshots, 1),
+        },
+        'throughput': {
+            'snapshots_per_s': n_snapshots / total_s if total_s > 0 else None,
+            'satellite_steps_per_s': stages['n_satellites'] * n_snapshots / total_s if total_s > 0 else None,
+        },
+        'peak_rss_mb': {'stages': stages_rss, 'end_to_end': end_to_end_rss},
+    }
+
+def _git_commit():
+    """Commit hiện tại của repo (None nếu không có git)."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment_metadata():
+    """Thông tin môi trường chạy, lưu kèm kết quả để so sánh giữa các máy/commit."""
+    import scipy
+    import networkx
+    import sgp4
+    return {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': {'numpy': np.__version__, 'scipy': scipy.__version__,
+                     'networkx': networkx.__version__, 'sgp4': sgp4.__version__},
+    }
+
+def _ratio(value, base_value):
+    """Tỉ lệ value / base_value; None nếu một trong hai thiếu hoặc baseline bằng 0."""
+    return value / base_value if value is not None and base_value else None
+
+def _format_ratio(ratio):
+    return f"x{ratio:.2f}" if ratio is not None else "n/a"
+
+def compare_results(current, baseline):
+    """Tỉ lệ (hiện tại / baseline) của thời gian mỗi snapshot, thông lượng và bộ nhớ đỉnh cho các trường hợp trùng (N, bước)."""
+    base_cases = {(case['requested_satellites'], case['n_steps']): case for case in baseline['cases']}
+    rows = []
+    for case in current['cases']:
+        base = base_cases.get((case['requested_satellites'], case['n_steps']))
+        if base is None:
+            continue
+        row = {'requested_satellites': case['requested_satellites'], 'n_steps': case['n_steps']}
+        for stage, value in case['time_per_snapshot_s'].items():
+            row[f"{stage}_ratio"] = _ratio(value, base['time_per_snapshot_s'].get(stage))
+        for metric, value in case['throughput'].items():
+            row[f"{metric}_ratio"] = _ratio(value, base['throughput'].get(metric))
+        for part, value in case['peak_rss_mb'].items():
+            row[f"peak_rss_{part}_ratio"] = _ratio(value, base['peak_rss_mb'].get(part))
+        rows.append(row)
+    return {'baseline_commit': baseline['metadata'].get('git_commit'), 'cases': rows}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline tạo đồ thị động NTN trên chòm sao Walker tổng hợp.")
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help="Kịch bản YAML cơ sở (thời gian, ràng buộc liên kết, trạm mặt đất)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Danh sách số vệ tinh N")
+    parser.add_argument('--steps', type=int, nargs='+', default=DEFAULT_STEPS, help="Danh sách số snapshot")
+    parser.add_argument('--workers', type=int, default=1, help="PARALLEL_WORKERS cho phép đo end-to-end")
+    parser.add_argument('--output', default=None, help="File JSON kết quả (mặc định trong 04_Output_Dataset/benchmarks)")
+    parser.add_argument('--compare', default=None, help="File JSON kết quả cũ để so sánh hồi quy")
+    parser.add_argument('--verbose', action='store_true', help="Không ẩn các dòng print của pipeline")
+    return parser.parse_args()
+
+def main_benchmark():
+    args = parse_args()
+    results = {'metadata': environment_metadata(), 'config': os.path.abspath(args.config), 'cases': []}
+
+    for n_steps in args.steps:
+        for n_satellites in args.sizes:
+            print(f"Benchmark: N = {n_satellites}, {n_steps} snapshot...")
+            case = run_case(args.config, n_satellites, n_steps, args.workers, quiet=not args.verbose)
+            results['cases'].append(case)
+            per_snapshot = case['time_per_snapshot_s']
+            print(f"  lan truyền {per_snapshot['propagation'] * 1000:.1f} ms, "
+                  f"create_dynamic_graph {per_snapshot['create_dynamic_graph'] * 1000:.1f} ms, "
+                  f"ghi {per_snapshot['serialization'] * 1000:.1f} ms, "
+                  f"end-to-end {per_snapshot['generate_graphs'] * 1000:.1f} ms / snapshot; "
+                  f"RSS đỉnh {case['peak_rss_mb']['end_to_end']:.0f} MB")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            results['comparison'] = compare_results(results, json.load(f))
+        for row in results['comparison']['cases']:
+            print(f"So với baseline (N = {row['requested_satellites']}, {row['n_steps']} snapshot): "
+                  f"thời gian end-to-end mỗi snapshot {_format_ratio(row['generate_graphs_ratio'])}, "
+                  f"thông lượng {_format_ratio(row['snapshots_per_s_ratio'])}, "
+                  f"RSS {_format_ratio(row['peak_rss_end_to_end_ratio'])}")
+
+    output = args.output or os.path.join(
+        BENCHMARK_OUTPUT_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Kết quả benchmark lưu tại: {output}")
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,380 @@
+# 02_Modeling_Code/Contact_Plan.py
+
+import csv
+import math
+from datetime import datetime, timedelta
+import numpy as np
+
+from Propagator import C_LIGHT, R_EARTH
+from Link_Model import LinkModel
+from Graph_Snapshot import EDGE_TYPES, EDGE_ISL, EDGE_GSL
+from Spatial_Index import find_pairs_kdtree
+from Ground_Station import compute_visibility
+from Position_Interpolator import InterpolatingPropagator, hermite_coefficients
+
+# --- THAM SỐ MẶC ĐỊNH CỦA BỘ TÍNH CONTACT PLAN ---
+DEFAULT_SCREEN_STEP_S = 30.0   # Bước sàng lọc thô (giây), cũng là bước neo của quỹ đạo nội suy
+ROOT_TOLERANCE_S = 1e-3        # Độ chính xác thời điểm bắt đầu/kết thúc liên kết (giây)
+SUBSAMPLES = 16                # Số đoạn con mỗi bước sàng lọc khi dò đổi dấu
+GOLDEN_ITERATIONS = 30         # Số vòng tìm kiếm tỉ lệ vàng cho cực tiểu giữa hai mẫu (liên kết rất ngắn)
+WINDOW_INTERVALS = 32          # Số bước sàng lọc mỗi cửa sổ tính vị trí neo (giới hạn bộ nhớ)
+MIN_SCREEN_ALTITUDE_KM = 100.0  # Độ cao tối thiểu dùng để ước lượng tốc độ thay đổi góc nâng (GSL)
+
+GOLDEN_RATIO = (math.sqrt(5.0) - 1.0) / 2.0
+
+class ContactPlan:
+    """
+    Bảng contact plan: mỗi dòng là một khoảng thời gian liên kết tồn tại liên tục giữa hai node
+    (kiểu liên kết, t_start, t_end tính theo giây kể từ start_time, độ trễ nhỏ nhất/lớn nhất trong khoảng).
+    Liên kết đang tồn tại ở đầu/cuối khung thời gian được cắt tại mốc đó.
+    """
+    COLUMNS = ['src', 'dst', 'link_type', 't_start_s', 't_end_s', 'min_delay_s', 'max_delay_s']
+
+    def __init__(self, start_time: datetime, src, dst, link_type, t_start_s, t_end_s, min_delay_s, max_delay_s):
+        self.start_time = start_time
+        order = np.lexsort((np.asarray(dst), np.asarray(src), np.asarray(t_start_s)))
+        self.src = np.asarray(src, dtype=np.int64)[order]
+        self.dst = np.asarray(dst, dtype=np.int64)[order]
+        self.link_type = np.asarray(link_type, dtype=np.uint8)[order]
+        self.t_start_s = np.asarray(t_start_s, dtype=np.float64)[order]
+        self.t_end_s = np.asarray(t_end_s, dtype=np.float64)[order]
+        self.min_delay_s = np.asarray(min_delay_s, dtype=np.float64)[order]
+        self.max_delay_s = np.asarray(max_delay_s, dtype=np.float64)[order]
+
+    def __len__(self):
+        return len(self.src)
+
+    def active_at(self, t_s: float) -> np.ndarray:
+        """Chỉ số các liên kết tồn tại tại thời điểm t_s (giây kể từ start_time)."""
+        return np.flatnonzero((self.t_start_s <= t_s) & (self.t_end_s >= t_s))
+
+    def save(self, filepath):
+        """Lưu bảng dạng cột nén (.npz)."""
+        np.savez_compressed(filepath, start_time=np.array(self.start_time.isoformat()),
+                            **{name: getattr(self, name) for name in self.COLUMNS})
+
+    @classmethod
+    def load(cls, filepath):
+        with np.load(filepath) as data:
+            return cls(datetime.fromisoformat(str(data['start_time'])), *(data[name] for name in cls.COLUMNS))
+
+    def to_csv(self, filepath):
+        """Xuất bảng ra CSV (thời gian dạng giây kể từ start_time, kiểu liên kết dạng chữ)."""
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.COLUMNS)
+            for row in zip(self.src, self.dst, self.link_type, self.t_start_s, self.t_end_s,
+                           self.min_delay_s, self.max_delay_s):
+                writer.writerow([int(row[0]), int(row[1]), EDGE_TYPES[row[2]]] + [f"{v:.6f}" for v in row[3:5]]
+                                + [f"{v:.9f}" for v in row[5:]])
+
+    def to_ion(self, filepath, data_rate_bytes_s: int):
+        """
+        Xuất theo định dạng contact plan của ION (DTN): mỗi liên kết hai chiều sinh hai lệnh
+        'a contact' và hai lệnh 'a range' (độ trễ một chiều làm tròn lên theo giây).
+        Số hiệu node ION phải dương: vệ tinh dùng ID NORAD, trạm mặt đất ID -k dùng 1000000 + k.
+        """
+        def ion_node(node_id):
+            return int(node_id) if node_id > 0 else 1000000 - int(node_id)
+        with open(filepath, 'w') as f:
+            f.write(f"# Contact plan, start_time = {self.start_time.isoformat()}\n")
+            for a, b, t0, t1, delay in zip(self.src, self.dst, self.t_start_s, self.t_end_s, self.max_delay_s):
+                start, end, owlt = int(math.floor(t0)), int(math.ceil(t1)), max(1, int(math.ceil(delay)))
+                for u, v in ((ion_node(a), ion_node(b)), (ion_node(b), ion_node(a))):
+                    f.write(f"a contact +{start} +{end} {u} {v} {int(data_rate_bytes_s)}\n")
+                    f.write(f"a range +{start} +{end} {u} {v} {owlt}\n")
+
+class _ContactTracker:
+    """
+    Theo dõi các liên kết đang mở của một loại liên kết (ISL hoặc GSL) qua các bước sàng lọc.
+    Mỗi cặp được mã hóa bằng một số nguyên int64; trạng thái liên kết mở lưu dạng mảng đã sắp xếp theo mã.
+    """
+
+    def __init__(self):
+        self.open_codes = np.empty(0, dtype=np.int64)
+        self.open_start = np.empty(0)
+        self.open_dmin = np.empty(0)
+        self.open_dmax = np.empty(0)
+        self.closed = []  # Danh sách (codes, start, end, dmin, dmax)
+
+    def _close(self, codes, start, end, dmin, dmax):
+        if len(codes):
+            self.closed.append((codes, start, np.broadcast_to(end, codes.shape).astype(np.float64), dmin, dmax))
+
+    def interval(self, codes, t0, h, evaluate):
+        """
+        Xử lý một bước sàng lọc [t0, t0 + h] cho các cặp ứng viên codes (đã sắp xếp).
+        evaluate(rows, s) -> (g, d): hàm ràng buộc g (<= 0 nghĩa là liên kết tồn tại) và khoảng cách d (km)
+        tại thời gian chuẩn hóa s (mảng (len(rows), K) hoặc (K,)) cho các cặp codes[rows].
+        """
+        n_pairs = len(codes)
+        s_grid = np.linspace(0.0, 1.0, SUBSAMPLES + 1)
+        g, d = evaluate(np.arange(n_pairs), s_grid)
+        inside = g <= 0.0
+
+        # 1. Đồng bộ với trạng thái mở ở đầu bước (các liên kết mở nhưng không còn là ứng viên bị đóng tại t0)
+        is_open = np.isin(codes, self.open_codes, assume_unique=True)
+        stale = ~np.isin(self.open_codes, codes[inside[:, 0]], assume_unique=True)
+        self._close(self.open_codes[stale], self.open_start[stale], t0, self.open_dmin[stale], self.open_dmax[stale])
+        keep = ~stale
+        self.open_codes, self.open_start = self.open_codes[keep], self.open_start[keep]
+        self.open_dmin, self.open_dmax = self.open_dmin[keep], self.open_dmax[keep]
+        fresh = inside[:, 0] & ~is_open
+        if np.any(fresh):
+            self._push(codes[fresh], np.full(int(fresh.sum()), t0), d[fresh, 0], d[fresh, 0])
+
+        # 2. Cặp nằm trong suốt bước: chỉ cập nhật khoảng cách nhỏ nhất/lớn nhất (vector hóa)
+        changes = inside[:, 1:] != inside[:, :-1]
+        has_change = changes.any(axis=1)
+        steady = inside.all(axis=1)
+        if np.any(steady):
+            pos = np.searchsorted(self.open_codes, codes[steady])
+            np.minimum.at(self.open_dmin, pos, d[steady].min(axis=1))
+            np.maximum.at(self.open_dmax, pos, d[steady].max(axis=1))
+
+        # 3. Liên kết rất ngắn nằm gọn giữa hai mẫu: tìm cực tiểu của g quanh mẫu nhỏ nhất
+        dip_rows = np.flatnonzero(~inside.any(axis=1))
+        dip_rows, dip_s = self._find_dips(dip_rows, g, evaluate)
+
+        # 4. Thời điểm đổi trạng thái chính xác bằng chia đôi (vector hóa trên mọi sự kiện)
+        rows, seg = np.nonzero(changes)
+        lo, hi = s_grid[seg], s_grid[seg + 1]
+        ev_rows = [rows, dip_rows, dip_rows]
+        # Liên kết ngắn nằm gọn giữa hai mẫu kề nhau bao quanh cực tiểu -> hai sự kiện: vào và ra
+        ev_lo = [lo, np.floor(dip_s * SUBSAMPLES) / SUBSAMPLES, dip_s]
+        ev_hi = [hi, dip_s, np.ceil(dip_s * SUBSAMPLES) / SUBSAMPLES]
+        ev_rows, ev_lo, ev_hi = (np.concatenate(x) for x in (ev_rows, ev_lo, ev_hi))
+        ev_s = self._bisect(ev_rows, ev_lo, ev_hi, evaluate, h)
+        ev_enter = ~(evaluate(ev_rows, ev_lo[:, None])[0][:, 0] <= 0.0) if len(ev_rows) else np.empty(0, dtype=bool)
+        ev_d = evaluate(ev_rows, ev_s[:, None])[1][:, 0] if len(ev_rows) else np.empty(0)
+        dip_d = evaluate(dip_rows, dip_s[:, None])[1][:, 0] if len(dip_rows) else np.empty(0)
+
+        # 5. Ghép sự kiện theo thứ tự thời gian cho từng cặp có đổi trạng thái (số lượng nhỏ)
+        event_rows = np.union1d(np.flatnonzero(has_change), dip_rows)
+        if len(event_rows):
+            self._replay(codes, event_rows, t0, h, s_grid, inside, d, ev_rows, ev_s, ev_enter, ev_d, dip_rows, dip_s, dip_d)
+
+    def _push(self, codes, start, dmin, dmax):
+        """Thêm các liên kết mở mới (giữ mảng sắp xếp theo mã)."""
+        all_codes = np.concatenate([self.open_codes, codes])
+        order = np.argsort(all_codes, kind='stable')
+        self.open_codes = all_codes[order]
+        self.open_start = np.concatenate([self.open_start, start])[order]
+        self.open_dmin = np.concatenate([self.open_dmin, dmin])[order]
+        self.open_dmax = np.concatenate([self.open_dmax, dmax])[order]
+
+    @staticmethod
+    def _find_dips(rows, g, evaluate):
+        """Trong các cặp nằm ngoài ở mọi mẫu, tìm cặp có cực tiểu g < 0 giữa hai mẫu (tìm kiếm tỉ lệ vàng)."""
+        if len(rows) == 0:
+            return rows, np.empty(0)
+        m = np.argmin(g[rows], axis=1)
+        a = np.maximum(m - 1, 0) / SUBSAMPLES
+        b = np.minimum(m + 1, SUBSAMPLES) / SUBSAMPLES
+        for _ in range(GOLDEN_ITERATIONS):
+            x1 = b - GOLDEN_RATIO * (b - a)
+            x2 = a + GOLDEN_RATIO * (b - a)
+            g1 = evaluate(rows, x1[:, None])[0][:, 0]
+            g2 = evaluate(rows, x2[:, None])[0][:, 0]
+            left = g1 < g2
+            b = np.where(left, x2, b)
+            a = np.where(left, a, x1)
+        s_min = 0.5 * (a + b)
+        dip = evaluate(rows, s_min[:, None])[0][:, 0] <= 0.0
+        return rows[dip], s_min[dip]
+
+    @staticmethod
+    def _bisect(rows, lo, hi, evaluate, h):
+        """Chia đôi trên [lo, hi] (trạng thái ở lo khác ở hi) tới khi độ rộng < ROOT_TOLERANCE_S."""
+        if len(rows) == 0:
+            return np.empty(0)
+        lo, hi = lo.copy(), hi.copy()
+        inside_lo = evaluate(rows, lo[:, None])[0][:, 0] <= 0.0
+        n_iter = max(1, int(math.ceil(math.log2(h / SUBSAMPLES / ROOT_TOLERANCE_S))) + 1)
+        for _ in range(n_iter):
+            mid = 0.5 * (lo + hi)
+            same = (evaluate(rows, mid[:, None])[0][:, 0] <= 0.0) == inside_lo
+            lo = np.where(same, mid, lo)
+            hi = np.where(same, hi, mid)
+        return 0.5 * (lo + hi)
+
+    def _replay(self, codes, event_rows, t0, h, s_grid, inside, d, ev_rows, ev_s, ev_enter, ev_d, dip_rows, dip_s, dip_d):
+        """Duyệt mẫu và sự kiện theo thời gian cho từng cặp có đổi trạng thái; mở/đóng liên kết tương ứng."""
+        open_pos = np.searchsorted(self.open_codes, codes[event_rows])
+        was_open = inside[event_rows, 0]
+        removed = []
+        new_codes, new_start, new_dmin, new_dmax = [], [], [], []
+        closed_rows = []
+        ev_order = np.lexsort((ev_s, ev_rows))
+        ev_rows_sorted = ev_rows[ev_order]
+        dip_of = dict(zip(dip_rows.tolist(), zip(dip_s.tolist(), dip_d.tolist())))
+        for k, row in enumerate(event_rows.tolist()):
+            current = None
+            if was_open[k]:
+                p = open_pos[k]
+                current = [self.open_start[p], self.open_dmin[p], self.open_dmax[p]]
+                removed.append(p)
+            timeline = [(s, 0, inside[row, j], d[row, j]) for j, s in enumerate(s_grid)]
+            first, last = np.searchsorted(ev_rows_sorted, [row, row + 1])
+            for e in ev_order[first:last]:
+                timeline.append((ev_s[e], 1 if ev_enter[e] else -1, True, ev_d[e]))
+            if row in dip_of:
+                timeline.append((dip_of[row][0], 0, True, dip_of[row][1]))
+            timeline.sort(key=lambda item: (item[0], -item[1]))
+            for s, kind, in_contact, dist in timeline:
+                if kind == 1:
+                    current = [t0 + s * h, dist, dist]
+                elif current is not None and in_contact:
+                    current[1], current[2] = min(current[1], dist), max(current[2], dist)
+                if kind == -1 and current is not None:
+                    closed_rows.append((codes[row], current[0], t0 + s * h, current[1], current[2]))
+                    current = None
+            if current is not None:
+                new_codes.append(codes[row])
+                new_start.append(current[0])
+                new_dmin.append(current[1])
+                new_dmax.append(current[2])
+
+        if removed:
+            keep = np.ones(len(self.open_codes), dtype=bool)
+            keep[removed] = False
+            self.open_codes, self.open_start = self.open_codes[keep], self.open_start[keep]
+            self.open_dmin, self.open_dmax = self.open_dmin[keep], self.open_dmax[keep]
+        if new_codes:
+            self._push(np.asarray(new_codes, dtype=np.int64), np.asarray(new_start),
+                       np.asarray(new_dmin), np.asarray(new_dmax))
+        if closed_rows:
+            columns = list(zip(*closed_rows))
+            self.closed.append((np.asarray(columns[0], dtype=np.int64),) + tuple(np.asarray(c) for c in columns[1:]))
+
+    def finish(self, t_end):
+        """Đóng mọi liên kết còn mở tại cuối khung thời gian và trả về (codes, start, end, dmin, dmax)."""
+        self._close(self.open_codes, self.open_start, t_end, self.open_dmin, self.open_dmax)
+        self.open_codes = np.empty(0, dtype=np.int64)
+        if not self.closed:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+        return tuple(np.concatenate(column) for column in zip(*self.closed))
+
+class ContactPlanner:
+    """
+    Tính contact plan theo sự kiện thay vì lấy mẫu topo ở bước cố định.
+
+    Quỹ đạo mỗi vệ tinh được nội suy Hermite giữa các mốc SGP4 cách nhau screen_step_s. Ở mỗi mốc, các cặp
+    ứng viên được sàng lọc bằng cây k-d với bán kính nới thêm (tốc độ tương đối lớn nhất x nửa bước) cho ISL,
+    và bằng góc nâng nới thêm cho GSL, nên không bỏ sót cặp nào có thể liên kết giữa hai mốc. Với mỗi cặp
+    ứng viên, thời điểm bắt đầu/kết thúc liên kết được tìm bằng dò đổi dấu + chia đôi trên đa thức nội suy.
+    Ràng buộc là hình học (MAX_ISL_DISTANCE_KM cho ISL, MIN_ELEVATION_ANGLE_DEG cho GSL); giới hạn số ISL
+    mỗi vệ tinh (MAX_ISL_PER_SAT) là quyết định chọn liên kết, không thuộc contact plan.
+    """
+
+    def __init__(self, propagator, link_model: LinkModel, sat_indices, node_ids, ground_sites=None,
+                 screen_step_s=DEFAULT_SCREEN_STEP_S):
+        """
+        sat_indices: chỉ số vệ tinh trong catalog; node_ids: ID node theo thứ tự vệ tinh rồi trạm mặt đất.
+        """
+        self.propagator = propagator
+        self.link_model = link_model
+        self.sat_indices = np.asarray(sat_indices, dtype=np.intp)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.ground_sites = ground_sites
+        self.screen_step_s = screen_step_s
+
+    def compute(self, start_time: datetime, duration_s: float) -> ContactPlan:
+        """Tính contact plan trên khung thời gian [start_time, start_time + duration_s]."""
+        n_sats = len(self.sat_indices)
+        n_intervals = max(1, int(math.ceil(duration_s / self.screen_step_s)))
+        h = duration_s / n_intervals
+        interpolator = InterpolatingPropagator(self.propagator, start_time, anchor_step_s=h,
+                                               indices=self.sat_indices, validate=False)
+        print(f"Contact plan: {n_intervals} bước sàng lọc x {h:.1f} s, "
+              f"cận sai số quỹ đạo nội suy {interpolator.error_bound_km * 1000.0:.3f} m.")
+
+        has_sites = self.ground_sites is not None and len(self.ground_sites) > 0
+        isl, gsl = _ContactTracker(), _ContactTracker()
+        max_range = self.link_model.max_isl_distance_km
+        sin_min = math.sin(math.radians(self.link_model.min_elevation_deg))
+
+        for w0 in range(0, n_intervals, WINDOW_INTERVALS):
+            w1 = min(w0 + WINDOW_INTERVALS, n_intervals)
+            anchor_times = [start_time + timedelta(seconds=k * h) for k in range(w0, w1 + 1)]
+            pos, vel, _ = interpolator.anchor_states(anchor_times, self.sat_indices)
+            speed = np.linalg.norm(vel, axis=2)
+            v_max = float(np.nanmax(speed)) if np.any(np.isfinite(speed)) else 0.0
+            # Hai vệ tinh tiến lại gần nhau nhanh nhất 2 x v_max -> nới bán kính sàng lọc thêm v_rel x h/2
+            isl_radius = max_range + v_max * h
+            screened = [self._screen_isl(pos[:, k], isl_radius) for k in range(len(anchor_times))]
+            if has_sites:
+                radius = np.linalg.norm(pos, axis=2)
+                alt_min = max(MIN_SCREEN_ALTITUDE_KM, float(np.nanmin(radius)) - R_EARTH) if np.any(np.isfinite(radius)) else MIN_SCREEN_ALTITUDE_KM
+                margin_deg = min(180.0, math.degrees(v_max * h / 2.0 / alt_min))
+                screened_gsl = [self._screen_gsl(pos[:, k], self.link_model.min_elevation_deg - margin_deg)
+                                for k in range(len(anchor_times))]
+
+            for k in range(w1 - w0):
+                t0 = (w0 + k) * h
+                c0, c1, c2, c3 = hermite_coefficients(pos[:, k], vel[:, k], pos[:, k + 1], vel[:, k + 1], h)
+                coefs = np.stack([c0, c1, c2, c3], axis=1)  # (N, 4, 3)
+
+                codes = np.union1d(screened[k], screened[k + 1])
+                a, b = codes // n_sats, codes % n_sats
+                rel = coefs[a] - coefs[b]
+                isl.interval(codes, t0, h, self._isl_evaluator(rel, max_range))
+
+                if has_sites:
+                    codes = np.union1d(screened_gsl[k], screened_gsl[k + 1])
+                    site, sat = codes // n_sats, codes % n_sats
+                    rel = coefs[sat].copy()
+                    rel[:, 0] -= self.ground_sites.positions[site]
+                    gsl.interval(codes, t0, h, self._gsl_evaluator(rel, self.ground_sites.up[site], sin_min))
+
+        # Ghép hai bảng ISL và GSL thành ContactPlan theo ID node
+        columns = {name: [] for name in ContactPlan.COLUMNS}
+        trackers = [(isl, EDGE_ISL)] + ([(gsl, EDGE_GSL)] if has_sites else [])
+        for tracker, link_type in trackers:
+            codes, t_start, t_end, dmin, dmax = tracker.finish(float(duration_s))
+            a, b = codes // n_sats, codes % n_sats
+            if link_type == EDGE_ISL:
+                src, dst = self.node_ids[a], self.node_ids[b]
+            else:
+                src, dst = self.node_ids[b], self.node_ids[n_sats + a]
+            for name, values in zip(ContactPlan.COLUMNS, (src, dst, np.full(len(codes), link_type), t_start, t_end,
+                                                          dmin / C_LIGHT, dmax / C_LIGHT)):
+                columns[name].append(values)
+        return ContactPlan(start_time, *(np.concatenate(columns[name]) for name in ContactPlan.COLUMNS))
+
+    def _screen_isl(self, positions, radius):
+        """Mã các cặp vệ tinh (i < j) có khoảng cách <= radius tại một mốc (vệ tinh lỗi bị bỏ qua)."""
+        valid = np.flatnonzero(np.all(np.isfinite(positions), axis=1))
+        i, j, _ = find_pairs_kdtree(positions[valid], radius)
+        return np.sort(valid[i].astype(np.int64) * len(positions) + valid[j])
+
+    def _screen_gsl(self, positions, min_elevation_deg):
+        """Mã các cặp (trạm, vệ tinh) có góc nâng >= min_elevation_deg tại một mốc."""
+        site, sat, _, _ = compute_visibility(self.ground_sites.positions, self.ground_sites.up, positions,
+                                             max(-90.0, min_elevation_deg))
+        return np.sort(site.astype(np.int64) * len(positions) + sat)
+
+    @staticmethod
+    def _relative(rel, rows, s):
+        """Giá trị đa thức vị trí tương đối tại thời gian chuẩn hóa s: (len(rows), K, 3)."""
+        c = rel[rows]
+        s = np.broadcast_to(s, (len(rows), np.shape(s)[-1]))[..., None]
+        return c[:, None, 0] + s * (c[:, None, 1] + s * (c[:, None, 2] + s * c[:, None, 3]))
+
+    def _isl_evaluator(self, rel, max_range):
+        """g = d^2 - R^2 (<= 0 khi trong tầm ISL)."""
+        def evaluate(rows, s):
+            r = self._relative(rel, rows, s)
+            d2 = np.einsum('pkc,pkc->pk', r, r)
+            g = np.where(np.isfinite(d2), d2 - max_range ** 2, np.inf)
+            return g, np.sqrt(d2)
+        return evaluate
+
+    def _gsl_evaluator(self, rel, up, sin_min):
+        """g = sin(el_min) * d - (r . up) (<= 0 khi góc nâng >= MIN_ELEVATION_ANGLE_DEG)."""
+        def evaluate(rows, s):
+            r = self._relative(rel, rows, s)
+            d = np.sqrt(np.einsum('pkc,pkc->pk', r, r))
+            g = sin_min * d - np.einsum('pkc,pc->pk', r, up[rows])
+            return np.where(np.isfinite(g), g, np.inf), d
+        return evaluate
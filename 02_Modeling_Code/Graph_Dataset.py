@@ -0,0 +1,421 @@
+# 02_Modeling_Code/Graph_Dataset.py
+
+import os
+import json
+import queue
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import networkx as nx
+
+from Graph_Snapshot import GraphSnapshot, EDGE_TYPES
+from Instrumentation import NULL_METRICS, STAGE_WRITE, STAGE_WRITE_WAIT
+
+# --- ĐỊNH DẠNG DATASET ĐỒ THỊ THEO THỜI GIAN (DẠNG CỘT, MEMORY-MAPPABLE) ---
+# Mỗi dataset là một thư mục chứa các file nhị phân thô (little-endian) và một file meta.json:
+#   node_ids.npy        (N,)      ID node (NORAD; trạm mặt đất dùng ID âm)
+#   timestamps.bin      (T,)      int64, micro giây kể từ Unix epoch (UTC)
+#   positions.bin       (T, N, 3) float32, tọa độ ECEF (km), NaN nếu lan truyền thất bại
+#   edge_offsets.bin    (T,)      int64, chỉ số kết thúc (exclusive) của các cạnh thuộc bước t
+#   edge_src.bin        (E,)      int32, chỉ số node (theo node_ids) - dạng COO
+#   edge_dst.bin        (E,)      int32
+#   edge_delay.bin      (E,)      float32, độ trễ truyền dẫn (giây)
+#   edge_distance.bin   (E,)      float32, khoảng cách (km)
+#   edge_type.bin       (E,)      uint8, xem EDGE_TYPES
+# Tùy chọn (khi tính bảng định tuyến, xem Routing_Table; meta.json có 'routing_sources' = chỉ số node nguồn):
+#   route_dist.bin      (T, S, N) float32, độ trễ nhỏ nhất từ node tới nguồn s (giây), inf nếu không tới được
+#   route_next_hop.bin  (T, S, N) int32, node kế tiếp trên đường về nguồn s, -1 nếu là nguồn/không tới được
+# Tùy chọn (thuộc tính liên kết, xem Link_Metrics; meta.json có 'edge_attributes' = danh sách tên):
+#   edge_<tên>.bin      (E,)      float32, ví dụ edge_snr_db.bin, edge_tx_energy_j.bin
+# Các file .bin chỉ được ghi nối tiếp (append), nên việc ghi là streaming theo từng bước.
+# manifest.json (checkpoint, ghi nguyên tử sau mỗi cửa sổ thời gian): số bước/cạnh và số byte của từng cột đã ghi
+# xong, cùng thông tin tiến độ của Generator (khoảng thời gian đã hoàn tất, hash TLE/cấu hình). Khi tiếp tục một
+# lần chạy bị ngắt, các cột được cắt về đúng kích thước trong manifest rồi ghi nối tiếp từ đó.
+# meta.json chỉ được ghi khi đóng một dataset hoàn chỉnh (close(complete=True)); lần ghi bị lỗi/ngắt/bỏ dở chỉ đẩy
+# các cột xuống đĩa, manifest.json của checkpoint cuối là điểm tiếp tục.
+META_FILENAME = 'meta.json'
+MANIFEST_FILENAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+POSITION_DTYPE = np.float32
+COLUMNS = {
+    'timestamps': np.int64,
+    'positions': POSITION_DTYPE,
+    'edge_offsets': np.int64,
+    'edge_src': np.int32,
+    'edge_dst': np.int32,
+    'edge_delay': np.float32,
+    'edge_distance': np.float32,
+    'edge_type': np.uint8,
+}
+ROUTING_COLUMNS = {
+    'route_dist': np.float32,
+    'route_next_hop': np.int32,
+}
+EDGE_ATTRIBUTE_DTYPE = np.float32
+
+def _to_microseconds(dt: datetime) -> int:
+    """Chuyển datetime (UTC) thành số micro giây kể từ Unix epoch."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(round(dt.timestamp() * 1e6))
+
+def _from_microseconds(us: int) -> datetime:
+    return datetime.fromtimestamp(us / 1e6, tz=timezone.utc)
+
+def _write_json_atomic(path, data):
+    """Ghi JSON nguyên tử: ghi ra file tạm, fsync rồi os.replace (không bao giờ để lại file ghi dở)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_manifest(dataset_dir):
+    """Manifest (checkpoint gần nhất) của dataset, None nếu chưa có."""
+    path = os.path.join(dataset_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+class GraphDatasetWriter:
+    def __init__(self, dataset_dir, node_ids, node_names=None, metadata=None, routing_sources=None,
+                 edge_attributes=(), resume_from=None):
+        """
+        Mở một dataset mới để ghi nối tiếp từng snapshot.
+        node_ids: danh sách ID node cố định cho cả chuỗi thời gian (thứ tự = chỉ số node).
+        routing_sources: chỉ số node nguồn của bảng định tuyến (None = không lưu bảng định tuyến).
+        edge_attributes: tên các thuộc tính cạnh bổ sung (Link_Metrics.LINK_ATTRIBUTES), mỗi tên một cột edge_<tên>.
+        resume_from: manifest (read_manifest) của lần ghi bị ngắt -> ghi tiếp sau checkpoint đó thay vì ghi đè.
+        """
+        self.dataset_dir = dataset_dir
+        os.makedirs(dataset_dir, exist_ok=True)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self.node_names = list(node_names) if node_names is not None else None
+        self.metadata = dict(metadata or {})
+        self.n_steps = 0
+        self.n_edges = 0
+        self.routing_sources = None if routing_sources is None else np.asarray(routing_sources, dtype=np.int64)
+        self.columns = dict(COLUMNS)
+        if self.routing_sources is not None:
+            self.columns.update(ROUTING_COLUMNS)
+        self.edge_attributes = list(edge_attributes)
+        self.columns.update({f"edge_{name}": EDGE_ATTRIBUTE_DTYPE for name in self.edge_attributes})
+
+        # Dataset chỉ hoàn chỉnh khi đóng -> bỏ meta.json cũ để không đọc nhầm một lần ghi dở dang
+        meta_path = os.path.join(dataset_dir, META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        if resume_from is not None:
+            self._files = self._reopen(resume_from)
+            return
+        manifest_path = os.path.join(dataset_dir, MANIFEST_FILENAME)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        np.save(os.path.join(dataset_dir, 'node_ids.npy'), self.node_ids)
+        self._files = {name: open(os.path.join(dataset_dir, f"{name}.bin"), 'wb') for name in self.columns}
+
+    def _reopen(self, manifest):
+        """Cắt các cột về kích thước đã checkpoint (bỏ phần ghi dở sau đó) rồi mở để ghi nối tiếp."""
+        column_bytes = manifest['column_bytes']
+        if set(column_bytes) != set(self.columns):
+            raise ValueError(f"Các cột của dataset {self.dataset_dir} khác với manifest: "
+                             f"{sorted(column_bytes)} != {sorted(self.columns)}")
+        node_ids = np.load(os.path.join(self.dataset_dir, 'node_ids.npy'))
+        if not np.array_equal(node_ids, self.node_ids):
+            raise ValueError(f"Tập node của dataset {self.dataset_dir} khác với lần ghi trước")
+        files = {}
+        for name, n_bytes in column_bytes.items():
+            path = os.path.join(self.dataset_dir, f"{name}.bin")
+            if os.path.getsize(path) < n_bytes:
+                raise ValueError(f"Cột {name} ngắn hơn checkpoint trong manifest ({os.path.getsize(path)} < {n_bytes} byte)")
+            os.truncate(path, n_bytes)
+            files[name] = open(path, 'ab')
+        self.n_steps = manifest['n_steps']
+        self.n_edges = manifest['n_edges']
+        return files
+
+    def _write(self, name, values):
+        np.ascontiguousarray(values, dtype=self.columns[name]).tofile(self._files[name])
+
+    def append(self, timestamp: datetime, positions, src, dst, delay, distance, edge_type=0,
+               route_dist=None, route_next_hop=None, attributes=None):
+        """
+        Ghi một snapshot.
+        positions: (N, 3) theo thứ tự node_ids. src/dst: chỉ số node của các cạnh.
+        edge_type: mã loại cạnh (số nguyên hoặc mảng), chỉ số trong EDGE_TYPES.
+        route_dist / route_next_hop: bảng định tuyến (S, N) (bắt buộc khi mở với routing_sources).
+        attributes: {tên: mảng (E,)} các thuộc tính cạnh (bắt buộc khi mở với edge_attributes).
+        """
+        n_new = len(src)
+        self._write('timestamps', [_to_microseconds(timestamp)])
+        self._write('positions', positions)
+        self._write('edge_src', src)
+        self._write('edge_dst', dst)
+        self._write('edge_delay', delay)
+        self._write('edge_distance', distance)
+        self._write('edge_type', np.broadcast_to(np.asarray(edge_type, dtype=np.uint8), (n_new,)))
+        for name in self.edge_attributes:
+            self._write(f"edge_{name}", attributes[name])
+        self.n_edges += n_new
+        self._write('edge_offsets', [self.n_edges])
+        if self.routing_sources is not None:
+            self._write('route_dist', route_dist)
+            self._write('route_next_hop', route_next_hop)
+        self.n_steps += 1
+
+    def checkpoint(self, progress=None):
+        """
+        Đẩy mọi cột xuống đĩa (fsync) rồi ghi nguyên tử manifest.json: các bước đã ghi tới đây được giữ lại
+        khi tiếp tục sau một lần chạy bị ngắt. progress: dict thông tin tiến độ của bên gọi, lưu kèm manifest.
+        """
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'n_steps': self.n_steps,
+            'n_edges': self.n_edges,
+            'column_bytes': {name: f.tell() for name, f in self._files.items()},
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        manifest.update(progress or {})
+        _write_json_atomic(os.path.join(self.dataset_dir, MANIFEST_FILENAME), manifest)
+
+    def close(self, complete=True):
+        """
+        Đóng các file và ghi meta.json (kích thước, kiểu dữ liệu) để đọc lại bằng memory-map.
+        complete=False (lần ghi bị lỗi/ngắt/bỏ dở): chỉ đẩy các cột xuống đĩa, không ghi meta.json.
+        """
+        for f in self._files.values():
+            f.flush()
+            if not complete:
+                os.fsync(f.fileno())
+            f.close()
+        if not complete:
+            return
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'n_nodes': int(len(self.node_ids)),
+            'n_steps': self.n_steps,
+            'n_edges': self.n_edges,
+            'dtypes': {name: np.dtype(dtype).str for name, dtype in self.columns.items()},
+            'edge_types': EDGE_TYPES,
+            'node_names': self.node_names,
+            'routing_sources': None if self.routing_sources is None else self.routing_sources.tolist(),
+            'edge_attributes': self.edge_attributes,
+        }
+        meta.update(self.metadata)
+        _write_json_atomic(os.path.join(self.dataset_dir, META_FILENAME), meta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
+
+class GraphDatasetReader:
+    def __init__(self, dataset_dir):
+        """Mở dataset ở chế độ lười (lazy): các mảng chỉ được memory-map, không nạp vào RAM."""
+        self.dataset_dir = dataset_dir
+        with open(os.path.join(dataset_dir, META_FILENAME), 'r') as f:
+            self.meta = json.load(f)
+        self.n_nodes = self.meta['n_nodes']
+        self.n_steps = self.meta['n_steps']
+        self.node_ids = np.load(os.path.join(dataset_dir, 'node_ids.npy'), mmap_mode='r')
+        self.node_names = self.meta.get('node_names')
+        self.edge_attributes = self.meta.get('edge_attributes') or []
+        self._columns = {}
+
+    def _column(self, name):
+        """Memory-map một cột (chỉ mở khi cần)."""
+        if name not in self._columns:
+            dtype = np.dtype(self.meta['dtypes'][name])
+            path = os.path.join(self.dataset_dir, f"{name}.bin")
+            if os.path.getsize(path) == 0:
+                self._columns[name] = np.empty(0, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(path, dtype=dtype, mode='r')
+        return self._columns[name]
+
+    @property
+    def timestamps(self):
+        """Mảng thời điểm (int64 micro giây, UTC) của các snapshot."""
+        return self._column('timestamps')
+
+    @property
+    def positions(self):
+        """Mảng vị trí (T, N, 3), memory-mapped."""
+        return self._column('positions').reshape(self.n_steps, self.n_nodes, 3)
+
+    def timestamp(self, t):
+        return _from_microseconds(int(self.timestamps[t]))
+
+    def edge_range(self, t0, t1=None):
+        """Khoảng chỉ số cạnh [start, end) của các bước t0..t1-1."""
+        if t1 is None:
+            t1 = t0 + 1
+        offsets = self._column('edge_offsets')
+        start = int(offsets[t0 - 1]) if t0 > 0 else 0
+        end = int(offsets[t1 - 1]) if t1 > 0 else 0
+        return start, end
+
+    def edges(self, t0, t1=None):
+        """Các cột cạnh (view vào memory-map) của các bước t0..t1-1, kể cả thuộc tính cạnh theo tên."""
+        start, end = self.edge_range(t0, t1)
+        edges = {
+            'src': self._column('edge_src')[start:end],
+            'dst': self._column('edge_dst')[start:end],
+            'weight_delay': self._column('edge_delay')[start:end],
+            'distance_km': self._column('edge_distance')[start:end],
+            'type': self._column('edge_type')[start:end],
+        }
+        for name in self.edge_attributes:
+            edges[name] = self._column(f"edge_{name}")[start:end]
+        return edges
+
+    def snapshot(self, t):
+        """Snapshot tại bước t: vị trí các node và các cạnh (không nạp phần còn lại của dataset)."""
+        if not 0 <= t < self.n_steps:
+            raise IndexError(f"Bước thời gian {t} nằm ngoài dataset (0..{self.n_steps - 1})")
+        snapshot = self.edges(t)
+        snapshot['time_step'] = t
+        snapshot['timestamp'] = self.timestamp(t)
+        snapshot['positions'] = self.positions[t]
+        return snapshot
+
+    def time_slice(self, t0, t1):
+        """Các bước t0..t1-1: vị trí (t1-t0, N, 3), cạnh nối liền và offset tương đối theo từng bước."""
+        offsets = np.asarray(self._column('edge_offsets')[t0:t1], dtype=np.int64)
+        start, _ = self.edge_range(t0, t1)
+        data = self.edges(t0, t1)
+        data['edge_offsets'] = np.r_[0, offsets - start]
+        data['timestamps'] = self.timestamps[t0:t1]
+        data['positions'] = self.positions[t0:t1]
+        return data
+
+    @property
+    def routing_sources(self):
+        """Chỉ số node nguồn của bảng định tuyến (None nếu dataset không có bảng định tuyến)."""
+        sources = self.meta.get('routing_sources')
+        return None if sources is None else np.asarray(sources, dtype=np.int64)
+
+    def routing(self, t):
+        """Bảng định tuyến của bước t: 'dist' và 'next_hop' dạng (S, N), memory-mapped."""
+        sources = self.routing_sources
+        if sources is None:
+            raise KeyError("Dataset không có bảng định tuyến (ROUTING_SOURCES = NONE)")
+        shape = (self.n_steps, len(sources), self.n_nodes)
+        return {
+            'sources': sources,
+            'dist': self._column('route_dist').reshape(shape)[t],
+            'next_hop': self._column('route_next_hop').reshape(shape)[t],
+        }
+
+    def route(self, t, node, source_k):
+        """Đường đi ngắn nhất (danh sách chỉ số node) từ node tới nguồn thứ source_k tại bước t; [] nếu không tới được."""
+        table = self.routing(t)
+        target = int(table['sources'][source_k])
+        next_hop = table['next_hop'][source_k]
+        if not np.isfinite(table['dist'][source_k, node]):
+            return []
+        path = [int(node)]
+        while path[-1] != target:
+            path.append(int(next_hop[path[-1]]))
+        return path
+
+    def graph_snapshot(self, t):
+        """Snapshot t dạng GraphSnapshot (giống đồ thị do LinkModel tạo: bỏ các node cô lập)."""
+        snapshot = self.snapshot(t)
+        names = self.node_names if self.node_names else None
+        return GraphSnapshot.from_edges(
+            self.node_ids, names, snapshot['positions'], snapshot['src'], snapshot['dst'],
+            snapshot['weight_delay'], snapshot['distance_km'], snapshot['type'],
+            graph={'time_step': t, 'timestamp': snapshot['timestamp'].isoformat()},
+            edge_attributes={name: snapshot[name] for name in self.edge_attributes})
+
+    def to_networkx(self, t):
+        """Chuyển snapshot t thành nx.Graph (giống đồ thị do LinkModel tạo: bỏ các node cô lập)."""
+        return self.graph_snapshot(t).to_networkx()
+
+def export_gexf(dataset_dir, output_dir=None, steps=None, prefix=None):
+    """Bộ chuyển đổi tùy chọn: xuất các snapshot của dataset sang GEXF để trực quan hóa."""
+    reader = GraphDatasetReader(dataset_dir)
+    output_dir = output_dir or dataset_dir
+    prefix = prefix or reader.meta.get('scenario_name', os.path.basename(os.path.normpath(dataset_dir)))
+    os.makedirs(output_dir, exist_ok=True)
+    # Độ rộng chỉ số bước theo độ dài dataset (tối thiểu 3 chữ số) -> tên file sắp xếp đúng thứ tự kể cả > 999 bước
+    width = max(3, len(str(max(reader.n_steps - 1, 0))))
+    paths = []
+    for t in (range(reader.n_steps) if steps is None else steps):
+        G = reader.to_networkx(t)
+        # GEXF không hỗ trợ thuộc tính kiểu mảng -> ghi vị trí thành 3 thuộc tính số
+        for _, data in G.nodes(data=True):
+            x, y, z = data.pop('pos')
+            data.update(x_km=float(x), y_km=float(y), z_km=float(z))
+        path = os.path.join(output_dir, f"{prefix}_T{t:0{width}d}.gexf")
+        nx.write_gexf(G, path)
+        paths.append(path)
+    return paths
+
+class BackgroundWriter:
+    """
+    Chạy việc ghi (serialization) trên một luồng nền phía sau một hàng đợi có giới hạn.
+    Luồng chính chỉ đưa dữ liệu vào hàng đợi nên lan truyền, xây dựng liên kết và ghi file chồng lấp nhau;
+    khi hàng đợi đầy, luồng chính bị chặn lại, nên bộ nhớ đỉnh không tăng theo độ dài kịch bản.
+    target: đối tượng có append(...) và close(complete) (ví dụ GraphDatasetWriter); checkpoint(...) nếu có dùng.
+    metrics: bộ đo đạc (Instrumentation.Metrics) cho thời gian ghi và thời gian luồng chính bị chặn.
+    """
+    _SENTINEL = object()
+
+    def __init__(self, target, max_queue=8, metrics=None):
+        self.target = target
+        self.metrics = metrics or NULL_METRICS
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='dataset-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._SENTINEL:
+                break
+            if self._error is None:
+                try:
+                    method, args, kwargs = item
+                    with self.metrics.stage(STAGE_WRITE):
+                        getattr(self.target, method)(*args, **kwargs)
+                except Exception as e:  # Lưu lỗi, báo lại ở luồng chính
+                    self._error = e
+
+    def append(self, *args, **kwargs):
+        if self._error is not None:
+            raise self._error
+        with self.metrics.stage(STAGE_WRITE_WAIT):
+            self._queue.put(('append', args, kwargs))
+
+    def checkpoint(self, *args, **kwargs):
+        """Checkpoint target sau mọi snapshot đã đưa vào hàng đợi trước đó (theo đúng thứ tự ghi)."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put(('checkpoint', args, kwargs))
+
+    def close(self, complete=True):
+        """
+        Chờ ghi hết hàng đợi rồi đóng target; ném lại lỗi ghi (nếu có).
+        complete=False (hoặc một lần ghi đã thất bại): target được đóng như một lần ghi dở dang.
+        """
+        self._queue.put(self._SENTINEL)
+        self._thread.join()
+        self.target.close(complete=complete and self._error is None)
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(complete=exc_type is None)
@@ -2,55 +2,206 @@
 
 import yaml
 import os
+import json
 import glob
+import hashlib
+import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-import networkx as nx
+import numpy as np
 
 # Import các module đã xây dựng
 from Propagator import SatellitePropagator, R_EARTH
-from Link_Model import LinkModel
-from skyfield.api import Topos # Cần cho việc mô hình hóa trạm mặt đất
+from Link_Model import LinkModel, ISL_TOPOLOGY_NEAREST, ISL_TOPOLOGY_GRID, ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY
+from Graph_Snapshot import EDGE_ISL, EDGE_GSL
+from Graph_Dataset import GraphDatasetWriter, BackgroundWriter, export_gexf, read_manifest
+from Incremental_Topology import IncrementalTopology, DeltaStreamWriter, DEFAULT_SKIN_KM, DEFAULT_REWEIGHT_TOLERANCE_S
+from Ground_Station import GroundSites
+from Plane_Topology import PlaneGridTopology
+from Position_Interpolator import InterpolatingPropagator, DEFAULT_MAX_ERROR_M
+from Contact_Plan import ContactPlanner, DEFAULT_SCREEN_STEP_S
+from Position_Cache import PositionCache, position_cache_key, content_sha1, DEFAULT_MAX_BYTES
+from Instrumentation import Metrics, MetricsLog, NULL_METRICS, STAGE_ROUTING, merge_metrics, profiled
+from Routing_Table import RoutingTables, ROUTING_NONE, ROUTING_GROUND, ROUTING_ALL
+from Orbital_Catalog import load_ids, parse_where, group_source
+from Link_Metrics import default_link_attributes
+from Multi_Constellation import ConstellationSpec, ShellPartitionedISL, DEFAULT_MIN_SHELL_SATELLITES
 
-# --- THIẾT LẬP ĐƯỜNG DẪN ---
-BASE_DIR = os.path.dirname(os.getcwd())
+# --- THIẾT LẬP ĐƯỜNG DẪN (theo vị trí file mã nguồn, không phụ thuộc thư mục làm việc hiện tại) ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_SOURCE_DIR = os.path.join(BASE_DIR, '01_Data_Source')
 SCENARIOS_DIR = os.path.join(BASE_DIR, '03_Scenarios')
 OUTPUT_DATASET_DIR = os.path.join(BASE_DIR, '04_Output_Dataset')
-os.makedirs(OUTPUT_DATASET_DIR, exist_ok=True)
+
+DEFAULT_CHUNK_STEPS = 10  # Số bước thời gian mỗi cửa sổ khi chia việc
+MAX_INFLIGHT_CHUNKS_PER_WORKER = 2  # Số cửa sổ tối đa đang chạy/chờ cho mỗi worker (giới hạn bộ nhớ)
+DEFAULT_WRITER_QUEUE_SIZE = 8       # Số snapshot tối đa chờ ghi trên luồng nền
+
+# Khóa cấu hình chỉ ảnh hưởng cách chạy, không ảnh hưởng nội dung dataset: không tính vào hash cấu hình của
+# manifest, nên có thể đổi khi tiếp tục (RESUME) một lần chạy bị ngắt. DURATION_MINUTES chỉ kéo dài lưới thời gian
+# (các bước đã xong là tiền tố của lưới mới) -> tiếp tục với DURATION_MINUTES lớn hơn sẽ nối dài dataset.
+RUN_ONLY_KEYS = ('DESCRIPTION', 'DURATION_MINUTES', 'PARALLEL_WORKERS', 'CHUNK_STEPS', 'WRITER_QUEUE_SIZE',
+                 'POSITION_CACHE_DIR', 'POSITION_CACHE_MAX_GB', 'OUTPUT_DIR', 'EXPORT_GEXF', 'COLLECT_METRICS',
+                 'PROFILE_RUN', 'RESUME')
+
+# Bộ cung cấp vị trí (khóa POSITION_PROVIDER trong kịch bản)
+PROVIDER_SGP4 = 'SGP4'        # Lan truyền SGP4 đầy đủ tại mọi bước
+PROVIDER_HERMITE = 'HERMITE'  # SGP4 tại các mốc neo thưa + nội suy Hermite (cho TIME_STEP_SECONDS <= vài giây)
+
+# --- THỰC THI SONG SONG (PROCESS POOL) ---
+# Mỗi worker tải TLE (và Link Model) đúng một lần trong initializer, sau đó xử lý các cửa sổ thời gian
+_WORKER_GENERATOR = None
+
+def _init_worker(config_path, overrides):
+    """Initializer của worker: khởi tạo Generator (tải TLE) một lần cho mỗi tiến trình."""
+    global _WORKER_GENERATOR
+    _WORKER_GENERATOR = DynamicGraphGenerator(config_path, overrides)
+
+def _compute_chunk_in_worker(chunk):
+    return _WORKER_GENERATOR._compute_chunk(chunk)
 
 class DynamicGraphGenerator:
-    def __init__(self, config_path):
-        """Khởi tạo Generator bằng file cấu hình kịch bản."""
+    def __init__(self, config_path, overrides=None):
+        """
+        Khởi tạo Generator bằng file cấu hình kịch bản.
+        overrides: dict ghi đè các khóa cấu hình (ví dụ từ tham số dòng lệnh).
+        """
         with open(config_path, 'r') as f:
             self.config = yaml.safe_load(f)
+        self.config_path = config_path
+        self.overrides = dict(overrides or {})
+        self.config.update(self.overrides)
             
         self.scenario_name = self.config['SCENARIO_NAME']
+        self.output_dir = os.path.join(BASE_DIR, self.config.get('OUTPUT_DIR') or OUTPUT_DATASET_DIR)
+        os.makedirs(self.output_dir, exist_ok=True)
         print(f"Khởi tạo Generator cho kịch bản: {self.scenario_name}")
         
-        # 1. Tải dữ liệu TLE cho vệ tinh (Mạng lưới chính)
-        tle_pattern = f"{self.config['CONSTELLATION']}_TLE_*.txt"
-        latest_tle = self._find_latest_file(tle_pattern)
-        self.sat_propagator = SatellitePropagator(latest_tle)
-        
-        # Lấy subset vệ tinh theo cấu hình
-        self.satellites = self.sat_propagator.satellites[:self.config['SUBSET_SIZE']]
+        # Đo đạc các tầng tính toán (COLLECT_METRICS); khi tắt mọi lời gọi đo là no-op
+        self.metrics = Metrics() if self.config.get('COLLECT_METRICS', False) else NULL_METRICS
         
-        # 2. Tải dữ liệu TLE cho Trạm Mặt đất (nếu cần)
-        self.ground_stations = []
-        if self.config['INCLUDE_GROUND_NODES']:
-            gs_tle_pattern = f"{self.config['GS_LOCATION_FILE']}_*.txt"
-            latest_gs_tle = self._find_latest_file(gs_tle_pattern)
-            gs_prop = SatellitePropagator(latest_gs_tle)
-            self.ground_stations = gs_prop.satellites
+        # 1. Tải dữ liệu TLE cho vệ tinh (Mạng lưới chính)
+        #    TLE_FILE (tùy chọn): đường dẫn file TLE cụ thể (ví dụ chòm sao tổng hợp), tương đối theo BASE_DIR
+        #    Mặc định: file chuẩn của kho catalog (data_collector, <CONSTELLATION>_TLE.txt) nếu có,
+        #    ngược lại file tải theo timestamp mới nhất
+        # Bộ lọc catalog (Orbital_Catalog, đẩy xuống khi đọc): CATALOG_FILTER chọn theo cột (ví dụ shell 550 km),
+        # CATALOG_EXCLUDE_GROUPS loại các ID có trong nhóm catalog khác (ví dụ DECAYING)
+        self.catalog_where = parse_where(self.config.get('CATALOG_FILTER'))
+        exclude_groups = self.config.get('CATALOG_EXCLUDE_GROUPS') or []
+        exclude_ids = (np.concatenate([load_ids(self._group_source(group)) for group in exclude_groups])
+                       if exclude_groups else None)
+        # Chế độ nhiều chòm sao (CONSTELLATIONS, xem Multi_Constellation): ghép catalog của các chòm sao theo thứ tự,
+        # mỗi chòm sao với SUBSET_SIZE / CATALOG_FILTER và ràng buộc liên kết riêng
+        self.constellation_specs = [ConstellationSpec.from_config(entry, self.config)
+                                    for entry in self.config.get('CONSTELLATIONS') or []]
+        if self.constellation_specs:
+            self.sat_propagator, self.node_constellation = self._load_constellations(exclude_ids)
+            self.catalog_filtered = True
+            self.sat_indices = np.arange(self.sat_propagator.n_satellites)
+        else:
+            store_tle = os.path.join(DATA_SOURCE_DIR, f"{self.config['CONSTELLATION']}_TLE.txt")
+            if self.config.get('TLE_FILE'):
+                latest_tle = os.path.join(BASE_DIR, self.config['TLE_FILE'])
+            elif os.path.exists(store_tle):
+                latest_tle = store_tle
+            else:
+                tle_pattern = f"{self.config['CONSTELLATION']}_TLE_*.txt"
+                latest_tle = self._find_latest_file(tle_pattern)
+            self.tle_paths = [latest_tle]
+            self.catalog_filtered = bool(self.catalog_where) or exclude_ids is not None
+            self.sat_propagator = SatellitePropagator(latest_tle, metrics=self.metrics, where=self.catalog_where,
+                                                      exclude_ids=exclude_ids)
+            # Lấy subset vệ tinh theo cấu hình
+            self.sat_indices = np.arange(min(self.config['SUBSET_SIZE'], self.sat_propagator.n_satellites))
+        self.tle_path = self.tle_paths[0]
+        self.node_ids = [int(sat_id) for sat_id in self.sat_propagator.sat_ids[self.sat_indices]]
+        sat_names = self.sat_propagator.sat_names  # Thuộc tính giải mã toàn bộ catalog -> chỉ gọi một lần
+        self.node_names = [sat_names[k] for k in self.sat_indices]
         
-        # 3. Khởi tạo Link Model
-        self.link_model = LinkModel(is_multi_objective=(self.config['OBJECTIVE'] == 'MULTI'))
+        # 2. Trạm Mặt đất cố định (lat/lon/alt trong kịch bản), đứng sau các vệ tinh trong thứ tự node
+        self.ground_sites = GroundSites.from_config(
+            self.config.get('GROUND_STATIONS') if self.config['INCLUDE_GROUND_NODES'] else [])
+        self.graph_node_ids = self.node_ids + self.ground_sites.node_ids
+        self.graph_node_names = self.node_names + self.ground_sites.names
         
-        # 4. Thiết lập thời gian
+        # 3. Thiết lập thời gian
         self.start_time = datetime.fromisoformat(self.config['START_TIME'].replace('Z', '+00:00'))
         self.duration = timedelta(minutes=self.config['DURATION_MINUTES'])
         self.time_step = timedelta(seconds=self.config['TIME_STEP_SECONDS'])
         
+        # Bộ cung cấp vị trí: SGP4 trực tiếp hoặc nội suy từ các mốc neo (cùng giao diện propagate_batch)
+        provider = self.config.get('POSITION_PROVIDER', PROVIDER_SGP4)
+        if provider not in (PROVIDER_SGP4, PROVIDER_HERMITE):
+            raise ValueError(f"POSITION_PROVIDER không hợp lệ: {provider}")
+        self.position_provider = self.sat_propagator
+        self.interpolated = provider == PROVIDER_HERMITE
+        if provider == PROVIDER_HERMITE:
+            self.position_provider = InterpolatingPropagator(
+                self.sat_propagator, self.start_time,
+                anchor_step_s=self.config.get('INTERPOLATION_ANCHOR_SECONDS'),
+                max_error_m=self.config.get('INTERPOLATION_MAX_ERROR_M', DEFAULT_MAX_ERROR_M),
+                indices=self.sat_indices)
+            print(self.position_provider.report())
+        # Bộ đệm vị trí dùng chung (POSITION_CACHE_DIR, ví dụ khi chạy Sweep_Runner): vị trí của toàn bộ catalog
+        # được tính một lần cho mỗi (file TLE, lưới thời gian, bộ cung cấp) rồi memory-map lại ở các lần chạy sau
+        if self.config.get('POSITION_CACHE_DIR'):
+            self.position_provider = self._cached_position_provider(provider)
+        
+        # 4. Khởi tạo Link Model (topo +Grid: gom shell/mặt phẳng một lần từ phần tử quỹ đạo tại START_TIME)
+        isl_topology = self.config.get('ISL_TOPOLOGY', ISL_TOPOLOGY_NEAREST)
+        if isl_topology not in (ISL_TOPOLOGY_NEAREST, ISL_TOPOLOGY_GRID):
+            raise ValueError(f"ISL_TOPOLOGY không hợp lệ: {isl_topology}")
+        if self.constellation_specs and isl_topology == ISL_TOPOLOGY_GRID:
+            raise ValueError("ISL_TOPOLOGY GRID chưa hỗ trợ CONSTELLATIONS (dùng NEAREST)")
+        plane_grid = None
+        if isl_topology == ISL_TOPOLOGY_GRID:
+            plane_grid = PlaneGridTopology.from_catalog(self.sat_propagator.catalog[self.sat_indices], self.start_time)
+            print(f"Topo +Grid: {plane_grid.n_shells} shell, {plane_grid.n_planes} mặt phẳng quỹ đạo, "
+                  f"{len(plane_grid.src)} cặp ISL cố định.")
+        # Nhiều chòm sao: ISL xây dựng theo từng shell (góc nghiêng / độ cao) với ràng buộc của chòm sao, cộng cạnh chéo giữa các shell
+        isl_partition = None
+        max_isl_distance_km, max_isl_per_sat = self.config['MAX_ISL_DISTANCE_KM'], self.config['MAX_ISL_PER_SAT']
+        if self.constellation_specs:
+            isl_partition = ShellPartitionedISL.from_catalog(
+                self.constellation_specs, self.node_constellation, self.sat_propagator.catalog,
+                min_shell_satellites=self.config.get('MIN_SHELL_SATELLITES', DEFAULT_MIN_SHELL_SATELLITES),
+                metrics=self.metrics)
+            print(f"Nhiều chòm sao: {isl_partition.n_shells} shell ({isl_partition.describe()}).")
+            max_isl_distance_km = max(spec.max_isl_distance_km for spec in self.constellation_specs)
+            max_isl_per_sat = max(spec.max_isl_per_sat + spec.cross_isl_per_sat for spec in self.constellation_specs)
+        # Thuộc tính cạnh bổ sung (LINK_ATTRIBUTES; null = theo OBJECTIVE: MULTI -> tất cả, ENERGY -> năng lượng)
+        link_attributes = self.config.get('LINK_ATTRIBUTES')
+        if link_attributes is None:
+            link_attributes = default_link_attributes(self.config['OBJECTIVE'])
+        self.link_model = LinkModel(
+            is_multi_objective=(self.config['OBJECTIVE'] == 'MULTI'),
+            max_isl_distance_km=max_isl_distance_km,
+            max_isl_per_sat=max_isl_per_sat,
+            min_elevation_deg=self.config.get('MIN_ELEVATION_ANGLE_DEG', 10.0),
+            max_gsl_per_site=self.config.get('MAX_GSL_PER_GS') or None,
+            plane_grid=plane_grid,
+            metrics=self.metrics,
+            link_attributes=link_attributes,
+            isl_assignment=self.config.get('ISL_ASSIGNMENT', ISL_ASSIGNMENT_FORWARD),
+            isl_partition=isl_partition,
+        )
+        
+        # 5. Bảng định tuyến theo snapshot (đường đi ngắn nhất theo độ trễ) cho tập nguồn ROUTING_SOURCES
+        routing_mode = self.config.get('ROUTING_SOURCES', ROUTING_NONE)
+        n_nodes = len(self.graph_node_ids)
+        if routing_mode == ROUTING_NONE:
+            self.routing_sources = None
+        elif routing_mode == ROUTING_GROUND:
+            self.routing_sources = len(self.node_ids) + np.arange(len(self.ground_sites))
+        elif routing_mode == ROUTING_ALL:
+            self.routing_sources = np.arange(n_nodes)
+        else:
+            raise ValueError(f"ROUTING_SOURCES không hợp lệ: {routing_mode}")
+        self.routing = (RoutingTables(n_nodes, self.routing_sources, metrics=self.metrics)
+                        if self.routing_sources is not None else None)
+        
     def _find_latest_file(self, pattern):
         """Hàm helper tìm file mới nhất trong thư mục dữ liệu."""
         full_pattern = os.path.join(DATA_SOURCE_DIR, pattern)
@@ -59,82 +210,524 @@ class DynamicGraphGenerator:
              raise FileNotFoundError(f"Không tìm thấy file nào khớp với pattern: {pattern}")
         return max(list_of_files, key=os.path.getctime)
 
-    def generate_graphs(self):
-        """Chạy mô phỏng theo thời gian và tạo chuỗi đồ thị."""
+    def _group_source(self, group):
+        """File nguồn của một nhóm catalog: file chuẩn của kho, TLE mới nhất, hoặc OMM JSON mới nhất."""
+        return group_source(group, DATA_SOURCE_DIR)
+
+    def _load_constellations(self, exclude_ids):
+        """
+        Catalog ghép của các chòm sao trong CONSTELLATIONS theo thứ tự danh sách (mỗi chòm sao tối đa SUBSET_SIZE
+        vệ tinh, vệ tinh đã có ở chòm sao trước bị bỏ). Trả về (propagator, chỉ số chòm sao của từng vệ tinh).
+        """
+        self.tle_paths = []
+        catalogs, labels = [], []
+        seen_ids = np.empty(0, dtype=np.int64)
+        for c, spec in enumerate(self.constellation_specs):
+            path = os.path.join(BASE_DIR, spec.tle_file) if spec.tle_file else self._group_source(spec.name)
+            self.tle_paths.append(path)
+            catalog = SatellitePropagator(path, metrics=self.metrics, where=parse_where(spec.catalog_filter),
+                                          exclude_ids=exclude_ids).catalog
+            catalog = catalog[~np.isin(catalog['satnum'], seen_ids)][:spec.subset_size]
+            seen_ids = np.concatenate([seen_ids, catalog['satnum']])
+            catalogs.append(catalog)
+            labels.append(np.full(len(catalog), c, dtype=np.intp))
+            print(f"  Chòm sao {spec.name}: {len(catalog)} vệ tinh ({os.path.basename(path)})")
+        return (SatellitePropagator.from_catalog(np.concatenate(catalogs), metrics=self.metrics),
+                np.concatenate(labels))
+
+    def _tle_sha1(self):
+        """Hash nội dung file TLE nguồn (nhiều chòm sao: hash của các hash theo thứ tự)."""
+        if len(self.tle_paths) == 1:
+            return content_sha1(self.tle_path)
+        return hashlib.sha1(''.join(content_sha1(path) for path in self.tle_paths).encode()).hexdigest()
+
+    def _cached_position_provider(self, provider):
+        """Bọc bộ cung cấp vị trí bằng mục bộ đệm của kịch bản (tính và lưu nếu chưa có)."""
+        max_gb = self.config.get('POSITION_CACHE_MAX_GB')
+        cache = PositionCache(os.path.join(BASE_DIR, self.config['POSITION_CACHE_DIR']),
+                              max_bytes=max_gb * 1024 ** 3 if max_gb else DEFAULT_MAX_BYTES)
+        provider_info = {'POSITION_PROVIDER': provider}
+        if self.interpolated:
+            # Bước neo (tự chọn theo tập vệ tinh) quyết định vị trí nội suy -> là một phần của khóa
+            provider_info['anchor_step_s'] = self.position_provider.anchor_step_s
+        if self.catalog_filtered:
+            # Catalog đã lọc chỉ là một phần của file TLE -> tập vệ tinh được chọn là một phần của khóa
+            provider_info['catalog_sha1'] = hashlib.sha1(self.sat_propagator.sat_ids.tobytes()).hexdigest()
+        if len(self.tle_paths) > 1:
+            provider_info['sources_sha1'] = self._tle_sha1()
+        time_grid = self._build_time_grid()
+        key, fields = position_cache_key(self.tle_path, self.start_time, self.time_step.total_seconds(),
+                                         len(time_grid), provider_info)
+        return cache.get_or_compute(key, fields, self.position_provider, time_grid, self.sat_propagator.n_satellites,
+                                    self.config.get('CHUNK_STEPS', DEFAULT_CHUNK_STEPS),
+                                    fallback=self.position_provider)
+
+    def _dataset_metadata(self):
+        """Thông tin kịch bản được lưu kèm dataset (meta.json)."""
+        metadata = {
+            'scenario_name': self.scenario_name,
+            'start_time': self.start_time.isoformat(),
+            'time_step_seconds': self.time_step.total_seconds(),
+            'interpolation_error_bound_m': (self.position_provider.error_bound_km * 1000.0
+                                            if self.interpolated else None),
+            'config': self.config,
+        }
+        if self.constellation_specs:
+            # Khoảng chỉ số node [start, end) của từng chòm sao (vệ tinh ghép theo thứ tự CONSTELLATIONS)
+            bounds = np.searchsorted(self.node_constellation, np.arange(len(self.constellation_specs) + 1))
+            metadata['constellations'] = {spec.name: [int(bounds[c]), int(bounds[c + 1])]
+                                          for c, spec in enumerate(self.constellation_specs)}
+        return metadata
+
+    def _run_fingerprint(self):
+        """Hash nội dung file TLE và hash cấu hình (bỏ RUN_ONLY_KEYS) - lưu trong manifest để kiểm tra khi tiếp tục."""
+        config = {key: value for key, value in self.config.items() if key not in RUN_ONLY_KEYS}
+        return {
+            'tle_sha1': self._tle_sha1(),
+            'config_sha1': hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest(),
+        }
+
+    def _resume_manifest(self, dataset_dir, fingerprint, n_steps):
+        """Manifest của lần chạy bị ngắt cần tiếp tục (None nếu chưa có checkpoint nào -> chạy từ đầu)."""
+        manifest = read_manifest(dataset_dir)
+        if manifest is None:
+            print(f"RESUME: chưa có checkpoint tại {dataset_dir}, chạy từ đầu.")
+            return None
+        changed = [key for key, value in fingerprint.items() if manifest.get(key) != value]
+        if changed:
+            raise ValueError(f"Không thể tiếp tục {dataset_dir}: {', '.join(changed)} khác với lần chạy trước "
+                             f"(xóa dataset hoặc chạy lại không có RESUME)")
+        if manifest['n_steps'] > n_steps:
+            raise ValueError(f"Không thể tiếp tục {dataset_dir}: dataset đã có {manifest['n_steps']} bước, "
+                             f"nhiều hơn lưới thời gian hiện tại ({n_steps} bước)")
+        return manifest
+
+    @property
+    def metrics_path(self):
+        """File metrics JSON Lines của lần chạy (khi COLLECT_METRICS bật)."""
+        return os.path.join(self.output_dir, f"{self.scenario_name}_metrics.jsonl")
+
+    @property
+    def deltas_path(self):
+        """Thư mục luồng edge-delta nhị phân của chế độ INCREMENTAL (xem Incremental_Topology)."""
+        return os.path.join(self.output_dir, f"{self.scenario_name}_deltas")
+
+    def effective_topology_mode(self):
+        """
+        TOPOLOGY_MODE sẽ chạy: INCREMENTAL chuyển sang FULL khi bước thời gian quá thô cho danh sách ứng viên
+        (vệ tinh dịch chuyển quá INCREMENTAL_SKIN_KM / 4 mỗi bước -> mọi bước đều phải tính lại trực tiếp, luồng
+        delta không rẻ hơn dataset FULL). Độ dịch chuyển đo trên hai bước thời gian đầu tiên.
+        """
+        topology_mode = self.config.get('TOPOLOGY_MODE', 'FULL')
+        if topology_mode != 'INCREMENTAL':
+            return topology_mode
+        if (self.link_model.isl_assignment not in (ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY)
+                or self.link_model.isl_partition is not None):
+            print(f"Cảnh báo: INCREMENTAL với ISL_ASSIGNMENT {self.link_model.isl_assignment}"
+                  f"{' và CONSTELLATIONS' if self.link_model.isl_partition is not None else ''} không có danh sách "
+                  f"ứng viên -> mọi bước đều tính lại trực tiếp (chỉ luồng delta nhỏ hơn, không nhanh hơn FULL).")
+        time_grid = self._build_time_grid()[:2]
+        if len(time_grid) < 2:
+            return topology_mode
+        positions, _ = self.position_provider.propagate_batch(time_grid, self.sat_indices)
+        step_km = IncrementalTopology.step_displacement_km(positions[:, 0], positions[:, 1])
+        skin_km = self.config.get('INCREMENTAL_SKIN_KM', DEFAULT_SKIN_KM)
+        if step_km > skin_km / 4.0:
+            print(f"Cảnh báo: mỗi bước vệ tinh dịch chuyển {step_km:.1f} km > INCREMENTAL_SKIN_KM / 4 "
+                  f"({skin_km / 4.0:.1f} km), mọi bước đều tính lại trực tiếp -> chạy chế độ FULL thay cho INCREMENTAL.")
+            return 'FULL'
+        return topology_mode
+
+    @property
+    def profile_path(self):
+        """File cProfile (pstats) của lần chạy nếu PROFILE_RUN bật, ngược lại None."""
+        if not self.config.get('PROFILE_RUN', False):
+            return None
+        return os.path.join(self.output_dir, f"{self.scenario_name}.prof")
+
+    def _build_time_grid(self):
+        """Danh sách các thời điểm snapshot từ START_TIME tới hết DURATION_MINUTES."""
         current_time = self.start_time
         end_time = self.start_time + self.duration
-        step_count = 0
+        time_grid = []
+        while current_time <= end_time:
+            time_grid.append(current_time)
+            current_time += self.time_step
+        return time_grid
+
+    def _split_time_grid(self, time_grid, chunk_steps, first_step=0):
+        """
+        Chia lưới thời gian thành các cửa sổ liên tiếp [(step, datetime), ...] dài chunk_steps bước,
+        bắt đầu từ bước first_step (bỏ qua các bước đã hoàn tất khi tiếp tục).
+        """
+        steps = list(enumerate(time_grid))[first_step:]
+        return [steps[k:k + chunk_steps] for k in range(0, len(steps), chunk_steps)]
+
+    def _compute_chunk(self, chunk):
+        """
+        Tính các snapshot của một cửa sổ thời gian: lan truyền theo lô rồi xây dựng ISL và GSL.
+        Mỗi snapshot độc lập với nhau (chỉ phụ thuộc tập TLE), nên có thể chạy trên worker bất kỳ.
+        Trả về danh sách bản ghi dạng mảng (nhẹ, dễ pickle) theo thứ tự thời gian.
+        """
+        times = [current_time for _, current_time in chunk]
+        # Doppler / thời gian sống liên kết cần vận tốc (SGP4 chính xác, không sai phân hữu hạn)
+        sat_vel_batch = None
+        if self.link_model.link_metrics.needs_velocity:
+            sat_pos_batch, sat_vel_batch, sat_errors = self.position_provider.propagate_states(times, self.sat_indices)
+        else:
+            sat_pos_batch, sat_errors = self.position_provider.propagate_batch(times, self.sat_indices)
+        interpolation_error = self.position_provider.measured_max_error_km if self.interpolated else 0.0
         
-        graphs_sequence = []
+        records = []
+        for k, (step_count, current_time) in enumerate(chunk):
+            # Vị trí Vệ tinh hợp lệ (bỏ các vệ tinh lan truyền lỗi)
+            valid_idx = np.flatnonzero(sat_errors[:, k] == 0)
+            i, j, distance = self.link_model.compute_isl_edges(sat_pos_batch[valid_idx, k], valid_idx)
+            # GSL: góc nâng/khoảng cách nghiêng cho mọi cặp trạm x vệ tinh hợp lệ (ma trận NumPy)
+            gsl_site, gsl_sat, gsl_distance = self.link_model.compute_gsl_edges(
+                self.ground_sites.positions, self.ground_sites.up, sat_pos_batch[valid_idx, k])
+            # Bảng định tuyến trên chỉ số node (vệ tinh trước, trạm mặt đất sau), sửa tăng dần từ bước trước
+            route_dist = route_next_hop = None
+            if self.routing is not None:
+                with self.metrics.stage(STAGE_ROUTING):
+                    route_dist, route_next_hop = self.routing.update(
+                        np.concatenate([valid_idx[i], valid_idx[gsl_sat]]),
+                        np.concatenate([valid_idx[j], len(self.node_ids) + gsl_site]),
+                        self.link_model.calculate_delay(np.concatenate([distance, gsl_distance])))
+            edge_attributes = self._link_attributes(sat_pos_batch[:, k],
+                                                    sat_vel_batch[:, k] if sat_vel_batch is not None else None,
+                                                    valid_idx, i, j, distance, gsl_site, gsl_sat, gsl_distance)
+            records.append({
+                'time_step': step_count,
+                'timestamp': current_time,
+                'positions': sat_pos_batch[:, k],
+                'valid_idx': valid_idx,
+                'i': i,
+                'j': j,
+                'distance_km': distance,
+                'gsl_site': gsl_site,
+                'gsl_sat': gsl_sat,
+                'gsl_distance_km': gsl_distance,
+                'route_dist': route_dist,
+                'route_next_hop': route_next_hop,
+                'edge_attributes': edge_attributes,
+                'interpolation_error_km': interpolation_error,
+                # Metrics cộng dồn tới bước này (lan truyền cả cửa sổ tính vào bước đầu tiên); {} khi tắt đo đạc
+                'metrics': self.metrics.collect(),
+            })
+        return records
+
+    def _link_attributes(self, sat_pos, sat_vel, valid_idx, i, j, distance, gsl_site, gsl_sat, gsl_distance):
+        """
+        Thuộc tính cạnh bổ sung (LinkModel.compute_link_attributes) theo lô cho mọi cạnh ISL rồi GSL của một bước,
+        trên không gian chỉ số node (vệ tinh trước, trạm mặt đất sau; trạm có vận tốc ECEF bằng 0).
+        """
+        if not self.link_model.link_metrics.attributes:
+            return {}
+        n_sats, n_sites = len(self.node_ids), len(self.ground_sites)
+        positions = np.concatenate([sat_pos, self.ground_sites.positions])
+        velocities = np.concatenate([sat_vel, np.zeros((n_sites, 3))]) if sat_vel is not None else None
+        up = np.concatenate([np.zeros((n_sats, 3)), self.ground_sites.up])
+        edge_type = np.concatenate([np.full(len(i), EDGE_ISL), np.full(len(gsl_site), EDGE_GSL)])
+        return self.link_model.compute_link_attributes(
+            np.concatenate([valid_idx[i], valid_idx[gsl_sat]]), np.concatenate([valid_idx[j], n_sats + gsl_site]),
+            edge_type, positions, velocities, up, np.concatenate([distance, gsl_distance]))
+
+    def _iter_records(self, time_grid, workers, chunk_steps, first_step=0):
+        """Sinh các bản ghi snapshot từ bước first_step theo đúng thứ tự thời gian (tuần tự hoặc song song)."""
+        chunks = self._split_time_grid(time_grid, chunk_steps, first_step)
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self._compute_chunk(chunk)
+            return
         
-        while current_time <= end_time:
-            print(f"\n[{current_time.isoformat()}] Bắt đầu tính toán snapshot {step_count}...")
-            
-            # 1. Tính toán vị trí của tất cả node (Satellites + GS)
-            
-            # 1a. Vị trí Vệ tinh (sử dụng Propagator)
-            sat_positions = {}
-            for sat in self.satellites:
-                try:
-                    # Lấy vị trí ECEF (ITRF)
-                    pos = self.sat_propagator.get_position_at_time(current_time, sat)
-                    sat_positions[sat.model.satnum] = {
-                        'name': sat.name.strip(),
-                        'pos_km': pos
-                    }
-                except Exception:
+        print(f"Chạy song song: {workers} worker, {len(chunks)} cửa sổ x {chunk_steps} bước.")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.config_path, self.overrides)) as executor:
+            # Chỉ giữ tối đa MAX_INFLIGHT_CHUNKS_PER_WORKER cửa sổ đang chạy/chờ cho mỗi worker,
+            # và nhận kết quả theo đúng thứ tự cửa sổ -> gộp tất định, bộ nhớ không tăng theo DURATION_MINUTES
+            max_inflight = workers * MAX_INFLIGHT_CHUNKS_PER_WORKER
+            pending = deque()
+            chunk_iter = iter(chunks)
+            for chunk in islice(chunk_iter, max_inflight):
+                pending.append(executor.submit(_compute_chunk_in_worker, chunk))
+            while pending:
+                records = pending.popleft().result()
+                for chunk in islice(chunk_iter, 1):
+                    pending.append(executor.submit(_compute_chunk_in_worker, chunk))
+                yield from records
+
+    def stream_graphs(self, workers=None, chunk_steps=None, build_graphs=True):
+        """
+        Generator: sinh lần lượt từng snapshot G(t) thay vì trả về cả danh sách.
+        Việc ghi dataset chạy trên một luồng nền sau hàng đợi có giới hạn (BackgroundWriter),
+        nên lan truyền, xây dựng liên kết và ghi file chồng lấp nhau, bộ nhớ đỉnh gần như không đổi.
+        Mỗi G(t) là GraphSnapshot (mảng node + CSR, xem Graph_Snapshot); cần nx.Graph thì gọi G_t.to_networkx().
+        build_graphs=False: sinh bản ghi dạng mảng (không dựng GraphSnapshot) để chạy nhanh nhất.
+        workers / chunk_steps: số tiến trình và độ dài cửa sổ thời gian (mặc định lấy từ
+        PARALLEL_WORKERS / CHUNK_STEPS trong kịch bản).
+        Sau mỗi cửa sổ, dataset được checkpoint (manifest.json: các bước đã xong, hash TLE và cấu hình);
+        RESUME: tiếp tục lần chạy bị ngắt từ checkpoint cuối, bỏ qua các cửa sổ đã hoàn tất.
+        """
+        workers = workers or self.config.get('PARALLEL_WORKERS', 1)
+        chunk_steps = chunk_steps or self.config.get('CHUNK_STEPS', DEFAULT_CHUNK_STEPS)
+        
+        time_grid = self._build_time_grid()
+        node_ids, node_names = self.graph_node_ids, self.graph_node_names
+        node_id_array, node_name_array = np.asarray(node_ids, dtype=np.int64), np.asarray(node_names)
+        n_sats = len(self.node_ids)
+        site_index = n_sats + np.arange(len(self.ground_sites))
+        site_positions = self.ground_sites.positions
+        
+        # Dataset nhị phân dạng cột (memory-mappable) thay cho một file GEXF mỗi bước
+        dataset_dir = os.path.join(self.output_dir, self.scenario_name)
+        fingerprint = self._run_fingerprint()
+        manifest = (self._resume_manifest(dataset_dir, fingerprint, len(time_grid))
+                    if self.config.get('RESUME', False) else None)
+        first_step = manifest['n_steps'] if manifest is not None else 0
+        completed = list(manifest['completed']) if manifest is not None else []
+        if manifest is not None:
+            print(f"RESUME: đã hoàn tất {first_step}/{len(time_grid)} bước, tiếp tục từ bước {first_step}.")
+        writer = BackgroundWriter(
+            GraphDatasetWriter(dataset_dir, node_ids, node_names, metadata=self._dataset_metadata(),
+                               routing_sources=self.routing_sources,
+                               edge_attributes=self.link_model.link_metrics.attributes, resume_from=manifest),
+            max_queue=self.config.get('WRITER_QUEUE_SIZE', DEFAULT_WRITER_QUEUE_SIZE), metrics=self.metrics)
+        metrics_log = None
+        if self.metrics.enabled:
+            metrics_log = MetricsLog(self.metrics_path, {
+                'scenario_name': self.scenario_name, 'n_satellites': n_sats,
+                'n_ground_sites': len(self.ground_sites), 'n_steps': len(time_grid), 'workers': workers,
+                'first_step': first_step}, append=manifest is not None)
+        n_failed = 0
+        max_interpolation_error = 0.0
+        complete = False
+        
+        try:
+            # 1. Lan truyền vị trí theo lô và xây dựng ISL cho từng cửa sổ thời gian
+            for record in self._iter_records(time_grid, workers, chunk_steps, first_step):
+                step_count, current_time = record['time_step'], record['timestamp']
+                print(f"\n[{current_time.isoformat()}] Hoàn tất tính toán snapshot {step_count}...")
+                valid_idx, i, j, distance = record['valid_idx'], record['i'], record['j'], record['distance_km']
+                gsl_site, gsl_sat, gsl_distance = record['gsl_site'], record['gsl_sat'], record['gsl_distance_km']
+                n_failed += n_sats - len(valid_idx)
+                max_interpolation_error = max(max_interpolation_error, record['interpolation_error_km'])
+                
+                # 1b. Gộp cạnh ISL (vệ tinh-vệ tinh) và GSL (vệ tinh-trạm mặt đất)
+                all_distance = np.concatenate([distance, gsl_distance])
+                edge_type = np.concatenate([np.full(len(i), EDGE_ISL, dtype=np.uint8),
+                                            np.full(len(gsl_site), EDGE_GSL, dtype=np.uint8)])
+                
+                # 2. Lưu trữ snapshot vào dataset trên luồng nền (chỉ số node: vệ tinh trước, trạm mặt đất sau)
+                writer.append(current_time, np.concatenate([record['positions'], site_positions]),
+                              np.concatenate([valid_idx[i], valid_idx[gsl_sat]]),
+                              np.concatenate([valid_idx[j], n_sats + gsl_site]),
+                              self.link_model.calculate_delay(all_distance), all_distance, edge_type,
+                              record['route_dist'], record['route_next_hop'], record['edge_attributes'])
+                # Hết một cửa sổ: checkpoint sau khi luồng nền ghi xong mọi bước tới đây (khoảng đã hoàn tất
+                # của lần chạy này được nối vào danh sách của các lần chạy trước)
+                if (step_count + 1 - first_step) % chunk_steps == 0 or step_count == len(time_grid) - 1:
+                    writer.checkpoint(dict(fingerprint, completed=completed + [{
+                        'steps': [first_step, step_count + 1],
+                        'start_time': time_grid[first_step].isoformat(),
+                        'end_time': current_time.isoformat()}]))
+                
+                if not build_graphs:
+                    if metrics_log is not None:
+                        metrics_log.write_snapshot(step_count, current_time,
+                                                   merge_metrics(record['metrics'], self.metrics.collect()))
+                    yield record
                     continue
-            
-            # 1b. Thêm vị trí Trạm Mặt đất (GS) 
-            # (Chúng ta sẽ đơn giản hóa bằng cách sử dụng các vệ tinh trong GS_LOCATION_FILE làm 'trạm mặt đất' 
-            # để có tọa độ ban đầu. Trong thực tế, GS là cố định trên mặt đất.)
-            
-            # CHÚ Ý: ĐỂ ĐƠN GIẢN VÀ TEST LOGIC: Ta dùng các vệ tinh GS_LOCATION_FILE làm các node đặc biệt 
-            # (ví dụ: các vệ tinh relay ở quỹ đạo cao hơn)
-            # Nếu muốn mô phỏng GS thực, cần định nghĩa tọa độ Latitude/Longitude cố định.
-            
-            # Tạm thời: Ta chỉ tập trung vào ISL để kiểm tra ACO/Q-ACO trên mạng động lớn.
-            
-            # 2. Tạo Đồ thị G(t)
-            G_t = self.link_model.create_dynamic_graph(sat_positions)
-            G_t.graph['time_step'] = step_count
-            G_t.graph['timestamp'] = current_time.isoformat()
-            
-            # 3. Lưu trữ Đồ thị (Sử dụng GEXF hoặc JSON/CSV để dễ dàng public)
-            
-            # Định dạng file GEXF là tốt cho các công cụ trực quan hóa
-            # Định dạng file JSON là tốt cho việc đọc bằng code
-            filename = f"{self.scenario_name}_T{step_count:03d}.gexf"
-            filepath = os.path.join(OUTPUT_DATASET_DIR, filename)
-            
-            # networkx có thể export GEXF
-            nx.write_gexf(G_t, filepath)
-            
-            graphs_sequence.append(G_t)
-            
-            # 4. Tăng thời gian
-            current_time += self.time_step
-            step_count += 1
+                
+                # 3. Tạo Đồ thị G(t) (GraphSnapshot: node hợp lệ rồi trạm mặt đất)
+                n_valid = len(valid_idx)
+                graph_nodes = np.concatenate([valid_idx, site_index])
+                G_t = self.link_model.build_graph(
+                    node_id_array[graph_nodes], node_name_array[graph_nodes],
+                    np.concatenate([record['positions'][valid_idx], site_positions]),
+                    np.concatenate([i, gsl_sat]), np.concatenate([j, n_valid + gsl_site]),
+                    all_distance, edge_type, record['edge_attributes'])
+                G_t.graph['time_step'] = step_count
+                G_t.graph['timestamp'] = current_time.isoformat()
+                if metrics_log is not None:
+                    metrics_log.write_snapshot(step_count, current_time,
+                                               merge_metrics(record['metrics'], self.metrics.collect()))
+                yield G_t
+            complete = True
+        finally:
+            # Lỗi, ngắt hoặc generator bị bỏ dở: không ghi meta.json, checkpoint cuối là điểm tiếp tục (RESUME)
+            writer.close(complete=complete)
+            if metrics_log is not None:
+                # Phần ghi còn lại trên luồng nền sau snapshot cuối cùng
+                metrics_log.close(self.metrics.collect())
+                print(f"Metrics lưu tại: {metrics_log.filepath}")
+        
+        if n_failed:
+            print(f"Cảnh báo: {n_failed} lần lan truyền SGP4 thất bại (đã bị loại khỏi snapshot tương ứng).")
+        if self.interpolated:
+            print(f"Nội suy vị trí: sai số đo được tối đa {max_interpolation_error * 1000.0:.3f} m "
+                  f"(cận lý thuyết {self.position_provider.error_bound_km * 1000.0:.3f} m).")
+        print(f"Dataset lưu tại: {dataset_dir}")
+        
+        # Định dạng file GEXF là tốt cho các công cụ trực quan hóa (tùy chọn, chuyển đổi từ dataset)
+        if self.config.get('EXPORT_GEXF', False):
+            export_gexf(dataset_dir, self.output_dir, prefix=self.scenario_name)
             
         print(f"\n--- HOÀN TẤT TẠO DATASET ---")
-        print(f"Đã tạo {step_count} snapshot đồ thị trong {self.config['DURATION_MINUTES']} phút.")
-        return graphs_sequence
+        print(f"Đã tạo {len(time_grid) - first_step} snapshot đồ thị (dataset {len(time_grid)} bước) "
+              f"trong {self.config['DURATION_MINUTES']} phút.")
+
+    def generate_graphs(self, workers=None, chunk_steps=None):
+        """Chạy mô phỏng theo thời gian và tạo chuỗi đồ thị (giữ toàn bộ trong bộ nhớ)."""
+        return list(self.stream_graphs(workers, chunk_steps))
+
+    def generate_dataset(self, workers=None, chunk_steps=None):
+        """Chỉ tạo dataset trên đĩa (không giữ đồ thị nào trong bộ nhớ). Trả về thư mục dataset."""
+        for _ in self.stream_graphs(workers, chunk_steps, build_graphs=False):
+            pass
+        return os.path.join(self.output_dir, self.scenario_name)
+
+    def stream_deltas(self, chunk_steps=None):
+        """
+        Chế độ topo tăng dần: sinh lần lượt luồng thay đổi cạnh (added/removed/reweighted) giữa các
+        snapshot thay vì ghi lại toàn bộ đồ thị ở mỗi bước. Bước 0 chứa toàn bộ cạnh trong 'added'.
+        Độ trễ được phát kèm tốc độ thay đổi (từ vận tốc), 'reweighted' chỉ khi dự đoán tuyến tính lệch quá
+        DELTA_REWEIGHT_TOLERANCE_S. Luồng được ghi dạng cột nhị phân vào deltas_path (mỗi cửa sổ thời gian
+        một lần ghi) trên luồng nền. Chỉ gồm các cạnh ISL (trạm mặt đất chỉ có trong chế độ FULL).
+        """
+        chunk_steps = chunk_steps or self.config.get('CHUNK_STEPS', DEFAULT_CHUNK_STEPS)
+        time_grid = self._build_time_grid()
+        node_ids = self.node_ids
+        reweight_tolerance_s = self.config.get('DELTA_REWEIGHT_TOLERANCE_S', DEFAULT_REWEIGHT_TOLERANCE_S)
+        
+        topology = IncrementalTopology(
+            self.link_model, node_ids,
+            skin_km=self.config.get('INCREMENTAL_SKIN_KM', DEFAULT_SKIN_KM),
+            reweight_tolerance_s=reweight_tolerance_s,
+        )
+        
+        filepath = self.deltas_path
+        writer = BackgroundWriter(DeltaStreamWriter(filepath, node_ids, reweight_tolerance_s,
+                                                    metadata={'scenario_name': self.scenario_name,
+                                                              'start_time': self.start_time.isoformat(),
+                                                              'time_step_seconds': self.time_step.total_seconds()}),
+                                  max_queue=self.config.get('WRITER_QUEUE_SIZE', DEFAULT_WRITER_QUEUE_SIZE))
+        complete = False
+        try:
+            # Lan truyền theo từng cửa sổ thời gian để bộ nhớ không tăng theo độ dài kịch bản
+            for chunk in self._split_time_grid(time_grid, chunk_steps):
+                sat_pos_batch, sat_vel_batch, _ = self.position_provider.propagate_states(
+                    [t for _, t in chunk], self.sat_indices)
+                chunk_deltas = []
+                for k, (step_count, current_time) in enumerate(chunk):
+                    delta = topology.update(sat_pos_batch[:, k], sat_vel_batch[:, k],
+                                            (current_time - self.start_time).total_seconds())
+                    delta['time_step'] = step_count
+                    delta['timestamp'] = current_time
+                    print(f"[{current_time.isoformat()}] Snapshot {step_count}: {delta['n_edges']} cạnh, "
+                          f"+{len(delta['added']['src'])} / -{len(delta['removed']['src'])} / "
+                          f"~{len(delta['reweighted']['src'])}")
+                    chunk_deltas.append(delta)
+                    yield delta
+                writer.append(chunk_deltas)
+            complete = True
+        finally:
+            writer.close(complete=complete)
+        
+        print(f"\n--- HOÀN TẤT TẠO LUỒNG THAY ĐỔI TOPO ---")
+        print(f"Đã tạo {len(time_grid)} bước, xây dựng lại danh sách ứng viên {topology.n_rebuilds} lần, "
+              f"{topology.n_full_steps} bước tính trực tiếp.")
+        print(f"Luồng edge-delta lưu tại: {filepath}")
+
+    def generate_deltas(self, chunk_steps=None):
+        """Tạo toàn bộ luồng edge-delta và trả về dưới dạng danh sách."""
+        return list(self.stream_deltas(chunk_steps))
+
+    def generate_contact_plan(self):
+        """
+        Chế độ contact plan: tính chính xác thời điểm bắt đầu/kết thúc của mọi liên kết ISL/GSL trong
+        khung DURATION_MINUTES (sàng lọc thô + tìm nghiệm) thay vì lấy mẫu topo ở từng TIME_STEP_SECONDS.
+        Lưu bảng khoảng liên kết ra .npz (dạng cột) và .csv. Trả về ContactPlan.
+        """
+        if self.constellation_specs:
+            raise ValueError("TOPOLOGY_MODE CONTACT_PLAN chưa hỗ trợ CONSTELLATIONS (ràng buộc liên kết theo shell)")
+        planner = ContactPlanner(
+            self.sat_propagator, self.link_model, self.sat_indices, self.graph_node_ids, self.ground_sites,
+            screen_step_s=self.config.get('CONTACT_SCREEN_STEP_SECONDS', DEFAULT_SCREEN_STEP_S))
+        plan = planner.compute(self.start_time, self.duration.total_seconds())
+        
+        filepath = os.path.join(self.output_dir, f"{self.scenario_name}_contact_plan")
+        plan.save(f"{filepath}.npz")
+        plan.to_csv(f"{filepath}.csv")
+        print(f"\n--- HOÀN TẤT TÍNH CONTACT PLAN ---")
+        print(f"Đã tìm {len(plan)} khoảng liên kết trong {self.config['DURATION_MINUTES']} phút.")
+        print(f"Contact plan lưu tại: {filepath}.npz / .csv")
+        return plan
 
 # --- Hàm chạy chính ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tạo dataset đồ thị động NTN từ kịch bản YAML.")
+    parser.add_argument('--config', default=os.path.join(SCENARIOS_DIR, 'Starlink_V1_Normal.yaml'),
+                        help="Đường dẫn file kịch bản YAML")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Số tiến trình song song (ghi đè PARALLEL_WORKERS)")
+    parser.add_argument('--chunk-steps', type=int, default=None,
+                        help="Số bước thời gian mỗi cửa sổ (ghi đè CHUNK_STEPS)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Ghi metrics theo tầng ra <scenario>_metrics.jsonl (ghi đè COLLECT_METRICS)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Tiếp tục lần chạy bị ngắt từ checkpoint cuối trong manifest.json (ghi đè RESUME)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Ghi cProfile của lần chạy ra <scenario>.prof (ghi đè PROFILE_RUN)")
+    return parser.parse_args()
+
 def main_generator():
+    args = parse_args()
+    
     # Đảm bảo file cấu hình tồn tại
-    config_path = os.path.join(SCENARIOS_DIR, 'Starlink_V1_Normal.yaml')
+    config_path = args.config
     if not os.path.exists(config_path):
         print(f"Lỗi: File cấu hình không tồn tại tại {config_path}")
         return
 
-    # Khởi chạy quá trình tạo Dataset
-    generator = DynamicGraphGenerator(config_path)
-    graphs = generator.generate_graphs()
+    overrides = {}
+    if args.workers is not None:
+        overrides['PARALLEL_WORKERS'] = args.workers
+    if args.chunk_steps is not None:
+        overrides['CHUNK_STEPS'] = args.chunk_steps
+    if args.metrics:
+        overrides['COLLECT_METRICS'] = True
+    if args.profile:
+        overrides['PROFILE_RUN'] = True
+    if args.resume:
+        overrides['RESUME'] = True
+
+    # Khởi chạy quá trình tạo Dataset (dưới cProfile nếu PROFILE_RUN bật)
+    generator = DynamicGraphGenerator(config_path, overrides)
+    with profiled(generator.profile_path):
+        run_generator(generator)
+    if generator.profile_path:
+        print(f"cProfile lưu tại: {generator.profile_path}")
+
+def run_generator(generator):
+    """Chạy Generator theo TOPOLOGY_MODE của kịch bản."""
+    topology_mode = generator.effective_topology_mode()
+    if topology_mode == 'INCREMENTAL':
+        for _ in generator.stream_deltas():
+            pass
+        return
+    if topology_mode == 'CONTACT_PLAN':
+        generator.generate_contact_plan()
+        return
+    
+    # Duyệt theo luồng: chỉ giữ lại đồ thị đầu tiên để kiểm tra, bộ nhớ không tăng theo độ dài kịch bản
+    G0 = None
+    for G_t in generator.stream_graphs():
+        if G0 is None:
+            G0 = G_t
     
     # Kiểm tra đồ thị mẫu đầu tiên
-    if graphs:
-        G0 = graphs[0]
+    if G0 is not None:
         print(f"\nPhân tích đồ thị đầu tiên (T=0):")
         print(f"  Nodes: {G0.number_of_nodes()}, Edges: {G0.number_of_edges()}")
 
@@ -0,0 +1,234 @@
+# 02_Modeling_Code/Graph_Snapshot.py
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Loại cạnh (mã số nguyên = chỉ số trong danh sách)
+EDGE_TYPES = ['ISL', 'GSL']
+EDGE_ISL = 0
+EDGE_GSL = 1
+
+# --- SNAPSHOT ĐỒ THỊ DẠNG MẢNG (THAY CHO nx.Graph DẠNG DICT-OF-DICTS) ---
+# Node: ID, tên và vị trí (N, 3) float64 nằm trong các mảng liền khối; chỉ số node = vị trí trong node_ids.
+# Cạnh: mỗi cạnh vô hướng một lần (src, dst, các thuộc tính song song weight_delay / distance_km / edge_type,
+# chỉ số là edge id). Kề theo CSR đối xứng: hàng u là indices[indptr[u]:indptr[u + 1]] (tăng dần), và
+# edge_id cùng vị trí trỏ về cạnh tương ứng -> tra thuộc tính không cần dict nào cho từng cạnh.
+# Thuộc tính cạnh bổ sung (Link_Metrics: fspl_db, snr_db...) nằm trong edge_attributes {tên: mảng (E,)}.
+# Các phương thức number_of_nodes / number_of_edges / degree / neighbors / has_edge / get_edge_data
+# giữ cùng tên và kiểu trả về với networkx (theo ID node) để code cũ vẫn chạy (mảng bậc: degrees()); cần thuật toán
+# của networkx thì dùng to_networkx().
+
+class GraphSnapshot:
+    """Đồ thị G(t) của một snapshot, lưu hoàn toàn bằng mảng NumPy (xem chú thích đầu module)."""
+    __slots__ = ('node_ids', 'names', 'positions', 'src', 'dst', 'weight_delay', 'distance_km', 'edge_type',
+                 'edge_attributes', 'indptr', 'indices', 'edge_id', 'graph', '_sorter')
+
+    def __init__(self, node_ids, names, positions, src, dst, weight_delay, distance_km, edge_type,
+                 indptr, indices, edge_id, graph=None, edge_attributes=None):
+        """Dùng GraphSnapshot.from_edges để dựng từ danh sách cạnh; hàm này chỉ gán các mảng đã sẵn sàng."""
+        self.node_ids = node_ids
+        self.names = names
+        self.positions = positions
+        self.src = src
+        self.dst = dst
+        self.weight_delay = weight_delay
+        self.distance_km = distance_km
+        self.edge_type = edge_type
+        self.edge_attributes = dict(edge_attributes or {})
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_id = edge_id
+        self.graph = dict(graph or {})  # Thuộc tính đồ thị (time_step, timestamp), giống G.graph của networkx
+        self._sorter = None
+
+    @classmethod
+    def from_edges(cls, node_ids, names, positions, src, dst, weight_delay, distance_km, edge_type=None,
+                   prune_isolates=True, keep=None, graph=None, edge_attributes=None):
+        """
+        Dựng snapshot từ các mảng node và cạnh (src/dst là chỉ số node).
+        Cạnh lặp lại (u, v) / (v, u) được gộp, giữ lần xuất hiện sau cùng (giống nx.Graph.add_edges_from).
+        prune_isolates: bỏ các node không có cạnh nào (chỉ số node được đánh lại).
+        keep: mặt nạ node giữ lại đã tính sẵn (xem connected_nodes), dùng thay cho prune_isolates.
+        edge_attributes: thuộc tính cạnh bổ sung {tên: mảng song song với src}.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        names = np.asarray(names) if names is not None else None
+        positions = np.ascontiguousarray(positions, dtype=np.float64).reshape(len(node_ids), 3)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weight_delay = np.asarray(weight_delay, dtype=np.float64)
+        distance_km = np.asarray(distance_km, dtype=np.float64)
+        edge_type = (np.full(len(src), EDGE_ISL, dtype=np.uint8) if edge_type is None
+                     else np.broadcast_to(np.asarray(edge_type, dtype=np.uint8), src.shape).copy())
+        edge_attributes = {name: np.asarray(values) for name, values in (edge_attributes or {}).items()}
+
+        # 1. Gộp cạnh trùng theo khóa vô hướng (min, max)
+        n = len(node_ids)
+        key = np.minimum(src, dst) * n + np.maximum(src, dst)
+        if len(np.unique(key)) < len(key):
+            _, last = np.unique(key[::-1], return_index=True)
+            unique_edges = np.sort(len(key) - 1 - last)
+            src, dst, weight_delay, distance_km, edge_type = (src[unique_edges], dst[unique_edges],
+                                                              weight_delay[unique_edges], distance_km[unique_edges],
+                                                              edge_type[unique_edges])
+            edge_attributes = {name: values[unique_edges] for name, values in edge_attributes.items()}
+
+        # 2. Bỏ node cô lập và đánh lại chỉ số
+        if keep is None and prune_isolates:
+            keep = cls.connected_nodes(n, src, dst)
+        if keep is not None and not keep.all():
+            remap = np.cumsum(keep) - 1
+            src, dst = remap[src], remap[dst]
+            node_ids, positions = node_ids[keep], positions[keep]
+            names = names[keep] if names is not None else None
+
+        indptr, indices, edge_id = cls._csr(len(node_ids), src, dst)
+        return cls(node_ids, names, positions, src, dst, weight_delay, distance_km, edge_type,
+                   indptr, indices, edge_id, graph, edge_attributes)
+
+    @staticmethod
+    def connected_nodes(n_nodes, src, dst):
+        """Mặt nạ (n_nodes,) các node có ít nhất một cạnh."""
+        connected = np.zeros(n_nodes, dtype=bool)
+        connected[np.asarray(src, dtype=np.intp)] = True
+        connected[np.asarray(dst, dtype=np.intp)] = True
+        return connected
+
+    @staticmethod
+    def _csr(n_nodes, src, dst):
+        """
+        CSR đối xứng (indptr, indices, edge_id) của các cạnh vô hướng, cột tăng dần trong mỗi hàng.
+        indptr và indices cùng kiểu chỉ số (int32 nếu đủ) để scipy.sparse dùng lại trực tiếp, không ép kiểu.
+        """
+        n_edges = len(src)
+        index_dtype = np.int32 if max(2 * n_edges, n_nodes) < np.iinfo(np.int32).max else np.int64
+        rows = np.concatenate([src, dst])
+        cols = np.concatenate([dst, src])
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n_nodes + 1, dtype=index_dtype)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+        edge_id = np.concatenate([np.arange(n_edges), np.arange(n_edges)])[order]
+        return indptr, cols[order].astype(index_dtype), edge_id.astype(index_dtype)
+
+    # --- Kích thước ---
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    def number_of_nodes(self):
+        return self.n_nodes
+
+    def number_of_edges(self):
+        return self.n_edges
+
+    def __len__(self):
+        return self.n_nodes
+
+    @property
+    def nbytes(self):
+        """Tổng số byte của các mảng (node, cạnh, CSR)."""
+        arrays = (self.node_ids, self.positions, self.src, self.dst, self.weight_delay, self.distance_km,
+                  self.edge_type, self.indptr, self.indices, self.edge_id, *self.edge_attributes.values())
+        return sum(a.nbytes for a in arrays) + (self.names.nbytes if self.names is not None else 0)
+
+    # --- Tra cứu theo ID node ---
+    def index_of(self, node_id):
+        """Chỉ số node của ID (số hoặc mảng ID); KeyError nếu ID không có trong snapshot."""
+        if self._sorter is None:
+            self._sorter = np.argsort(self.node_ids, kind='stable')
+        ids = np.asarray(node_id, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.node_ids, ids, sorter=self._sorter), max(self.n_nodes - 1, 0))
+        index = self._sorter[pos] if self.n_nodes else pos
+        if self.n_nodes == 0 or np.any(self.node_ids[index] != ids):
+            raise KeyError(f"Node {node_id} không có trong snapshot")
+        return int(index) if index.ndim == 0 else index
+
+    def has_node(self, node_id):
+        try:
+            self.index_of(node_id)
+        except KeyError:
+            return False
+        return True
+
+    def __contains__(self, node_id):
+        return self.has_node(node_id)
+
+    def degrees(self):
+        """Bậc của từng node (mảng theo thứ tự node_ids)."""
+        return np.diff(self.indptr)
+
+    def degree(self, node_id=None):
+        """
+        Như networkx: bậc của node_id, hoặc (không truyền node_id) danh sách cặp (ID node, bậc) để dùng
+        dict(G.degree()). Cần mảng bậc thì dùng degrees().
+        """
+        if node_id is not None:
+            u = self.index_of(node_id)
+            return int(self.indptr[u + 1] - self.indptr[u])
+        return list(zip(self.node_ids.tolist(), self.degrees().tolist()))
+
+    def neighbors(self, node_id):
+        """ID các node kề của node_id."""
+        u = self.index_of(node_id)
+        return self.node_ids[self.indices[self.indptr[u]:self.indptr[u + 1]]]
+
+    def _edge_index(self, u_id, v_id):
+        """Edge id của cạnh (u, v) hoặc -1 (tìm nhị phân trong hàng CSR đã sắp xếp)."""
+        try:
+            u, v = self.index_of(u_id), self.index_of(v_id)
+        except KeyError:
+            return -1
+        start, end = self.indptr[u], self.indptr[u + 1]
+        k = start + np.searchsorted(self.indices[start:end], v)
+        return int(self.edge_id[k]) if k < end and self.indices[k] == v else -1
+
+    def has_edge(self, u_id, v_id):
+        return self._edge_index(u_id, v_id) >= 0
+
+    def get_edge_data(self, u_id, v_id, default=None):
+        """Thuộc tính cạnh (u, v) dạng dict như networkx (weight_delay, distance_km, type, edge_attributes)."""
+        e = self._edge_index(u_id, v_id)
+        if e < 0:
+            return default
+        return {'weight_delay': float(self.weight_delay[e]), 'distance_km': float(self.distance_km[e]),
+                'type': EDGE_TYPES[self.edge_type[e]],
+                **{name: float(values[e]) for name, values in self.edge_attributes.items()}}
+
+    # --- Bộ chuyển đổi ---
+    def adjacency_matrix(self, weight='weight_delay'):
+        """
+        Ma trận kề scipy.sparse (CSR, đối xứng) dùng chung indptr/indices với snapshot (không sao chép cấu trúc),
+        trọng số lấy theo thuộc tính cạnh weight ('weight_delay', 'distance_km' hoặc một tên trong edge_attributes).
+        Dùng trực tiếp với scipy.sparse.csgraph (đường đi ngắn nhất, thành phần liên thông...).
+        """
+        values = self.edge_attributes[weight] if weight in self.edge_attributes else getattr(self, weight)
+        data = values[self.edge_id]
+        return csr_matrix((data, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+
+    def to_networkx(self):
+        """
+        Chuyển thành nx.Graph (cùng node, thuộc tính và thứ tự như LinkModel tạo trước đây).
+        Thuộc tính 'pos' của node là view vào mảng positions (không sao chép); cạnh bắt buộc là dict của networkx.
+        """
+        import networkx as nx
+        G = nx.Graph(**self.graph)
+        ids = self.node_ids.tolist()
+        names = (self.names if self.names is not None else self.node_ids.astype(str)).tolist()
+        G.add_nodes_from((node_id, {'name': name, 'pos': pos}) for node_id, name, pos in zip(ids, names, self.positions))
+        G.add_edges_from(
+            (ids[a], ids[b], {'weight_delay': w, 'distance_km': d, 'type': EDGE_TYPES[c]})
+            for a, b, w, d, c in zip(self.src.tolist(), self.dst.tolist(), self.weight_delay.tolist(),
+                                     self.distance_km.tolist(), self.edge_type.tolist())
+        )
+        if self.edge_attributes:
+            nx.set_edge_attributes(G, {(ids[a], ids[b]): {name: float(values[e]) for name, values in
+                                                         self.edge_attributes.items()}
+                                       for e, (a, b) in enumerate(zip(self.src.tolist(), self.dst.tolist()))})
+        return G
+
+    def __repr__(self):
+        return f"GraphSnapshot({self.n_nodes} node, {self.n_edges} cạnh, {self.graph})"
@@ -0,0 +1,88 @@
+# 02_Modeling_Code/Ground_Station.py
+
+import numpy as np
+from typing import Dict, Any, List
+
+# --- ELLIPSOID WGS84 ---
+WGS84_A_KM = 6378.137                  # Bán trục lớn (km)
+WGS84_F = 1.0 / 298.257223563          # Độ dẹt
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)   # Bình phương tâm sai thứ nhất
+
+# Số cặp (trạm x vệ tinh) tối đa xử lý trong một khối ma trận, để giới hạn bộ nhớ tạm
+MAX_PAIRS_PER_BLOCK = 2_000_000
+
+def ground_node_id(k: int) -> int:
+    """ID node của trạm mặt đất thứ k (ID âm để không trùng với ID NORAD của vệ tinh)."""
+    return -(k + 1)
+
+def geodetic_to_ecef(lat_deg, lon_deg, alt_km) -> np.ndarray:
+    """Chuyển tọa độ trắc địa (vĩ độ, kinh độ, độ cao) sang ECEF (km), vector hóa. Trả về (M, 3)."""
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+    alt = np.asarray(alt_km, dtype=np.float64)
+    n = WGS84_A_KM / np.sqrt(1.0 - WGS84_E2 * np.sin(lat) ** 2)  # Bán kính cong thẳng đứng
+    x = (n + alt) * np.cos(lat) * np.cos(lon)
+    y = (n + alt) * np.cos(lat) * np.sin(lon)
+    z = (n * (1.0 - WGS84_E2) + alt) * np.sin(lat)
+    return np.stack([x, y, z], axis=-1)
+
+def local_up(lat_deg, lon_deg) -> np.ndarray:
+    """Vector pháp tuyến đơn vị (hướng 'lên' theo trắc địa) tại mỗi trạm. Trả về (M, 3)."""
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+class GroundSites:
+    """Danh sách trạm mặt đất cố định (lat/lon/alt) cùng tọa độ ECEF và vector 'lên' tính sẵn."""
+
+    def __init__(self, names: List[str], lat_deg, lon_deg, alt_km):
+        self.names = list(names)
+        self.lat_deg = np.asarray(lat_deg, dtype=np.float64)
+        self.lon_deg = np.asarray(lon_deg, dtype=np.float64)
+        self.alt_km = np.asarray(alt_km, dtype=np.float64)
+        self.node_ids = [ground_node_id(k) for k in range(len(self.names))]
+        # Trạm cố định trên mặt đất -> vị trí ECEF không đổi theo thời gian
+        self.positions = geodetic_to_ecef(self.lat_deg, self.lon_deg, self.alt_km).reshape(-1, 3)
+        self.up = local_up(self.lat_deg, self.lon_deg).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_config(cls, entries: List[Dict[str, Any]]):
+        """Tạo danh sách trạm từ khóa GROUND_STATIONS của kịch bản YAML."""
+        entries = entries or []
+        return cls(
+            [entry.get('NAME', f"GS-{k}") for k, entry in enumerate(entries)],
+            [entry['LAT_DEG'] for entry in entries],
+            [entry['LON_DEG'] for entry in entries],
+            [entry.get('ALT_KM', 0.0) for entry in entries],
+        )
+
+def compute_visibility(site_pos: np.ndarray, site_up: np.ndarray, sat_pos: np.ndarray, min_elevation_deg: float):
+    """
+    Tính góc nâng và khoảng cách nghiêng (slant range) cho mọi cặp trạm x vệ tinh bằng phép toán
+    ma trận NumPy (theo khối trạm để giới hạn bộ nhớ), và giữ các cặp có góc nâng >= min_elevation_deg.
+    Trả về (site_idx, sat_idx, slant_range_km, elevation_deg).
+    """
+    site_pos = np.asarray(site_pos, dtype=np.float64).reshape(-1, 3)
+    site_up = np.asarray(site_up, dtype=np.float64).reshape(-1, 3)
+    sat_pos = np.asarray(sat_pos, dtype=np.float64).reshape(-1, 3)
+    n_sites, n_sats = len(site_pos), len(sat_pos)
+    empty = np.empty(0, dtype=np.intp)
+    if n_sites == 0 or n_sats == 0:
+        return empty, empty, np.empty(0), np.empty(0)
+
+    sin_min = np.sin(np.radians(min_elevation_deg))
+    block = max(1, MAX_PAIRS_PER_BLOCK // n_sats)
+    parts = []
+    for start in range(0, n_sites, block):
+        stop = min(start + block, n_sites)
+        # rel[s, k] = vector từ trạm s tới vệ tinh k
+        rel = sat_pos[None, :, :] - site_pos[start:stop, None, :]
+        slant = np.sqrt(np.einsum('skc,skc->sk', rel, rel))
+        sin_el = np.einsum('skc,sc->sk', rel, site_up[start:stop]) / slant
+        s_idx, k_idx = np.nonzero(sin_el >= sin_min)
+        parts.append((s_idx + start, k_idx, slant[s_idx, k_idx], np.degrees(np.arcsin(sin_el[s_idx, k_idx]))))
+
+    return tuple(np.concatenate(column) for column in zip(*parts))
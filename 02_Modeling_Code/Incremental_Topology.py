@@ -0,0 +1,396 @@
+# 02_Modeling_Code/Incremental_Topology.py
+
+import os
+import glob
+import json
+from datetime import datetime, timedelta
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import Dict, Any
+
+from Propagator import C_LIGHT
+from Link_Model import LinkModel, ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY
+from Link_Assignment import _knn_candidates, greedy_assignment_candidates, DEFAULT_CANDIDATE_NEIGHBORS
+from Graph_Dataset import META_FILENAME, _to_microseconds, _from_microseconds, _write_json_atomic
+from Spatial_Index import forward_candidates_kdtree, pair_distances, select_forward_nearest
+
+# --- THAM SỐ MẶC ĐỊNH CHO CHẾ ĐỘ CẬP NHẬT TĂNG DẦN ---
+DEFAULT_SKIN_KM = 200.0              # Lớp đệm (skin) của danh sách ứng viên (km)
+DEFAULT_REWEIGHT_TOLERANCE_S = 1e-5  # Chỉ phát sự kiện 'reweighted' khi độ trễ lệch dự đoán tuyến tính quá ngưỡng này (giây)
+
+# --- LUỒNG EDGE-DELTA NHỊ PHÂN (một thư mục <SCENARIO_NAME>_deltas, cùng kiểu cột với Graph_Dataset) ---
+# node_ids.npy               (N,)  ID node (NORAD); src/dst trong các cột là chỉ số node (src < dst)
+# timestamps.bin             (T,)  int64, micro giây kể từ Unix epoch (UTC)
+# n_edges.bin                (T,)  int64, số cạnh ISL tại mỗi bước
+# <loại>_offsets.bin         (T,)  int64, chỉ số kết thúc (lũy kế) các sự kiện của từng bước, loại = added / removed / reweighted
+# <loại>_src.bin, _dst.bin   (E,)  int32
+# <loại>_delay.bin           (E,)  float64, độ trễ tại thời điểm phát (giây) - added / reweighted
+# <loại>_delay_rate.bin      (E,)  float32, tốc độ thay đổi độ trễ (s/s) - added / reweighted
+# <loại>_distance.bin        (E,)  float32, khoảng cách (km) - added / reweighted
+# Độ trễ của một cạnh tại thời điểm t là dự đoán tuyến tính từ lần phát gần nhất (t0, delay, delay_rate):
+# delay + delay_rate * (t - t0); 'reweighted' chỉ được phát khi dự đoán này lệch quá DELTA_REWEIGHT_TOLERANCE_S.
+# Các cột được ghi theo từng cửa sổ thời gian; meta.json chỉ được ghi khi luồng hoàn chỉnh.
+DELTA_KINDS = ('added', 'removed', 'reweighted')
+DELTA_VALUE_COLUMNS = {'delay': np.float64, 'delay_rate': np.float32, 'distance': np.float32}
+DELTA_FORMAT_VERSION = 1
+
+class IncrementalTopology:
+    """
+    Cập nhật topo ISL tăng dần giữa các snapshot liên tiếp (kiểu danh sách Verlet).
+
+    Tại mỗi lần xây dựng lại, mỗi vệ tinh i giữ một danh sách ứng viên j > i trong bán kính
+    min(D_i + skin, MAX_ISL_DISTANCE_KM + skin/2), với D_i là khoảng cách tới láng giềng thứ
+    MAX_ISL_PER_SAT. Chừng nào độ dịch chuyển lớn nhất của mọi vệ tinh kể từ lần xây dựng còn
+    nhỏ hơn skin/4, mọi cạnh có thể được chọn đều nằm trong danh sách này, nên các bước sau chỉ
+    cần kiểm tra lại các cặp gần ngưỡng khoảng cách/bậc thay vì truy vấn toàn bộ chòm sao.
+    Với ISL_ASSIGNMENT GREEDY, danh sách ứng viên là DEFAULT_CANDIDATE_NEIGHBORS láng giềng gần nhất của mỗi
+    vệ tinh trong bán kính MAX_ISL_DISTANCE_KM + skin; vùng phủ của mỗi vệ tinh (khoảng cách tới láng giềng cuối
+    danh sách) co lại 2 lần độ dịch chuyển lớn nhất, các cặp ngoài vùng phủ được kiểm chứng như
+    greedy_assignment_kdtree. OPTIMAL và CONSTELLATIONS vẫn tính lại trực tiếp mỗi bước.
+    Kết quả giống hệt việc xây dựng lại từ đầu bằng LinkModel.compute_isl_edges.
+    """
+
+    def __init__(self, link_model: LinkModel, node_ids, skin_km=DEFAULT_SKIN_KM,
+                 reweight_tolerance_s=DEFAULT_REWEIGHT_TOLERANCE_S):
+        self.link_model = link_model
+        self.node_ids = np.asarray(node_ids)
+        self.skin_km = skin_km
+        self.reweight_tolerance_s = reweight_tolerance_s
+
+        # Trạng thái mang sang bước tiếp theo
+        self._ref_positions = None   # Vị trí tại lần xây dựng danh sách ứng viên gần nhất
+        self._ref_valid = None
+        self._cand_i = None          # Danh sách ứng viên (i < j)
+        self._cand_j = None
+        self._cand_reach = None      # GREEDY: khoảng cách tới láng giềng cuối danh sách của mỗi vệ tinh (tại tham chiếu)
+        self._edge_codes = np.empty(0, dtype=np.int64)  # Cạnh của bước trước (mã i*N + j, đã sắp xếp)
+        # Mô hình độ trễ đã phát của từng cạnh (song song _edge_codes): độ trễ, tốc độ thay đổi, thời điểm phát
+        self._emit_delay = np.empty(0)
+        self._emit_rate = np.empty(0)
+        self._emit_time = np.empty(0)
+        self._last_positions = None
+        self.n_rebuilds = 0
+        self.n_full_steps = 0
+
+    def _rebuild_candidates(self, positions: np.ndarray, valid: np.ndarray):
+        """
+        Xây dựng lại danh sách ứng viên từ vị trí hiện tại (chỉ số ứng viên là chỉ số trong các hàng hợp lệ,
+        vẫn đúng chừng nào tập vệ tinh hợp lệ không đổi).
+        """
+        if self.link_model.isl_assignment == ISL_ASSIGNMENT_GREEDY:
+            ref = positions[valid]
+            n = len(ref)
+            rows, nbr, self._cand_reach = _knn_candidates(cKDTree(ref), ref, np.arange(n), DEFAULT_CANDIDATE_NEIGHBORS,
+                                                          self.link_model.max_isl_distance_km + self.skin_km)
+            keys = np.unique(np.minimum(rows, nbr).astype(np.int64) * n + np.maximum(rows, nbr))
+            self._cand_i, self._cand_j = keys // n, keys % n
+        else:
+            self._cand_i, self._cand_j, _ = forward_candidates_kdtree(
+                positions[valid], self.link_model.max_isl_distance_km, self.link_model.max_isl_per_sat, self.skin_km)
+        self._ref_positions = positions.copy()
+        self._ref_valid = valid.copy()
+        self.n_rebuilds += 1
+
+    def _needs_rebuild(self, positions: np.ndarray, valid: np.ndarray) -> bool:
+        """Kiểm tra danh sách ứng viên còn đảm bảo chính xác hay không."""
+        if self._ref_positions is None or not np.array_equal(valid, self._ref_valid):
+            return True
+        return self._max_displacement(positions, self._ref_positions, valid) > self.skin_km / 4.0
+
+    @staticmethod
+    def _max_displacement(positions: np.ndarray, ref_positions: np.ndarray, valid: np.ndarray) -> float:
+        """
+        Độ dịch chuyển lớn nhất (km) của các vệ tinh hợp lệ so với vị trí tham chiếu
+        (inf nếu một vệ tinh hợp lệ không có vị trí tham chiếu).
+        """
+        if not np.any(valid):
+            return 0.0
+        delta = positions[valid] - ref_positions[valid]
+        if not np.all(np.isfinite(delta)):
+            return np.inf
+        return float(np.sqrt(np.max(np.einsum('ij,ij->i', delta, delta))))
+
+    @classmethod
+    def step_displacement_km(cls, pos_before: np.ndarray, pos_after: np.ndarray) -> float:
+        """Độ dịch chuyển lớn nhất (km) giữa hai bước của các vệ tinh có vị trí ở cả hai bước."""
+        valid = np.all(np.isfinite(pos_before), axis=1) & np.all(np.isfinite(pos_after), axis=1)
+        return cls._max_displacement(pos_after, pos_before, valid)
+
+    def compute_edges(self, pos_array: np.ndarray):
+        """
+        Tính các cạnh ISL tại bước hiện tại, tái sử dụng danh sách ứng viên nếu có thể.
+        pos_array: mảng (N, 3) theo thứ tự node_ids, NaN nếu lan truyền thất bại.
+        Trả về (i, j, distance) giống LinkModel.compute_isl_edges.
+        """
+        if self.link_model.plane_grid is not None:
+            # Topo +Grid: cặp ISL cố định, mỗi bước chỉ cần tính lại khoảng cách
+            return self.link_model.compute_isl_edges(pos_array)
+        # Vệ tinh lan truyền thất bại (NaN) bị loại trước khi tìm kiếm; chỉ số hàng hợp lệ được ánh xạ lại
+        # qua valid_idx (tăng dần nên thứ tự (i, khoảng cách) được giữ nguyên)
+        valid = np.all(np.isfinite(pos_array), axis=1)
+        valid_idx = np.flatnonzero(valid)
+        if (self.link_model.isl_assignment not in (ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY)
+                or self.link_model.isl_partition is not None):
+            # OPTIMAL (MILP trên mọi cặp trong tầm) và ISL theo shell (cạnh chéo giữa các shell) không có danh sách
+            # ứng viên có lớp đệm -> tính lại trực tiếp mỗi bước
+            i, j, distance = self.link_model.compute_isl_edges(pos_array[valid_idx], valid_idx)
+            return valid_idx[i], valid_idx[j], distance
+        positions = pos_array[valid_idx]
+        last_positions, self._last_positions = self._last_positions, pos_array.copy()
+        if self._needs_rebuild(pos_array, valid):
+            # Bước thời gian quá thô (mỗi bước đã dịch chuyển quá skin/4): danh sách ứng viên không
+            # sống sót tới bước sau, nên tính trực tiếp thay vì tốn công xây dựng danh sách
+            if last_positions is not None and self._max_displacement(pos_array, last_positions, valid) > self.skin_km / 4.0:
+                self._ref_positions = None
+                self.n_full_steps += 1
+                i, j, distance = self.link_model.compute_isl_edges(positions)
+                return valid_idx[i], valid_idx[j], distance
+            self._rebuild_candidates(pos_array, valid)
+
+        distance = pair_distances(positions, self._cand_i, self._cand_j)
+        in_range = distance <= self.link_model.max_isl_distance_km
+        if self.link_model.isl_assignment == ISL_ASSIGNMENT_GREEDY:
+            # Cặp gần hơn vùng phủ lúc xây dựng trừ 2 lần độ dịch chuyển chắc chắn có trong danh sách ứng viên
+            coverage_km = self._cand_reach - 2.0 * self._max_displacement(pos_array, self._ref_positions, valid)
+            i, j, distance = greedy_assignment_candidates(
+                positions, self._cand_i[in_range], self._cand_j[in_range], distance[in_range], coverage_km,
+                self.link_model.max_isl_distance_km, self.link_model.max_isl_per_sat)
+            return valid_idx[i], valid_idx[j], distance
+        i, j, distance = select_forward_nearest(self._cand_i[in_range], self._cand_j[in_range],
+                                                distance[in_range], self.link_model.max_isl_per_sat)
+        return valid_idx[i], valid_idx[j], distance
+
+    @staticmethod
+    def _delay_rate(pos_array, vel_array, i, j, distance):
+        """Tốc độ thay đổi độ trễ (s/s) của các cạnh (range rate / c); 0 nếu không có vận tốc."""
+        if vel_array is None or len(i) == 0:
+            return np.zeros(len(i))
+        rel = pos_array[j] - pos_array[i]
+        rel_vel = vel_array[j] - vel_array[i]
+        rate = np.einsum('ec,ec->e', rel, rel_vel) / (distance * C_LIGHT)
+        return np.where(np.isfinite(rate), rate, 0.0)
+
+    def update(self, pos_array: np.ndarray, vel_array: np.ndarray = None, time_s: float = 0.0) -> Dict[str, Any]:
+        """
+        Chuyển sang snapshot kế tiếp và trả về luồng thay đổi cạnh (edge-delta):
+          - 'added': cạnh mới xuất hiện (kèm độ trễ, tốc độ thay đổi độ trễ, khoảng cách)
+          - 'removed': cạnh biến mất
+          - 'reweighted': cạnh tồn tại ở cả hai bước nhưng độ trễ lệch dự đoán tuyến tính từ lần phát gần nhất
+            (delay + delay_rate * (t - t_phát)) quá ngưỡng
+        vel_array: vận tốc (N, 3) km/s để tính delay_rate (None = 0, tức so với độ trễ đã phát);
+        time_s: thời điểm của bước (giây, cùng gốc cho cả luồng).
+        Các cạnh được biểu diễn bằng ID node (NORAD), mảng src/dst song song.
+        """
+        n = len(self.node_ids)
+        i, j, distance = self.compute_edges(pos_array)
+        delay = self.link_model.calculate_delay(distance)
+        rate = self._delay_rate(pos_array, vel_array, i, j, distance)
+
+        codes = i.astype(np.int64) * n + j
+        order = np.argsort(codes)
+        codes, distance, delay, rate = codes[order], distance[order], delay[order], rate[order]
+
+        prev_codes = self._edge_codes
+        is_new = ~np.isin(codes, prev_codes, assume_unique=True)
+        is_gone = ~np.isin(prev_codes, codes, assume_unique=True)
+
+        # Cạnh tồn tại ở cả hai bước: so sánh độ trễ với dự đoán tuyến tính từ lần phát gần nhất
+        kept = np.flatnonzero(~is_new)
+        prev_pos = np.searchsorted(prev_codes, codes[kept])
+        predicted = self._emit_delay[prev_pos] + self._emit_rate[prev_pos] * (time_s - self._emit_time[prev_pos])
+        drifted = np.abs(delay[kept] - predicted) > self.reweight_tolerance_s
+        reweighted = kept[drifted]
+
+        # Cạnh không lệch đáng kể giữ mô hình đã phát, để sai lệch so với phía nhận không tích lũy
+        emit_delay, emit_rate, emit_time = delay.copy(), rate.copy(), np.full(len(codes), float(time_s))
+        stale, stale_pos = kept[~drifted], prev_pos[~drifted]
+        emit_delay[stale] = self._emit_delay[stale_pos]
+        emit_rate[stale] = self._emit_rate[stale_pos]
+        emit_time[stale] = self._emit_time[stale_pos]
+        self._edge_codes = codes
+        self._emit_delay, self._emit_rate, self._emit_time = emit_delay, emit_rate, emit_time
+
+        def _edges(selected_codes):
+            return {'src': self.node_ids[selected_codes // n], 'dst': self.node_ids[selected_codes % n]}
+
+        added = _edges(codes[is_new])
+        added.update(weight_delay=delay[is_new], delay_rate=rate[is_new], distance_km=distance[is_new])
+        changed = _edges(codes[reweighted])
+        changed.update(weight_delay=delay[reweighted], delay_rate=rate[reweighted], distance_km=distance[reweighted])
+        return {
+            'added': added,
+            'removed': _edges(prev_codes[is_gone]),
+            'reweighted': changed,
+            'n_edges': len(codes),
+        }
+
+class DeltaStreamWriter:
+    """
+    Ghi luồng edge-delta dạng cột nhị phân (xem đầu module) vào thư mục dataset_dir.
+    append nhận danh sách delta của một cửa sổ thời gian (IncrementalTopology.update kèm 'timestamp') và ghi mỗi
+    cột một lần cho cả cửa sổ.
+    """
+
+    def __init__(self, dataset_dir, node_ids, reweight_tolerance_s=DEFAULT_REWEIGHT_TOLERANCE_S, metadata=None):
+        self.dataset_dir = dataset_dir
+        os.makedirs(dataset_dir, exist_ok=True)
+        self.node_ids = np.asarray(node_ids, dtype=np.int64)
+        self._sorter = np.argsort(self.node_ids, kind='stable')
+        self.reweight_tolerance_s = reweight_tolerance_s
+        self.metadata = dict(metadata or {})
+        self.n_steps = 0
+        self.n_events = {kind: 0 for kind in DELTA_KINDS}
+
+        # Luồng chỉ hoàn chỉnh khi đóng -> bỏ meta.json cũ
+        meta_path = os.path.join(dataset_dir, META_FILENAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        np.save(os.path.join(dataset_dir, 'node_ids.npy'), self.node_ids)
+        self.columns = {'timestamps': np.int64, 'n_edges': np.int64}
+        for kind in DELTA_KINDS:
+            self.columns.update({f"{kind}_offsets": np.int64, f"{kind}_src": np.int32, f"{kind}_dst": np.int32})
+            if kind != 'removed':
+                self.columns.update({f"{kind}_{name}": dtype for name, dtype in DELTA_VALUE_COLUMNS.items()})
+        self._files = {name: open(os.path.join(dataset_dir, f"{name}.bin"), 'wb') for name in self.columns}
+
+    def _write(self, name, values):
+        np.ascontiguousarray(values, dtype=self.columns[name]).tofile(self._files[name])
+
+    def _node_index(self, ids):
+        return self._sorter[np.searchsorted(self.node_ids, ids, sorter=self._sorter)]
+
+    def append(self, deltas):
+        """Ghi các delta của một cửa sổ thời gian (danh sách theo thứ tự bước)."""
+        if not deltas:
+            return
+        self._write('timestamps', [_to_microseconds(delta['timestamp']) for delta in deltas])
+        self._write('n_edges', [delta['n_edges'] for delta in deltas])
+        for kind in DELTA_KINDS:
+            events = [delta[kind] for delta in deltas]
+            counts = np.array([len(event['src']) for event in events], dtype=np.int64)
+            self._write(f"{kind}_offsets", self.n_events[kind] + np.cumsum(counts))
+            self.n_events[kind] += int(counts.sum())
+            self._write(f"{kind}_src", self._node_index(np.concatenate([event['src'] for event in events])))
+            self._write(f"{kind}_dst", self._node_index(np.concatenate([event['dst'] for event in events])))
+            if kind != 'removed':
+                for name, key in (('delay', 'weight_delay'), ('delay_rate', 'delay_rate'), ('distance', 'distance_km')):
+                    self._write(f"{kind}_{name}", np.concatenate([event[key] for event in events]))
+        self.n_steps += len(deltas)
+
+    def close(self, complete=True):
+        """Đóng các file; ghi meta.json chỉ khi luồng hoàn chỉnh (complete=False: lần ghi bị lỗi/ngắt/bỏ dở)."""
+        for f in self._files.values():
+            f.close()
+        if not complete:
+            return
+        meta = {
+            'format_version': DELTA_FORMAT_VERSION,
+            'n_nodes': int(len(self.node_ids)),
+            'n_steps': self.n_steps,
+            'n_events': self.n_events,
+            'dtypes': {name: np.dtype(dtype).str for name, dtype in self.columns.items()},
+            'reweight_tolerance_s': self.reweight_tolerance_s,
+        }
+        meta.update(self.metadata)
+        _write_json_atomic(os.path.join(self.dataset_dir, META_FILENAME), meta)
+
+class DeltaStreamReader:
+    """Đọc luồng edge-delta nhị phân (memory-map) của DeltaStreamWriter."""
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = dataset_dir
+        with open(os.path.join(dataset_dir, META_FILENAME), 'r') as f:
+            self.meta = json.load(f)
+        self.n_steps = self.meta['n_steps']
+        self.node_ids = np.load(os.path.join(dataset_dir, 'node_ids.npy'))
+        self._columns = {}
+
+    def column(self, name):
+        if name not in self._columns:
+            path = os.path.join(self.dataset_dir, f"{name}.bin")
+            dtype = np.dtype(self.meta['dtypes'][name])
+            self._columns[name] = (np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path)
+                                   else np.empty(0, dtype=dtype))
+        return self._columns[name]
+
+    def timestamp(self, step) -> datetime:
+        return _from_microseconds(int(self.column('timestamps')[step]))
+
+    def events(self, step, kind):
+        """Sự kiện loại kind tại bước step: {'src', 'dst' (chỉ số node), và delay / delay_rate / distance nếu có}."""
+        offsets = self.column(f"{kind}_offsets")
+        window = slice(int(offsets[step - 1]) if step else 0, int(offsets[step]))
+        names = ('src', 'dst') + (tuple(DELTA_VALUE_COLUMNS) if kind != 'removed' else ())
+        return {name: np.asarray(self.column(f"{kind}_{name}")[window]) for name in names}
+
+    def replay(self):
+        """
+        Dựng lại topo ISL qua từng bước: sinh (step, src, dst, delay) với src/dst là chỉ số node (mã tăng dần) và
+        delay là dự đoán tuyến tính từ lần phát gần nhất của mỗi cạnh (sai lệch <= reweight_tolerance_s).
+        """
+        n = len(self.node_ids)
+        codes = np.empty(0, dtype=np.int64)
+        emit = np.empty((0, 3))  # (độ trễ, tốc độ, thời điểm phát) song song codes
+        t_first = int(self.column('timestamps')[0]) if self.n_steps else 0
+        for step in range(self.n_steps):
+            t = (int(self.column('timestamps')[step]) - t_first) / 1e6
+            removed = self.events(step, 'removed')
+            keep = ~np.isin(codes, removed['src'].astype(np.int64) * n + removed['dst'])
+            codes, emit = codes[keep], emit[keep]
+            for kind in ('added', 'reweighted'):
+                event = self.events(step, kind)
+                event_codes = event['src'].astype(np.int64) * n + event['dst']
+                values = np.column_stack([event['delay'], event['delay_rate'], np.full(len(event_codes), t)])
+                keep = ~np.isin(codes, event_codes)
+                codes, emit = np.concatenate([codes[keep], event_codes]), np.concatenate([emit[keep], values])
+            order = np.argsort(codes)
+            codes, emit = codes[order], emit[order]
+            yield step, codes // n, codes % n, emit[:, 0] + emit[:, 1] * (t - emit[:, 2])
+
+# --- Kiểm tra tương đương với việc xây dựng lại từ đầu ---
+
+def matches_rebuild(topology: IncrementalTopology, pos_array: np.ndarray) -> bool:
+    """
+    Tính cạnh tăng dần cho pos_array và so sánh với LinkModel.compute_isl_edges trên riêng các vệ tinh
+    hợp lệ (không NaN), ánh xạ lại về chỉ số hàng.
+    """
+    valid_idx = np.flatnonzero(np.all(np.isfinite(pos_array), axis=1))
+    i, j, distance = topology.compute_edges(pos_array)
+    ref_i, ref_j, ref_distance = topology.link_model.compute_isl_edges(pos_array[valid_idx])
+    return (np.array_equal(i, valid_idx[ref_i]) and np.array_equal(j, valid_idx[ref_j])
+            and np.allclose(distance, ref_distance))
+
+def main_incremental_topology(n_satellites=1500, n_steps=20, step_seconds=1.0, n_failed=5):
+    from Propagator import SatellitePropagator
+    from Plane_Topology import SGP4_EPOCH
+
+    DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_Data_Source')
+    starlink_files = glob.glob(os.path.join(DATA_SOURCE_DIR, "STARLINK_TLE_*.txt"))
+    prop = SatellitePropagator(max(starlink_files, key=os.path.getctime))
+    indices = np.arange(min(n_satellites, prop.n_satellites))
+    # Bắt đầu tại epoch TLE mới nhất của subset (lan truyền xa epoch làm vị trí mất ý nghĩa)
+    t_start = SGP4_EPOCH + timedelta(days=float(np.max(prop.catalog['epoch'][indices])))
+    times = [t_start + timedelta(seconds=k * step_seconds) for k in range(n_steps)]
+    pos_batch, _ = prop.propagate_batch(times, indices)
+
+    # Giả lập lan truyền thất bại: mỗi bước một nhóm vệ tinh ngẫu nhiên có vị trí NaN ở nửa sau chuỗi
+    for assignment in (ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY):
+        rng = np.random.default_rng(0)
+        link_model = LinkModel(isl_assignment=assignment, link_attributes=())
+        topology = IncrementalTopology(link_model, prop.sat_ids[indices])
+        mismatched = []
+        for k in range(n_steps):
+            pos_array = pos_batch[:, k].copy()
+            if k >= n_steps // 2:
+                pos_array[rng.choice(len(indices), n_failed, replace=False)] = np.nan
+            if not matches_rebuild(topology, pos_array):
+                mismatched.append(k)
+
+        print(f"{assignment}: {n_steps} bước, {topology.n_rebuilds} lần xây dựng lại danh sách ứng viên, "
+              f"{topology.n_full_steps} bước tính trực tiếp.")
+        if mismatched:
+            raise AssertionError(f"{assignment}: cạnh tăng dần khác xây dựng lại từ đầu tại các bước {mismatched}")
+    print("Cạnh tăng dần trùng khớp xây dựng lại từ đầu (FORWARD, GREEDY, kể cả khi có vệ tinh NaN).")
+
+if __name__ == "__main__":
+    main_incremental_topology()
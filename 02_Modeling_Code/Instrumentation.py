@@ -0,0 +1,158 @@
+# 02_Modeling_Code/Instrumentation.py
+
+import os
+import json
+import time
+import cProfile
+import threading
+import contextlib
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# --- ĐO ĐẠC CÁC TẦNG TÍNH TOÁN (HOT PATH) ---
+# Metrics cộng dồn thời gian thực (wall time) theo tầng và các bộ đếm; collect() lấy ra phần cộng dồn kể từ
+# lần collect trước (dict nhẹ, pickle được để gửi từ worker về tiến trình chính).
+# Khi tắt, mọi lời gọi đi vào NULL_METRICS (no-op, không cấp phát), nên có thể để sẵn trong code chạy thật.
+# Tên tầng dùng trong pipeline:
+STAGE_PARSE = 'parse'                        # Đọc/phân tích TLE (qua bộ đệm)
+STAGE_PROPAGATE = 'propagate'                # Lan truyền SGP4 theo lô
+STAGE_CANDIDATE_SEARCH = 'candidate_search'  # Truy vấn láng giềng trên cây k-d
+STAGE_EDGE_SELECTION = 'edge_selection'      # Lọc bán kính, giới hạn bậc, sắp xếp cạnh
+STAGE_GSL = 'gsl_visibility'                 # Góc nâng trạm x vệ tinh
+STAGE_GRAPH_BUILD = 'graph_build'            # Dựng GraphSnapshot (mảng node + CSR)
+STAGE_ISOLATE_PRUNING = 'isolate_pruning'    # Xóa node cô lập
+STAGE_ROUTING = 'routing'                    # Bảng định tuyến (đường đi ngắn nhất)
+STAGE_LINK_METRICS = 'link_metrics'          # Thuộc tính liên kết theo lô (SNR, năng lượng, Doppler...)
+STAGE_WRITE = 'write'                        # Ghi dataset (luồng nền)
+STAGE_WRITE_WAIT = 'write_wait'              # Luồng chính bị chặn vì hàng đợi ghi đầy
+
+class _NullStage:
+    """Context manager rỗng dùng chung (không tạo đối tượng mới ở mỗi lần gọi)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class NullMetrics:
+    """Metrics khi đo đạc bị tắt: mọi phương thức là no-op."""
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def count(self, name, n=1):
+        pass
+
+    def collect(self):
+        return {}
+
+NULL_METRICS = NullMetrics()
+
+class _Stage:
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics._add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+class Metrics:
+    """Bộ đo đạc thật: cộng dồn thời gian theo tầng và bộ đếm (an toàn khi ghi từ luồng nền)."""
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = defaultdict(float)
+        self._counters = defaultdict(int)
+
+    def _add_time(self, name, seconds):
+        with self._lock:
+            self._stages[name] += seconds
+
+    def stage(self, name):
+        """Đo thời gian thực của một khối lệnh: with metrics.stage('propagate'): ..."""
+        return _Stage(self, name)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += int(n)
+
+    def collect(self):
+        """Lấy phần cộng dồn kể từ lần collect trước (và đặt lại về 0)."""
+        with self._lock:
+            snapshot = {'stages': dict(self._stages), 'counters': dict(self._counters)}
+            self._stages.clear()
+            self._counters.clear()
+        return snapshot
+
+def merge_metrics(*snapshots):
+    """Cộng gộp nhiều kết quả collect() (ví dụ phần của worker và phần của tiến trình chính)."""
+    merged = {'stages': defaultdict(float), 'counters': defaultdict(int)}
+    for snapshot in snapshots:
+        for group in ('stages', 'counters'):
+            for name, value in snapshot.get(group, {}).items():
+                merged[group][name] += value
+    return {group: dict(values) for group, values in merged.items()}
+
+class MetricsLog:
+    """
+    Ghi metrics ra file JSON Lines: một dòng 'run_start', mỗi snapshot một dòng 'snapshot'
+    (thời gian theo tầng và bộ đếm của bước đó), và một dòng 'run_end' chứa tổng cộng.
+    Thời gian của tầng chạy theo cửa sổ (lan truyền) hoặc trên luồng nền (ghi) được tính vào
+    snapshot tại thời điểm chúng được thu thập.
+    """
+
+    def __init__(self, filepath, run_info=None, append=False):
+        """append=True: ghi tiếp vào file của lần chạy trước (ví dụ khi tiếp tục một lần chạy bị ngắt)."""
+        self.filepath = filepath
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        self._file = open(filepath, 'a' if append else 'w')
+        self._totals = {}
+        self._n_snapshots = 0
+        self._start = time.perf_counter()
+        self._write({'event': 'run_start', 'created_at': datetime.now(timezone.utc).isoformat(),
+                     **(run_info or {})})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, default=str) + '\n')
+
+    def write_snapshot(self, time_step, timestamp, snapshot):
+        self._totals = merge_metrics(self._totals, snapshot)
+        self._n_snapshots += 1
+        self._write({'event': 'snapshot', 'time_step': time_step, 'timestamp': timestamp.isoformat(),
+                     'stages': snapshot.get('stages', {}), 'counters': snapshot.get('counters', {})})
+
+    def close(self, final=None):
+        """Ghi dòng tổng kết (cộng thêm phần metrics chưa gắn với snapshot nào) rồi đóng file."""
+        totals = merge_metrics(self._totals, final or {})
+        self._write({'event': 'run_end', 'n_snapshots': self._n_snapshots,
+                     'wall_time_s': time.perf_counter() - self._start,
+                     'stages': totals.get('stages', {}), 'counters': totals.get('counters', {})})
+        self._file.close()
+
+@contextlib.contextmanager
+def profiled(filepath=None):
+    """Chạy khối lệnh dưới cProfile và ghi kết quả (pstats) ra filepath; không làm gì nếu filepath là None."""
+    if filepath is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        profiler.dump_stats(filepath)
@@ -0,0 +1,193 @@
+# 02_Modeling_Code/Link_Assignment.py
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.sparse import csr_matrix
+
+from Instrumentation import NULL_METRICS, STAGE_CANDIDATE_SEARCH, STAGE_EDGE_SELECTION
+from Spatial_Index import RADIUS_SLACK, pair_distances, find_pairs_kdtree
+
+# --- GÁN ISL VỚI GIỚI HẠN BẬC TOÀN CỤC (b-MATCHING) ---
+# Quy tắc FORWARD gốc chỉ giới hạn số cạnh mỗi vệ tinh *khởi tạo* (k láng giềng j > i), nên một vệ tinh vẫn
+# có thể nhận thêm nhiều cạnh từ các vệ tinh có chỉ số nhỏ hơn và kết quả phụ thuộc thứ tự danh sách.
+# Ở đây mỗi node có số đầu cuối tối đa capacity (MAX_ISL_PER_SAT), áp dụng cho cả hai đầu của cạnh:
+#   GREEDY   b-matching tham lam "cạnh ngắn nhất trước": duyệt các cặp trong tầm theo (khoảng cách, i, j),
+#            nhận cạnh nếu cả hai đầu còn đầu cuối trống. Vector hóa theo vòng: mỗi vòng nhận mọi cạnh nằm trong
+#            capacity còn lại cạnh ngắn nhất ở cả hai đầu (luôn gồm cạnh ngắn nhất toàn cục), rồi loại các cạnh
+#            tại node đã đầy -> kết quả trùng đúng thuật toán tuần tự, O(E log E) cho lần sắp xếp.
+#            Ứng viên: k láng giềng gần nhất mỗi node (cây k-d), rồi kiểm chứng - chỉ các node chưa đầy trước
+#            láng giềng thứ k mới có thể bỏ sót cạnh, nên chỉ các cặp giữa chúng được xét thêm cho tới khi ổn định.
+#   OPTIMAL  lời giải chính xác bằng MILP (scipy.optimize.milp, HiGHS): tối đa số ISL, rồi tối thiểu tổng chiều
+#            dài; chỉ dành cho chòm sao nhỏ (MILP_MAX_CANDIDATES cặp ứng viên).
+DEFAULT_CANDIDATE_NEIGHBORS = 16  # Số láng giềng gần nhất mỗi node trong tập ứng viên ban đầu của GREEDY
+MILP_MAX_CANDIDATES = 20000       # Số cặp ứng viên tối đa cho OPTIMAL
+MILP_TIME_LIMIT_S = 60.0          # Giới hạn thời gian của bộ giải MILP (giây)
+
+def _capacity_array(capacity, n_nodes):
+    """Số đầu cuối mỗi node (số nguyên dùng chung hoặc mảng (n_nodes,))."""
+    return np.broadcast_to(np.asarray(capacity, dtype=np.int64), (n_nodes,)).copy()
+
+def greedy_b_matching(n_nodes, i, j, distance, capacity):
+    """
+    b-matching tham lam cạnh ngắn nhất trước trên các cặp ứng viên (i, j, distance), mỗi node tối đa capacity cạnh.
+    Thứ tự duyệt (khoảng cách, min(i, j), max(i, j)) không phụ thuộc thứ tự đầu vào.
+    Trả về (selected, saturation_km): chỉ số các cặp được chọn (theo thứ tự duyệt) và, cho mỗi node, khoảng cách
+    của cạnh làm node đầy (inf nếu chưa đầy) - dùng để kiểm chứng tập ứng viên.
+    """
+    u = np.minimum(i, j).astype(np.intp)
+    v = np.maximum(i, j).astype(np.intp)
+    order = np.lexsort((v, u, distance))
+    u, v, distance = u[order], v[order], np.asarray(distance, dtype=np.float64)[order]
+    n_edges = len(order)
+    remaining = _capacity_array(capacity, n_nodes)
+
+    # Danh sách kề (node, thứ tự duyệt) sắp theo node rồi theo thứ tự duyệt: hạng của cạnh tại một node
+    # là vị trí của nó trong nhóm của node đó (chỉ tính các cạnh còn sống)
+    node = np.concatenate([u, v])
+    rank_edge = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+    incidence = np.lexsort((rank_edge, node))
+    node, rank_edge = node[incidence], rank_edge[incidence]
+
+    alive = (remaining[u] > 0) & (remaining[v] > 0) & (u != v)
+    chosen = np.zeros(n_edges, dtype=bool)
+    while True:
+        live = alive[rank_edge]
+        node, rank_edge = node[live], rank_edge[live]
+        if len(node) == 0:
+            break
+        rank = np.arange(len(node)) - np.searchsorted(node, node, side='left')
+        within = rank < remaining[node]
+        accepted = np.flatnonzero(np.bincount(rank_edge[within], minlength=n_edges) == 2)
+        chosen[accepted] = True
+        alive[accepted] = False
+        remaining -= np.bincount(u[accepted], minlength=n_nodes) + np.bincount(v[accepted], minlength=n_nodes)
+        # Loại các cạnh còn lại tại node đã đầy
+        full = remaining <= 0
+        alive &= ~(full[u] | full[v])
+
+    # Node đầy tại cạnh được nhận xa nhất của nó (các vòng không nhận cạnh theo đúng thứ tự duyệt)
+    saturation_km = np.full(n_nodes, -np.inf)
+    np.maximum.at(saturation_km, u[chosen], distance[chosen])
+    np.maximum.at(saturation_km, v[chosen], distance[chosen])
+    saturation_km[remaining > 0] = np.inf
+    return order[chosen], saturation_km
+
+def _knn_candidates(tree, positions, rows, k, max_distance_km):
+    """
+    k láng giềng gần nhất (trong bán kính) của các node rows: các cặp (row, láng giềng) và khoảng cách tới
+    láng giềng thứ k của mỗi row (inf nếu đã hết láng giềng trong bán kính).
+    """
+    n = len(positions)
+    n_query = min(k + 1, n)
+    dist, nbr = tree.query(positions[rows], k=n_query, distance_upper_bound=max_distance_km * (1.0 + RADIUS_SLACK))
+    dist, nbr = dist.reshape(len(rows), n_query), nbr.reshape(len(rows), n_query)
+    valid = (nbr < n) & (nbr != rows[:, None])
+    r_idx, c_idx = np.nonzero(valid)
+    kth_distance = np.where(nbr[:, -1] < n, dist[:, -1], np.inf) if n_query < n else np.full(len(rows), np.inf)
+    return rows[r_idx], nbr[r_idx, c_idx].astype(np.intp), kth_distance
+
+def greedy_assignment_kdtree(positions: np.ndarray, max_distance_km: float, capacity,
+                             k_candidates: int = DEFAULT_CANDIDATE_NEIGHBORS, metrics=NULL_METRICS):
+    """
+    Gán ISL tham lam (GREEDY) cho mảng vị trí (N, 3): trùng kết quả của greedy_b_matching trên mọi cặp trong
+    bán kính max_distance_km, nhưng chỉ xét k_candidates láng giềng gần nhất mỗi node cộng các cặp cần kiểm chứng.
+    Trả về (i, j, distance) với i < j, sắp xếp theo (i, khoảng cách).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    n = len(positions)
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2:
+        return empty, empty, np.empty(0)
+    with metrics.stage(STAGE_CANDIDATE_SEARCH):
+        tree = cKDTree(positions)
+        rows, nbr, kth_distance = _knn_candidates(tree, positions, np.arange(n), k_candidates, max_distance_km)
+        keys = np.unique(np.minimum(rows, nbr).astype(np.int64) * n + np.maximum(rows, nbr))
+        i, j = keys // n, keys % n
+        distance = pair_distances(positions, i, j)
+        in_range = distance <= max_distance_km
+    return greedy_assignment_candidates(positions, i[in_range], j[in_range], distance[in_range], kth_distance,
+                                        max_distance_km, capacity, metrics=metrics)
+
+def greedy_assignment_candidates(positions: np.ndarray, i: np.ndarray, j: np.ndarray, distance: np.ndarray,
+                                 coverage_km: np.ndarray, max_distance_km: float, capacity, metrics=NULL_METRICS):
+    """
+    GREEDY trên tập ứng viên cho trước (i < j, không trùng, trong bán kính) có kiểm chứng: coverage_km[u] là khoảng
+    cách mà mọi cặp của node u gần hơn nó đều có trong tập ứng viên (inf = đủ mọi cặp trong bán kính). Cặp còn thiếu
+    ở các node chưa đầy trong vùng phủ được tìm thêm, nên kết quả trùng greedy_b_matching trên mọi cặp trong bán kính.
+    Trả về (i, j, distance) như greedy_assignment_kdtree.
+    """
+    n = len(positions)
+    keys = np.asarray(i, dtype=np.int64) * n + j
+    by_key = np.argsort(keys, kind='stable')
+    i, j, distance, keys = i[by_key], j[by_key], distance[by_key], keys[by_key]
+
+    with metrics.stage(STAGE_EDGE_SELECTION):
+        n_rounds = 0
+        while True:
+            n_rounds += 1
+            selected, saturation_km = greedy_b_matching(n, i, j, distance, capacity)
+            # Cặp nằm ngoài tập ứng viên chỉ có thể được nhận nếu cả hai đầu chưa đầy ở khoảng cách của nó, tức cả
+            # hai đầu có vùng phủ chưa tới khoảng cách làm node đầy -> chỉ xét thêm các cặp đó
+            open_nodes = np.flatnonzero(coverage_km <= np.minimum(saturation_km, max_distance_km))
+            if len(open_nodes) < 2:
+                break
+            extra_i, extra_j, extra_distance = find_pairs_kdtree(positions[open_nodes], max_distance_km)
+            extra_i, extra_j = open_nodes[extra_i], open_nodes[extra_j]
+            reach = np.minimum(saturation_km[extra_i], saturation_km[extra_j])
+            # Cặp chưa có trong tập ứng viên (keys luôn được giữ tăng dần)
+            extra_keys = extra_i.astype(np.int64) * n + extra_j
+            known = (keys[np.minimum(np.searchsorted(keys, extra_keys), len(keys) - 1)] == extra_keys
+                     if len(keys) else np.zeros(len(extra_keys), dtype=bool))
+            missing = (extra_distance <= reach) & ~known
+            if not np.any(missing):
+                break
+            i = np.concatenate([i, extra_i[missing]])
+            j = np.concatenate([j, extra_j[missing]])
+            distance = np.concatenate([distance, extra_distance[missing]])
+            keys = np.concatenate([keys, extra_keys[missing]])
+            by_key = np.argsort(keys, kind='stable')
+            i, j, distance, keys = i[by_key], j[by_key], distance[by_key], keys[by_key]
+        metrics.count('isl_candidates', len(i))
+        metrics.count('isl_assignment_passes', n_rounds)
+        i, j, distance = i[selected], j[selected], distance[selected]
+        order = np.lexsort((distance, i))
+    return i[order].astype(np.intp), j[order].astype(np.intp), distance[order]
+
+def optimal_b_matching(n_nodes, i, j, distance, capacity, time_limit_s=MILP_TIME_LIMIT_S):
+    """
+    b-matching tối ưu bằng MILP: tối đa số cạnh được chọn, trong các lời giải đó tối thiểu tổng khoảng cách
+    (hệ số chiều dài được chuẩn hóa để tổng luôn < 1, nhỏ hơn giá trị của một cạnh).
+    Trả về chỉ số các cặp được chọn (tăng dần).
+    """
+    from scipy.optimize import milp, LinearConstraint, Bounds
+
+    n_edges = len(i)
+    if n_edges == 0:
+        return np.empty(0, dtype=np.intp)
+    if n_edges > MILP_MAX_CANDIDATES:
+        raise ValueError(f"OPTIMAL chỉ dành cho chòm sao nhỏ: {n_edges} cặp ứng viên > {MILP_MAX_CANDIDATES} "
+                         f"(dùng ISL_ASSIGNMENT: GREEDY)")
+    capacity = _capacity_array(capacity, n_nodes)
+    scale = float(np.max(distance)) * (n_edges + 1.0)
+    cost = np.asarray(distance, dtype=np.float64) / scale - 1.0
+    incidence = csr_matrix((np.ones(2 * n_edges), (np.concatenate([i, j]), np.tile(np.arange(n_edges), 2))),
+                           shape=(n_nodes, n_edges))
+    result = milp(cost, integrality=np.ones(n_edges), bounds=Bounds(0, 1),
+                  constraints=LinearConstraint(incidence, -np.inf, capacity),
+                  options={'time_limit': time_limit_s})
+    if result.x is None:
+        raise RuntimeError(f"Bộ giải MILP không tìm được lời giải: {result.message}")
+    return np.flatnonzero(result.x > 0.5)
+
+def optimal_assignment_kdtree(positions: np.ndarray, max_distance_km: float, capacity,
+                              time_limit_s=MILP_TIME_LIMIT_S, metrics=NULL_METRICS):
+    """Gán ISL tối ưu (OPTIMAL) trên mọi cặp trong bán kính. Trả về (i, j, distance) như greedy_assignment_kdtree."""
+    positions = np.asarray(positions, dtype=np.float64)
+    with metrics.stage(STAGE_CANDIDATE_SEARCH):
+        i, j, distance = find_pairs_kdtree(positions, max_distance_km)
+    with metrics.stage(STAGE_EDGE_SELECTION):
+        selected = optimal_b_matching(len(positions), i, j, distance, capacity, time_limit_s)
+        metrics.count('isl_candidates', len(i))
+        i, j, distance = i[selected], j[selected], distance[selected]
+        order = np.lexsort((distance, i))
+    return i[order], j[order], distance[order]
@@ -0,0 +1,184 @@
+# 02_Modeling_Code/Link_Metrics.py
+
+import numpy as np
+
+from Propagator import C_LIGHT
+from Graph_Snapshot import EDGE_TYPES, EDGE_ISL, EDGE_GSL
+
+# --- THUỘC TÍNH LIÊN KẾT THEO LÔ (CHO MỤC TIÊU ENERGY / MULTI) ---
+# Mọi thuộc tính được tính cho toàn bộ cạnh của một snapshot bằng vài phép toán NumPy trên mảng chỉ số cạnh
+# (src, dst) và mảng vị trí / vận tốc của node, không có vòng lặp theo cặp. Thông số đường truyền theo loại cạnh
+# (LINK_BUDGETS). Thuộc tính (tên cột trong dataset và GraphSnapshot):
+#   fspl_db        suy hao không gian tự do 20 log10(4 pi d f / c) (dB)
+#   snr_db         tỉ số tín hiệu/tạp âm P_tx + G_tx + G_rx - FSPL - L - 10 log10(k T B) (dB)
+#   capacity_bps   dung lượng Shannon B log2(1 + SNR) (bit/s)
+#   tx_energy_j    năng lượng phát một gói PACKET_BITS bit ở dung lượng trên: P_tx * bits / capacity (J)
+#   doppler_hz     dịch Doppler -f * (tốc độ thay đổi khoảng cách) / c (Hz) - cần vận tốc
+#   lifetime_s     thời gian còn lại tới khi liên kết mất hình học hợp lệ (ISL vượt khoảng cách tối đa, GSL xuống dưới
+#                  góc nâng tối thiểu), ước lượng với chuyển động tương đối thẳng đều, tối đa LIFETIME_HORIZON_S (s)
+#                  - cần vận tốc. Với topo NEAREST liên kết còn có thể mất sớm hơn khi đổi láng giềng.
+# Độ trễ truyền dẫn (weight_delay) luôn có, tính bằng propagation_delay.
+LINK_ATTRIBUTES = ['fspl_db', 'snr_db', 'capacity_bps', 'tx_energy_j', 'doppler_hz', 'lifetime_s']
+VELOCITY_ATTRIBUTES = {'doppler_hz', 'lifetime_s'}
+# Thuộc tính mỗi thuộc tính cần tính trước (đóng theo phụ thuộc khi tính)
+ATTRIBUTE_DEPENDENCIES = {'snr_db': ['fspl_db'], 'capacity_bps': ['snr_db'], 'tx_energy_j': ['capacity_bps']}
+
+BOLTZMANN_DBW = -228.6      # 10 log10(k), k = hằng số Boltzmann (dBW/K/Hz)
+PACKET_BITS = 12000         # Kích thước gói tham chiếu cho tx_energy_j (1500 byte)
+LIFETIME_HORIZON_S = 3600.0  # Giới hạn trên của lifetime_s (liên kết gần như đứng yên tương đối)
+
+# Thông số đường truyền minh họa theo loại cạnh (Starlink không công bố): ISL băng Ka, GSL băng Ku (xuống)
+LINK_BUDGETS = {
+    EDGE_ISL: {'frequency_hz': 26.0e9, 'tx_power_w': 10.0, 'tx_gain_dbi': 38.0, 'rx_gain_dbi': 38.0,
+               'bandwidth_hz': 500.0e6, 'noise_temp_k': 500.0, 'losses_db': 2.0},
+    EDGE_GSL: {'frequency_hz': 12.0e9, 'tx_power_w': 20.0, 'tx_gain_dbi': 36.0, 'rx_gain_dbi': 40.0,
+               'bandwidth_hz': 250.0e6, 'noise_temp_k': 300.0, 'losses_db': 3.0},
+}
+
+def propagation_delay(distance_km):
+    """Độ trễ truyền dẫn (giây) = khoảng cách / tốc độ ánh sáng (vô hướng hoặc mảng)."""
+    return distance_km / C_LIGHT
+
+def default_link_attributes(objective):
+    """Thuộc tính cạnh cần cho một mục tiêu tối ưu (khóa OBJECTIVE): MULTI -> tất cả, ENERGY -> năng lượng phát."""
+    objective = (objective or '').upper()
+    if objective == 'MULTI':
+        return list(LINK_ATTRIBUTES)
+    if objective.startswith('ENERGY'):
+        return ['tx_energy_j']
+    return []
+
+def first_exit_time(a, b, c, horizon_s=LIFETIME_HORIZON_S):
+    """
+    Nghiệm dương nhỏ nhất của a t^2 + b t + c = 0 (vector hóa), với c >= 0 (điều kiện liên kết đang thỏa ở t = 0):
+    thời điểm điều kiện q(t) >= 0 bị vi phạm. Không có nghiệm dương -> horizon_s; kết quả tối đa horizon_s.
+    """
+    a, b, c = (np.asarray(x, dtype=np.float64) for x in (a, b, c))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disc = b * b - 4.0 * a * c
+        # Dạng ổn định số: q = -(b + sign(b) sqrt(disc)) / 2, hai nghiệm q / a và c / q
+        q = -0.5 * (b + np.copysign(np.sqrt(np.maximum(disc, 0.0)), b))
+        roots = np.stack([q / a, c / q])
+        roots[:, disc < 0] = np.inf
+        linear = np.abs(a) < 1e-18
+        roots[0, linear] = np.where(b[linear] != 0, -c[linear] / b[linear], np.inf)
+        roots[1, linear] = np.inf
+        roots[~np.isfinite(roots) | (roots <= 0)] = np.inf
+    return np.minimum(roots.min(axis=0), horizon_s)
+
+class LinkMetricEngine:
+    """Tính các thuộc tính cạnh (LINK_ATTRIBUTES) theo lô cho một snapshot (xem chú thích đầu module)."""
+
+    def __init__(self, attributes=(), max_isl_distance_km=None, min_elevation_deg=0.0, budgets=None,
+                 packet_bits=PACKET_BITS, horizon_s=LIFETIME_HORIZON_S):
+        """
+        attributes: các thuộc tính cần xuất (tập con của LINK_ATTRIBUTES, theo thứ tự đó).
+        max_isl_distance_km / min_elevation_deg: giới hạn hình học của LinkModel (cho lifetime_s).
+        budgets: ghi đè thông số đường truyền {mã loại cạnh: {khóa: giá trị}} (mặc định LINK_BUDGETS).
+        """
+        unknown = [name for name in attributes if name not in LINK_ATTRIBUTES]
+        if unknown:
+            raise ValueError(f"Thuộc tính liên kết không hỗ trợ: {unknown} (hỗ trợ: {', '.join(LINK_ATTRIBUTES)})")
+        self.attributes = [name for name in LINK_ATTRIBUTES if name in attributes]
+        self.max_isl_distance_km = max_isl_distance_km
+        self.min_elevation_deg = min_elevation_deg
+        self.budgets = {edge_type: {**LINK_BUDGETS[edge_type], **((budgets or {}).get(edge_type) or {})}
+                        for edge_type in LINK_BUDGETS}
+        self.packet_bits = packet_bits
+        self.horizon_s = horizon_s
+        # Bảng thông số theo mã loại cạnh -> tra theo lô bằng edge_type
+        self._tables = {key: np.array([self.budgets[k][key] for k in range(len(EDGE_TYPES))], dtype=np.float64)
+                        for key in LINK_BUDGETS[EDGE_ISL]}
+
+    @property
+    def needs_velocity(self):
+        """True nếu có thuộc tính cần vận tốc node (doppler_hz, lifetime_s)."""
+        return any(name in VELOCITY_ATTRIBUTES for name in self.attributes)
+
+    def _required(self):
+        """Các thuộc tính phải tính (gồm cả phụ thuộc), theo thứ tự LINK_ATTRIBUTES."""
+        required = set()
+        stack = list(self.attributes)
+        while stack:
+            name = stack.pop()
+            if name not in required:
+                required.add(name)
+                stack.extend(ATTRIBUTE_DEPENDENCIES.get(name, []))
+        return [name for name in LINK_ATTRIBUTES if name in required]
+
+    def compute(self, src, dst, edge_type, positions, velocities=None, up=None, distance_km=None):
+        """
+        Thuộc tính cho mọi cạnh: dict {tên: mảng (E,) float64} theo self.attributes.
+        src/dst: chỉ số node; edge_type: mã loại cạnh (EDGE_ISL / EDGE_GSL).
+        positions / velocities: (N, 3) ECEF (km, km/s) theo chỉ số node; trạm mặt đất có vận tốc 0.
+        up: (N, 3) vector 'lên' của trạm mặt đất (hàng 0 với vệ tinh), cần cho lifetime_s của GSL.
+        distance_km: khoảng cách đã tính sẵn (tùy chọn, tránh tính lại).
+        """
+        if not self.attributes:
+            return {}
+        src = np.asarray(src, dtype=np.intp)
+        dst = np.asarray(dst, dtype=np.intp)
+        edge_type = np.broadcast_to(np.asarray(edge_type, dtype=np.intp), src.shape)
+        positions = np.asarray(positions, dtype=np.float64)
+        rel = positions[dst] - positions[src]
+        if distance_km is None:
+            distance_km = np.sqrt(np.einsum('ec,ec->e', rel, rel))
+        distance_km = np.asarray(distance_km, dtype=np.float64)
+        frequency = self._tables['frequency_hz'][edge_type]
+
+        values = {}
+        for name in self._required():
+            if name == 'fspl_db':
+                values[name] = 20.0 * np.log10(4.0 * np.pi * distance_km * 1000.0 * frequency / (C_LIGHT * 1000.0))
+            elif name == 'snr_db':
+                t = self._tables
+                values[name] = (10.0 * np.log10(t['tx_power_w'][edge_type]) + t['tx_gain_dbi'][edge_type]
+                                + t['rx_gain_dbi'][edge_type] - values['fspl_db'] - t['losses_db'][edge_type]
+                                - BOLTZMANN_DBW - 10.0 * np.log10(t['noise_temp_k'][edge_type])
+                                - 10.0 * np.log10(t['bandwidth_hz'][edge_type]))
+            elif name == 'capacity_bps':
+                values[name] = self._tables['bandwidth_hz'][edge_type] * np.log2(1.0 + 10.0 ** (values['snr_db'] / 10.0))
+            elif name == 'tx_energy_j':
+                values[name] = self._tables['tx_power_w'][edge_type] * self.packet_bits / values['capacity_bps']
+            elif name == 'doppler_hz':
+                rel_vel = self._relative_velocity(velocities, src, dst)
+                range_rate = np.einsum('ec,ec->e', rel, rel_vel) / distance_km  # km/s
+                values[name] = -frequency * range_rate / C_LIGHT
+            elif name == 'lifetime_s':
+                values[name] = self._lifetime(rel, self._relative_velocity(velocities, src, dst), edge_type,
+                                              distance_km, up, src, dst)
+        return {name: values[name] for name in self.attributes}
+
+    @staticmethod
+    def _relative_velocity(velocities, src, dst):
+        if velocities is None:
+            raise ValueError("Thuộc tính doppler_hz / lifetime_s cần vận tốc node (propagate_states)")
+        velocities = np.asarray(velocities, dtype=np.float64)
+        return velocities[dst] - velocities[src]
+
+    def _lifetime(self, rel, rel_vel, edge_type, distance_km, up, src, dst):
+        """Thời gian còn lại (s) tới khi hết điều kiện hình học, chuyển động tương đối thẳng đều (xem first_exit_time)."""
+        lifetime = np.full(len(rel), self.horizon_s)
+        vv = np.einsum('ec,ec->e', rel_vel, rel_vel)
+        rv = np.einsum('ec,ec->e', rel, rel_vel)
+
+        # ISL: D^2 - |r + v t|^2 >= 0
+        isl = edge_type == EDGE_ISL
+        if self.max_isl_distance_km is not None and np.any(isl):
+            c = np.maximum(self.max_isl_distance_km ** 2 - distance_km[isl] ** 2, 0.0)
+            lifetime[isl] = first_exit_time(-vv[isl], -2.0 * rv[isl], c, self.horizon_s)
+
+        # GSL: (r.u + (v.u) t)^2 - sin^2(el_min) |r + v t|^2 >= 0, r là vector trạm -> vệ tinh
+        gsl = edge_type == EDGE_GSL
+        if up is not None and np.any(gsl):
+            up = np.asarray(up, dtype=np.float64)
+            u = up[src[gsl]] + up[dst[gsl]]  # Hàng của vệ tinh bằng 0 -> vector 'lên' của đầu là trạm
+            sign = np.where(np.any(up[src[gsl]] != 0.0, axis=1), 1.0, -1.0)[:, None]  # Đổi chiều nếu trạm là dst
+            r, v = rel[gsl] * sign, rel_vel[gsl] * sign
+            s2 = np.sin(np.radians(self.min_elevation_deg)) ** 2
+            a_ru, b_vu = np.einsum('ec,ec->e', r, u), np.einsum('ec,ec->e', v, u)
+            a = b_vu ** 2 - s2 * vv[gsl]
+            b = 2.0 * (a_ru * b_vu - s2 * rv[gsl])
+            c = np.maximum(a_ru ** 2 - s2 * distance_km[gsl] ** 2, 0.0)
+            lifetime[gsl] = first_exit_time(a, b, c, self.horizon_s)
+        return lifetime
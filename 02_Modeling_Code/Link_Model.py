@@ -1,23 +1,78 @@
 # 02_Modeling_Code/Link_Model.py
 
+import os
+import glob
+from datetime import datetime
 import numpy as np
-import networkx as nx
 from typing import Dict, Any, List, Tuple
-from Propagator import C_LIGHT # Lấy hằng số tốc độ ánh sáng
+from scipy.sparse.csgraph import connected_components
+from Spatial_Index import forward_nearest_kdtree, select_forward_nearest, count_pairs_in_range
+from Ground_Station import compute_visibility
+from Instrumentation import (NULL_METRICS, STAGE_EDGE_SELECTION, STAGE_GSL, STAGE_GRAPH_BUILD, STAGE_ISOLATE_PRUNING,
+                             STAGE_LINK_METRICS)
+from Graph_Snapshot import GraphSnapshot
+from Link_Metrics import LinkMetricEngine, LINK_ATTRIBUTES, propagation_delay
+from Link_Assignment import greedy_b_matching, optimal_b_matching, greedy_assignment_kdtree, optimal_assignment_kdtree
 
 # --- HẰNG SỐ MÔ HÌNH HÓA STARLINK V1.0 ---
 # Tham khảo: Các nghiên cứu về kiến trúc Starlink V1.0 (Altitude ~550km)
 MAX_ISL_DISTANCE_KM = 2700.0  # Khoảng cách tối đa cho một Inter-Satellite Link (km)
 MAX_ISL_PER_SAT = 4           # Số lượng ISL tối đa cho mỗi vệ tinh (thường là 2 intra-plane, 2 inter-plane)
+MIN_ELEVATION_ANGLE_DEG = 10.0  # Góc nâng tối thiểu cho liên kết vệ tinh-mặt đất (GSL)
 
 # --- TRỌNG SỐ CHO BÀI TOÁN TỐI ƯU (ACO/Q-ACO) ---
-# Tối ưu hóa đơn mục tiêu (Delay)
-# Có thể mở rộng sang Multi-Objective (Delay, Energy, etc.) sau.
+# Tối ưu hóa đơn mục tiêu (Delay): chỉ cần weight_delay.
+# Multi-Objective (Delay, Energy, SNR, Doppler, thời gian sống liên kết): các thuộc tính cạnh tính theo lô
+# bằng Link_Metrics.LinkMetricEngine (xem link_attributes).
+
+# Chế độ tìm kiếm ứng viên ISL
+ENGINE_KDTREE = 'kdtree'  # Chỉ mục không gian (cây k-d), dùng cho toàn bộ chòm sao
+ENGINE_BRUTE = 'brute'    # Duyệt toàn bộ O(N^2), chỉ giữ lại làm chế độ tham chiếu để kiểm tra tương đương
+
+# Kiểu topo ISL (khóa ISL_TOPOLOGY trong kịch bản)
+ISL_TOPOLOGY_NEAREST = 'NEAREST'  # MAX_ISL_PER_SAT láng giềng gần nhất, tìm lại ở mỗi bước
+ISL_TOPOLOGY_GRID = 'GRID'        # +Grid theo mặt phẳng quỹ đạo (2 cùng mặt phẳng + 2 khác mặt phẳng), cặp cố định
+
+# Cách gán ISL trong topo NEAREST (khóa ISL_ASSIGNMENT trong kịch bản, xem Link_Assignment)
+ISL_ASSIGNMENT_FORWARD = 'FORWARD'  # Mỗi vệ tinh i khởi tạo tối đa MAX_ISL_PER_SAT cạnh tới j > i (quy tắc gốc)
+ISL_ASSIGNMENT_GREEDY = 'GREEDY'    # b-matching cạnh ngắn nhất trước: mọi vệ tinh tối đa MAX_ISL_PER_SAT cạnh
+ISL_ASSIGNMENT_OPTIMAL = 'OPTIMAL'  # b-matching tối ưu bằng MILP (chỉ chòm sao nhỏ)
+ISL_ASSIGNMENTS = (ISL_ASSIGNMENT_FORWARD, ISL_ASSIGNMENT_GREEDY, ISL_ASSIGNMENT_OPTIMAL)
 
 class LinkModel:
-    def __init__(self, is_multi_objective=False):
-        """Khởi tạo mô hình liên kết."""
+    def __init__(self, is_multi_objective=False, max_isl_distance_km=MAX_ISL_DISTANCE_KM,
+                 max_isl_per_sat=MAX_ISL_PER_SAT, engine=ENGINE_KDTREE,
+                 min_elevation_deg=MIN_ELEVATION_ANGLE_DEG, max_gsl_per_site=None, plane_grid=None, metrics=None,
+                 link_attributes=None, isl_assignment=ISL_ASSIGNMENT_FORWARD, isl_partition=None):
+        """
+        Khởi tạo mô hình liên kết.
+        max_gsl_per_site: số GSL tối đa mỗi trạm mặt đất (chọn vệ tinh gần nhất); None = mọi vệ tinh nhìn thấy.
+        plane_grid: PlaneGridTopology (tùy chọn) -> dùng topo +Grid cố định thay cho tìm láng giềng gần nhất.
+        metrics: bộ đo đạc (Instrumentation.Metrics); mặc định tắt.
+        link_attributes: thuộc tính cạnh bổ sung (Link_Metrics.LINK_ATTRIBUTES); None = tất cả nếu
+        is_multi_objective, ngược lại không có.
+        isl_assignment: cách gán ISL (ISL_ASSIGNMENTS); FORWARD chỉ giới hạn số cạnh mỗi vệ tinh khởi tạo,
+        GREEDY / OPTIMAL giới hạn bậc thật sự của mọi vệ tinh ở MAX_ISL_PER_SAT.
+        isl_partition: Multi_Constellation.ShellPartitionedISL (tùy chọn) -> ISL xây dựng theo từng shell với ràng
+        buộc riêng của mỗi chòm sao thay cho một lần tìm kiếm trên mọi vệ tinh.
+        """
+        if engine not in (ENGINE_KDTREE, ENGINE_BRUTE):
+            raise ValueError(f"Chế độ tìm kiếm ISL không hợp lệ: {engine}")
+        if isl_assignment not in ISL_ASSIGNMENTS:
+            raise ValueError(f"ISL_ASSIGNMENT không hợp lệ: {isl_assignment}")
         self.is_multi_objective = is_multi_objective
+        self.max_isl_distance_km = max_isl_distance_km
+        self.max_isl_per_sat = max_isl_per_sat
+        self.engine = engine
+        self.min_elevation_deg = min_elevation_deg
+        self.max_gsl_per_site = max_gsl_per_site
+        self.plane_grid = plane_grid
+        self.isl_partition = isl_partition
+        self.isl_assignment = isl_assignment
+        self.metrics = metrics or NULL_METRICS
+        if link_attributes is None:
+            link_attributes = LINK_ATTRIBUTES if is_multi_objective else ()
+        self.link_metrics = LinkMetricEngine(link_attributes, max_isl_distance_km, min_elevation_deg)
     
     def calculate_distance(self, pos1: np.ndarray, pos2: np.ndarray) -> float:
         """Tính toán khoảng cách Euclidean (3D) giữa hai vệ tinh (km)."""
@@ -26,89 +81,147 @@ class LinkModel:
     def calculate_delay(self, distance_km: float) -> float:
         """Tính toán độ trễ truyền dẫn (Propagation Delay) (giây)."""
         # Độ trễ = Khoảng cách / Tốc độ Ánh sáng
-        return distance_km / C_LIGHT
+        return propagation_delay(distance_km)
 
-    def create_dynamic_graph(self, positions: Dict[int, Dict[str, Any]]) -> nx.Graph:
+    def compute_isl_edges(self, pos_array: np.ndarray, node_index: np.ndarray = None):
         """
-        Tạo đồ thị G(t) động từ dữ liệu vị trí vệ tinh (ECEF).
-        Nodes: Vệ tinh (ID NORAD).
-        Edges: ISL và Link Mặt đất (sẽ được thêm sau).
-        Weights: Độ trễ (Propagation Delay).
+        Tính các cạnh ISL trên mảng vị trí (N, 3).
+        node_index: chỉ số node của từng hàng (chỉ dùng với topo +Grid / isl_partition, khi pos_array là tập con
+        các node).
+        Trả về (i, j, distance) là chỉ số hàng trong pos_array và khoảng cách (km).
         """
-        G = nx.Graph()
-        node_data = list(positions.items())
-        
-        # 1. Thêm các Node
-        for sat_id, data in positions.items():
-            # Thêm vị trí vào thuộc tính node để dễ dàng tham chiếu
-            G.add_node(sat_id, name=data['name'], pos=data['pos_km'])
-            
-        # 2. Xây dựng các Cạnh (ISL)
-        
-        # Lặp qua tất cả các cặp vệ tinh (tính toán n*(n-1)/2)
-        # Vì 9000 vệ tinh là quá lớn (40 triệu cặp), chúng ta phải dùng heuristic
-        # để chỉ kiểm tra các cặp có khả năng gần nhau (dựa trên cấu trúc chòm sao).
-        
-        # Heuristic đơn giản ban đầu (kiểm tra tất cả): CHỈ ÁP DỤNG CHO SUBSET NHỎ
-        # Đối với 9000 vệ tinh, việc lặp toàn bộ là không khả thi về mặt tính toán.
-        # Ta cần một cơ chế phân vùng (k-d tree hoặc phân loại theo mặt phẳng/thứ tự).
-        
-        # --- CHIẾN LƯỢC MÔ HÌNH HÓA ISL HIỆU QUẢ CAO ---
-        # Chúng ta giả định rằng dữ liệu TLE được sắp xếp theo mặt phẳng quỹ đạo.
-        # Tuy nhiên, điều này không phải lúc nào cũng đúng. 
-        # Cách hiệu quả nhất là mô phỏng 4 kết nối chính:
-        
-        # 2a. Kết nối cùng mặt phẳng (Intra-Plane ISL)
-        # Nếu TLE được sắp xếp theo NORAD_CAT_ID (thường gần nhau trong cùng plane)
-        
-        # Để đảm bảo tính toán nhanh, chúng ta chỉ tập trung vào các kết nối 
-        # đã được thiết lập theo cấu trúc chòm sao (nội bộ Starlink).
-        
-        # VÌ CHÚNG TA KHÔNG CÓ THÔNG TIN MẶT PHẲNG (PLANE ID) TỪ TLE THÔ:
-        # Chúng ta phải sử dụng một heuristic đơn giản hơn: Tìm kiếm hàng xóm gần nhất (Nearest Neighbors)
-        
-        # CHÚ Ý: Vì số lượng vệ tinh là 9000, việc lặp toàn bộ node là quá tốn kém (O(N^2)).
-        # Tạm thời, chúng ta sẽ chỉ lặp qua 100 vệ tinh đầu tiên để minh họa logic.
-        
-        # --- Thực hiện mô phỏng ISL trên một TẬP HỢP GIỚI HẠN (ví dụ: 500 vệ tinh đầu) ---
-        nodes_to_process = node_data[:500] 
+        metrics = self.metrics
+        if self.isl_partition is not None:
+            # Mỗi shell dùng LinkModel riêng của chòm sao (tự đo đạc, kể cả isl_links)
+            return self.isl_partition.edges(pos_array, node_index)
+        if self.plane_grid is not None:
+            with metrics.stage(STAGE_EDGE_SELECTION):
+                i, j, distance = self.plane_grid.edges(pos_array, self.max_isl_distance_km, node_index)
+        elif self.engine == ENGINE_BRUTE:
+            i, j, distance = self._compute_isl_edges_brute(pos_array)
+        else:
+            if self.isl_assignment == ISL_ASSIGNMENT_GREEDY:
+                i, j, distance = greedy_assignment_kdtree(pos_array, self.max_isl_distance_km,
+                                                          self.max_isl_per_sat, metrics=metrics)
+            elif self.isl_assignment == ISL_ASSIGNMENT_OPTIMAL:
+                i, j, distance = optimal_assignment_kdtree(pos_array, self.max_isl_distance_km,
+                                                           self.max_isl_per_sat, metrics=metrics)
+            else:
+                i, j, distance = forward_nearest_kdtree(pos_array, self.max_isl_distance_km, self.max_isl_per_sat,
+                                                        metrics=metrics)
+            if metrics.enabled:
+                # Đếm thêm mọi cặp trong tầm (một truy vấn cây k-d phụ, chỉ khi bật đo đạc)
+                in_range = count_pairs_in_range(pos_array, self.max_isl_distance_km)
+                metrics.count('links_in_range', in_range)
+                metrics.count('links_dropped_degree_cap', in_range - len(i))
+        metrics.count('isl_links', len(i))
+        return i, j, distance
+
+    def _compute_isl_edges_brute(self, pos_array: np.ndarray):
+        """
+        Chế độ tham chiếu: kiểm tra mọi cặp bằng vòng lặp Python lồng nhau (O(N^2)).
+        Với ISL_ASSIGNMENT GREEDY / OPTIMAL: giữ mọi cặp trong tầm rồi gán trên toàn bộ tập cặp.
+        """
+        forward = self.isl_assignment == ISL_ASSIGNMENT_FORWARD
+        i_list, j_list, d_list = [], [], []
         
-        for i in range(len(nodes_to_process)):
-            sat_i_id, sat_i_data = nodes_to_process[i]
-            pos_i = sat_i_data['pos_km']
+        for i in range(len(pos_array)):
+            pos_i = pos_array[i]
             
             # Khởi tạo danh sách các kết nối tiềm năng cho vệ tinh i
             potential_links = []
             
-            for j in range(i + 1, len(nodes_to_process)):
-                sat_j_id, sat_j_data = nodes_to_process[j]
-                pos_j = sat_j_data['pos_km']
+            for j in range(i + 1, len(pos_array)):
+                distance = self.calculate_distance(pos_i, pos_array[j])
                 
-                distance = self.calculate_distance(pos_i, pos_j)
-                
-                if distance <= MAX_ISL_DISTANCE_KM:
-                    delay = self.calculate_delay(distance)
-                    
-                    # Lưu trữ link tiềm năng
-                    potential_links.append({
-                        'target_id': sat_j_id,
-                        'distance': distance,
-                        'delay': delay
-                    })
+                if distance <= self.max_isl_distance_km:
+                    potential_links.append({'target': j, 'distance': distance})
             
             # Áp dụng quy tắc MAX_ISL_PER_SAT (Chọn 4 kết nối gần nhất)
             potential_links.sort(key=lambda x: x['distance'])
             
-            # Thêm các cạnh (ISL)
-            for link in potential_links[:MAX_ISL_PER_SAT]:
-                G.add_edge(sat_i_id, link['target_id'], 
-                           weight_delay=link['delay'],
-                           distance_km=link['distance'],
-                           type='ISL')
-                           
-        # Dọn dẹp: Xóa các node không có kết nối nào (nếu có, thường là các vệ tinh mới phóng)
-        isolated_nodes = list(nx.isolates(G))
-        G.remove_nodes_from(isolated_nodes)
+            for link in (potential_links[:self.max_isl_per_sat] if forward else potential_links):
+                i_list.append(i)
+                j_list.append(link['target'])
+                d_list.append(link['distance'])
+                
+        i, j, distance = (np.asarray(i_list, dtype=np.intp), np.asarray(j_list, dtype=np.intp),
+                          np.asarray(d_list, dtype=np.float64))
+        if forward:
+            return i, j, distance
+        if self.isl_assignment == ISL_ASSIGNMENT_GREEDY:
+            selected, _ = greedy_b_matching(len(pos_array), i, j, distance, self.max_isl_per_sat)
+        else:
+            selected = optimal_b_matching(len(pos_array), i, j, distance, self.max_isl_per_sat)
+        order = np.lexsort((distance[selected], i[selected]))
+        return i[selected][order], j[selected][order], distance[selected][order]
+
+    def compute_gsl_edges(self, site_pos: np.ndarray, site_up: np.ndarray, sat_pos: np.ndarray):
+        """
+        Tính các liên kết vệ tinh-mặt đất (GSL): tính góc nâng và khoảng cách nghiêng theo lô cho mọi
+        cặp trạm x vệ tinh, giữ các cặp có góc nâng >= min_elevation_deg.
+        Trả về (site_idx, sat_idx, distance) là chỉ số trong site_pos / sat_pos.
+        """
+        metrics = self.metrics
+        with metrics.stage(STAGE_GSL):
+            site_idx, sat_idx, distance, _ = compute_visibility(site_pos, site_up, sat_pos, self.min_elevation_deg)
+            n_visible = len(site_idx)
+            if self.max_gsl_per_site:
+                site_idx, sat_idx, distance = select_forward_nearest(site_idx, sat_idx, distance, self.max_gsl_per_site)
+        metrics.count('gsl_pairs_tested', len(site_pos) * len(sat_pos))
+        metrics.count('gsl_links_visible', n_visible)
+        metrics.count('gsl_links_dropped_cap', n_visible - len(site_idx))
+        return site_idx, sat_idx, distance
+
+    def compute_link_attributes(self, src, dst, edge_type, positions, velocities=None, up=None, distance_km=None):
+        """
+        Thuộc tính cạnh bổ sung {tên: mảng} cho mọi cạnh (src, dst là chỉ số node trong positions), tính theo lô
+        bằng LinkMetricEngine; {} nếu không cấu hình thuộc tính nào. Xem LinkMetricEngine.compute.
+        """
+        if not self.link_metrics.attributes:
+            return {}
+        with self.metrics.stage(STAGE_LINK_METRICS):
+            return self.link_metrics.compute(src, dst, edge_type, positions, velocities, up, distance_km)
+
+    def create_dynamic_graph(self, positions: Dict[int, Dict[str, Any]]) -> GraphSnapshot:
+        """
+        Tạo đồ thị G(t) động từ dữ liệu vị trí vệ tinh (ECEF).
+        Nodes: Vệ tinh (ID NORAD).
+        Edges: ISL (liên kết mặt đất GSL được thêm bởi DynamicGraphGenerator qua compute_gsl_edges).
+        Weights: Độ trễ (Propagation Delay).
+        """
+        node_ids = list(positions.keys())
+        names = [positions[sat_id]['name'] for sat_id in node_ids]
+        pos_array = np.array([positions[sat_id]['pos_km'] for sat_id in node_ids], dtype=np.float64).reshape(-1, 3)
+        if not node_ids:
+            empty = np.empty(0, dtype=np.intp)
+            return self.build_graph(node_ids, names, pos_array, empty, empty, np.empty(0))
+        
+        # Mặc định (không có plane_grid): heuristic tìm kiếm hàng xóm gần nhất (Nearest Neighbors).
+        # Thay vì duyệt O(N^2), các cặp ứng viên trong bán kính MAX_ISL_DISTANCE_KM được
+        # truy vấn theo lô trên cây k-d, nên áp dụng được cho toàn bộ chòm sao (~9000 vệ tinh).
+        # Topo +Grid theo mặt phẳng quỹ đạo: xem Plane_Topology.PlaneGridTopology (ISL_TOPOLOGY: GRID).
+        # Giới hạn bậc thật sự cho mọi vệ tinh (b-matching): xem Link_Assignment (ISL_ASSIGNMENT: GREEDY / OPTIMAL).
+        i, j, distance = self.compute_isl_edges(pos_array)
+        return self.build_graph(node_ids, names, pos_array, i, j, distance)
+
+    def build_graph(self, node_ids, names, pos_array, i, j, distance, edge_type=None,
+                    edge_attributes=None) -> GraphSnapshot:
+        """
+        Dựng GraphSnapshot (mảng node + CSR) từ các mảng: node (ID, tên, vị trí) và cạnh (chỉ số i, j, khoảng cách).
+        edge_type: mảng mã loại cạnh (chỉ số trong EDGE_TYPES); mặc định tất cả là ISL.
+        edge_attributes: thuộc tính cạnh bổ sung {tên: mảng} đã tính sẵn (compute_link_attributes).
+        Cần nx.Graph (thuật toán của networkx, GEXF) thì gọi to_networkx() trên kết quả.
+        """
+        # Dọn dẹp: Bỏ các node không có kết nối nào (nếu có, thường là các vệ tinh mới phóng)
+        with self.metrics.stage(STAGE_ISOLATE_PRUNING):
+            connected = GraphSnapshot.connected_nodes(len(node_ids), i, j)
+        self.metrics.count('isolates_pruned', len(node_ids) - int(connected.sum()))
+        
+        with self.metrics.stage(STAGE_GRAPH_BUILD):
+            # Node (ID, tên, vị trí) và cạnh (ISL và GSL) thành mảng liền khối; thuộc tính cạnh song song theo edge id
+            G = GraphSnapshot.from_edges(node_ids, names, pos_array, i, j, self.calculate_delay(distance),
+                                         distance, edge_type, keep=connected, edge_attributes=edge_attributes)
         
         print(f"Đã tạo đồ thị với {G.number_of_nodes()} node và {G.number_of_edges()} cạnh.")
         return G
@@ -119,7 +232,7 @@ def main_link_model(propagator_script):
     from Propagator import SatellitePropagator # Import Propagator để sử dụng
     
     # Chuẩn bị Propagator (Tải TLE mới nhất)
-    DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.getcwd()), '01_Data_Source')
+    DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_Data_Source')
     starlink_files = glob.glob(os.path.join(DATA_SOURCE_DIR, "STARLINK_TLE_*.txt"))
     latest_starlink_file = max(starlink_files, key=os.path.getctime)
 
@@ -134,28 +247,27 @@ def main_link_model(propagator_script):
     # 2. Khởi tạo và Tạo Đồ thị
     link_model = LinkModel()
     
-    # Truyền TẬP HỢP VỊ TRÍ GIỚI HẠN (ví dụ: chỉ 500 vệ tinh đầu) để test
-    positions_subset = dict(list(positions.items())[:500])
-    
-    G_t = link_model.create_dynamic_graph(positions_subset)
+    # Truyền TOÀN BỘ vị trí (chỉ mục không gian cho phép xử lý cả chòm sao)
+    G_t = link_model.create_dynamic_graph(positions)
     
     # 3. Phân tích Đồ thị (Kiểm tra xem đồ thị có đủ mạnh không)
     print("\n--- PHÂN TÍCH ĐỒ THỊ MẪU ---")
     
     if G_t.number_of_nodes() > 0:
-        avg_degree = sum(dict(G_t.degree()).values()) / G_t.number_of_nodes()
+        avg_degree = G_t.degrees().mean()
         print(f"Bậc (Degree) trung bình: {avg_degree:.2f}")
         
-        # Giá trị trung bình của độ trễ
-        delays = [G_t.edges[u, v]['weight_delay'] for u, v in G_t.edges]
+        # Giá trị trung bình của độ trễ (mảng thuộc tính cạnh)
+        delays = G_t.weight_delay
         print(f"Độ trễ trung bình (Mean Delay): {np.mean(delays)*1000:.3f} ms")
         print(f"Độ trễ tối đa (Max Delay): {np.max(delays)*1000:.3f} ms")
         
-        # Kiểm tra tính liên thông
-        if nx.is_connected(G_t):
-            print("Đồ thị (Subset) Đã liên thông.")
+        # Kiểm tra tính liên thông (trên ma trận kề CSR của snapshot)
+        n_components, _ = connected_components(G_t.adjacency_matrix(), directed=False)
+        if n_components == 1:
+            print("Đồ thị Đã liên thông.")
         else:
-            print(f"Đồ thị (Subset) Bị phân mảnh thành {nx.number_connected_components(G_t)} thành phần.")
+            print(f"Đồ thị Bị phân mảnh thành {n_components} thành phần.")
     else:
         print("Đồ thị rỗng. Không có kết nối nào được tạo.")
         
@@ -163,4 +275,4 @@ def main_link_model(propagator_script):
 
 if __name__ == "__main__":
     # CHÚ Ý: Đảm bảo Propagator.py đã được chạy thử nghiệm và không có lỗi
-    main_link_model(os.path.join(os.getcwd(), 'Propagator.py'))
+    main_link_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Propagator.py'))
@@ -0,0 +1,209 @@
+# 02_Modeling_Code/Multi_Constellation.py
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Instrumentation import NULL_METRICS, STAGE_CANDIDATE_SEARCH, STAGE_EDGE_SELECTION
+from Spatial_Index import RADIUS_SLACK, pair_distances
+from Plane_Topology import detect_shells, secular_elements, SHELL_ALTITUDE_TOL_KM, SHELL_INCLINATION_TOL_DEG
+from Link_Assignment import greedy_b_matching
+from Link_Model import LinkModel, ISL_ASSIGNMENT_FORWARD
+
+# --- NHIỀU CHÒM SAO / SHELL VỚI RÀNG BUỘC LIÊN KẾT RIÊNG (XÂY DỰNG ISL PHÂN VÙNG THEO SHELL) ---
+# Khóa CONSTELLATIONS của kịch bản: danh sách chòm sao (mỗi mục một nhóm catalog trong 01_Data_Source, ví dụ
+# STARLINK, ONEWEB, STATIONS làm relay), node vệ tinh được ghép theo đúng thứ tự danh sách. Mỗi chòm sao được chia
+# thành các shell theo góc nghiêng và độ cao trung bình (Plane_Topology.detect_shells, cùng ngưỡng SHELL_*_TOL với
+# topo +Grid); cụm ít hơn MIN_SHELL_SATELLITES vệ tinh (vệ tinh lẻ, đang nâng/hạ quỹ đạo) được gộp vào shell gần nhất:
+#   ISL trong shell: LinkModel riêng của chòm sao (MAX_ISL_DISTANCE_KM, MAX_ISL_PER_SAT, ISL_ASSIGNMENT) trên đúng
+#     các vệ tinh của shell (cây k-d riêng) -> chi phí là tổng các phần, không phải một lần dựng trên mọi node.
+#   ISL giữa các shell (cùng hoặc khác chòm sao): chỉ giữa các vệ tinh có CROSS_ISL_PER_SAT > 0 (đầu cuối riêng cho
+#     liên kết chéo), trong tầm min(MAX_ISL_DISTANCE_KM) của hai chòm sao. Mỗi bước, dải bán kính [r_min, r_max]
+#     của từng shell loại các cặp shell cách nhau quá tầm (ví dụ relay GEO với LEO), và chỉ các vệ tinh nằm trong
+#     dải bán kính của shell kia (nới thêm tầm) mới được đưa vào truy vấn cây k-d. Cạnh chéo được gán bằng
+#     b-matching tham lam (Link_Assignment.greedy_b_matching), mỗi vệ tinh tối đa CROSS_ISL_PER_SAT cạnh chéo.
+DEFAULT_MIN_SHELL_SATELLITES = 10  # Cụm nhỏ hơn ngưỡng này được gộp vào shell gần nhất (theo độ cao / góc nghiêng)
+
+class ConstellationSpec:
+    """Một chòm sao của kịch bản CONSTELLATIONS: nguồn catalog và ràng buộc liên kết riêng."""
+
+    def __init__(self, name, max_isl_distance_km, max_isl_per_sat, isl_assignment=ISL_ASSIGNMENT_FORWARD,
+                 cross_isl_per_sat=0, subset_size=None, catalog_filter=None, tle_file=None):
+        self.name = name
+        self.max_isl_distance_km = float(max_isl_distance_km)
+        self.max_isl_per_sat = int(max_isl_per_sat)
+        self.isl_assignment = isl_assignment
+        self.cross_isl_per_sat = int(cross_isl_per_sat)
+        self.subset_size = subset_size
+        self.catalog_filter = catalog_filter
+        self.tle_file = tle_file
+
+    @classmethod
+    def from_config(cls, entry, defaults):
+        """
+        Tạo từ một mục của CONSTELLATIONS ({NAME, SUBSET_SIZE, MAX_ISL_DISTANCE_KM, MAX_ISL_PER_SAT, ISL_ASSIGNMENT,
+        CROSS_ISL_PER_SAT, CATALOG_FILTER, TLE_FILE}); khóa ràng buộc vắng mặt lấy theo kịch bản (defaults).
+        """
+        return cls(entry['NAME'],
+                   entry.get('MAX_ISL_DISTANCE_KM', defaults['MAX_ISL_DISTANCE_KM']),
+                   entry.get('MAX_ISL_PER_SAT', defaults['MAX_ISL_PER_SAT']),
+                   entry.get('ISL_ASSIGNMENT', defaults.get('ISL_ASSIGNMENT', ISL_ASSIGNMENT_FORWARD)),
+                   entry.get('CROSS_ISL_PER_SAT', 0),
+                   entry.get('SUBSET_SIZE'),
+                   entry.get('CATALOG_FILTER'),
+                   entry.get('TLE_FILE'))
+
+def shell_elements(catalog):
+    """Góc nghiêng (độ) và độ cao trung bình (km, theo bán trục lớn) của các phần tử quỹ đạo (CATALOG_DTYPE)."""
+    epoch = np.asarray(catalog['epoch'], dtype=np.float64)
+    inclination_deg, _, _, altitude_km = secular_elements(catalog['inclo'], catalog['nodeo'], catalog['argpo'],
+                                                          catalog['mo'], catalog['no_kozai'], catalog['ecco'],
+                                                          epoch, epoch)
+    return inclination_deg, altitude_km
+
+def fold_small_shells(shell, inclination_deg, altitude_km, min_satellites=DEFAULT_MIN_SHELL_SATELLITES):
+    """
+    Gộp các vệ tinh của cụm nhỏ hơn min_satellites vào shell lớn gần nhất: khoảng cách tới trung vị (góc nghiêng,
+    độ cao) của shell, chuẩn hóa theo SHELL_INCLINATION_TOL_DEG / SHELL_ALTITUDE_TOL_KM. Nếu không có cụm nào đủ lớn,
+    mọi vệ tinh được gộp vào cụm đông nhất. Trả về nhãn shell mới (0..K-1).
+    """
+    counts = np.bincount(shell)
+    kept = np.flatnonzero(counts >= min_satellites)
+    if len(kept) == 0:
+        kept = np.array([np.argmax(counts)])
+    centers = np.array([[np.median(inclination_deg[shell == s]) / SHELL_INCLINATION_TOL_DEG,
+                         np.median(altitude_km[shell == s]) / SHELL_ALTITUDE_TOL_KM] for s in kept])
+    points = np.column_stack([inclination_deg / SHELL_INCLINATION_TOL_DEG, altitude_km / SHELL_ALTITUDE_TOL_KM])
+    is_kept = np.isin(shell, kept)
+    folded = np.searchsorted(kept, shell)
+    outliers = np.flatnonzero(~is_kept)
+    if len(outliers):
+        folded[outliers] = cKDTree(centers).query(points[outliers])[1]
+    return folded.astype(np.intp)
+
+class ShellPartitionedISL:
+    """
+    Xây dựng ISL phân vùng theo shell cho nhiều chòm sao (xem đầu module), dùng làm isl_partition của LinkModel.
+    constellation: chỉ số chòm sao (trong specs) của từng node vệ tinh; inclination_deg / altitude_km: góc nghiêng và
+    độ cao trung bình của node (shell_elements).
+    """
+
+    def __init__(self, specs, constellation, inclination_deg, altitude_km,
+                 min_shell_satellites=DEFAULT_MIN_SHELL_SATELLITES, metrics=None):
+        self.specs = list(specs)
+        self.constellation = np.asarray(constellation, dtype=np.intp)
+        self.metrics = metrics or NULL_METRICS
+        self.n_nodes = len(self.constellation)
+
+        # Shell: gom theo góc nghiêng / độ cao trong từng chòm sao (gộp cụm nhỏ), đánh số liên tiếp qua các chòm sao
+        inclination_deg = np.asarray(inclination_deg, dtype=np.float64)
+        altitude_km = np.asarray(altitude_km, dtype=np.float64)
+        self.shell = np.empty(self.n_nodes, dtype=np.intp)
+        shell_constellation = []
+        for c in range(len(self.specs)):
+            members = np.flatnonzero(self.constellation == c)
+            labels = detect_shells(inclination_deg[members], altitude_km[members])
+            if len(labels):
+                labels = fold_small_shells(labels, inclination_deg[members], altitude_km[members],
+                                           min_shell_satellites)
+            self.shell[members] = len(shell_constellation) + labels
+            shell_constellation.extend([c] * (int(labels.max()) + 1 if len(labels) else 0))
+        self.shell_constellation = np.asarray(shell_constellation, dtype=np.intp)
+        self.n_shells = len(shell_constellation)
+
+        # Mỗi chòm sao một LinkModel cho ISL trong shell; số đầu cuối chéo và tầm của từng node
+        self.models = [LinkModel(max_isl_distance_km=spec.max_isl_distance_km, max_isl_per_sat=spec.max_isl_per_sat,
+                                 isl_assignment=spec.isl_assignment, metrics=self.metrics, link_attributes=())
+                       for spec in self.specs]
+        self.cross_terminals = np.asarray([spec.cross_isl_per_sat for spec in self.specs],
+                                          dtype=np.int64)[self.constellation]
+        self.shell_range_km = np.asarray([self.specs[c].max_isl_distance_km for c in shell_constellation])
+
+    @classmethod
+    def from_catalog(cls, specs, constellation, catalog, min_shell_satellites=DEFAULT_MIN_SHELL_SATELLITES,
+                     metrics=None):
+        """Tạo từ mảng phần tử quỹ đạo (CATALOG_DTYPE) của các node vệ tinh."""
+        return cls(specs, constellation, *shell_elements(catalog), min_shell_satellites, metrics)
+
+    def describe(self):
+        """Mô tả ngắn các shell (chòm sao, số vệ tinh) để in khi khởi tạo."""
+        counts = np.bincount(self.shell, minlength=self.n_shells)
+        return ', '.join(f"{self.specs[c].name}#{s}: {counts[s]}" for s, c in enumerate(self.shell_constellation))
+
+    def edges(self, pos_array: np.ndarray, node_index: np.ndarray = None):
+        """
+        Các cạnh ISL tại một bước: trong từng shell rồi giữa các shell.
+        pos_array: vị trí (M, 3) của các node có mặt; node_index: chỉ số node của từng hàng (mặc định 0..M-1).
+        Trả về (i, j, distance) là chỉ số hàng trong pos_array (i < j), sắp xếp theo (i, khoảng cách).
+        """
+        pos_array = np.asarray(pos_array, dtype=np.float64).reshape(-1, 3)
+        if node_index is None:
+            node_index = np.arange(len(pos_array))
+        shell = self.shell[node_index]
+        order = np.argsort(shell, kind='stable')
+        bounds = np.searchsorted(shell[order], np.arange(self.n_shells + 1))
+        shell_rows = [order[bounds[s]:bounds[s + 1]] for s in range(self.n_shells)]
+
+        parts_i, parts_j, parts_d = [], [], []
+        for s, rows in enumerate(shell_rows):
+            model = self.models[self.shell_constellation[s]]
+            if len(rows) < 2 or model.max_isl_per_sat <= 0:
+                continue
+            i, j, distance = model.compute_isl_edges(pos_array[rows])
+            parts_i.append(rows[i])
+            parts_j.append(rows[j])
+            parts_d.append(distance)
+
+        i, j, distance = self._cross_shell_edges(pos_array, node_index, shell_rows)
+        parts_i.append(i)
+        parts_j.append(j)
+        parts_d.append(distance)
+        i, j, distance = np.concatenate(parts_i), np.concatenate(parts_j), np.concatenate(parts_d)
+        order = np.lexsort((distance, i))
+        return i[order].astype(np.intp), j[order].astype(np.intp), distance[order]
+
+    def _cross_shell_edges(self, pos_array, node_index, shell_rows):
+        """Cạnh giữa các shell trên các vệ tinh có đầu cuối chéo, cắt tỉa theo dải bán kính (xem đầu module)."""
+        metrics = self.metrics
+        capacity = self.cross_terminals[node_index]
+        radius = np.sqrt(np.einsum('ij,ij->i', pos_array, pos_array))
+        cross_rows = [rows[capacity[rows] > 0] for rows in shell_rows]
+        shells = [s for s, rows in enumerate(cross_rows) if len(rows)]
+        band = {s: (radius[cross_rows[s]].min(), radius[cross_rows[s]].max()) for s in shells}
+        cand_i, cand_j = [], []
+        n_pruned = 0
+        with metrics.stage(STAGE_CANDIDATE_SEARCH):
+            trees = {}
+            for k, a in enumerate(shells):
+                for b in shells[k + 1:]:
+                    reach = min(self.shell_range_km[a], self.shell_range_km[b])
+                    (a_min, a_max), (b_min, b_max) = band[a], band[b]
+                    if max(b_min - a_max, a_min - b_max) > reach:
+                        n_pruned += 1
+                        continue
+                    # Chỉ các vệ tinh của b trong dải bán kính của a (nới thêm tầm) mới có thể nằm trong tầm
+                    rows_b = cross_rows[b]
+                    rows_b = rows_b[(radius[rows_b] >= a_min - reach) & (radius[rows_b] <= a_max + reach)]
+                    if len(rows_b) == 0:
+                        continue
+                    if a not in trees:
+                        trees[a] = cKDTree(pos_array[cross_rows[a]])
+                    pairs = trees[a].sparse_distance_matrix(cKDTree(pos_array[rows_b]), reach * (1.0 + RADIUS_SLACK),
+                                                            output_type='ndarray')
+                    i, j = cross_rows[a][pairs['i']], rows_b[pairs['j']]
+                    keep = pair_distances(pos_array, i, j) <= reach
+                    cand_i.append(i[keep])
+                    cand_j.append(j[keep])
+        metrics.count('cross_shell_pairs_pruned', n_pruned)
+        if not cand_i:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty, np.empty(0)
+
+        with metrics.stage(STAGE_EDGE_SELECTION):
+            i, j = np.concatenate(cand_i), np.concatenate(cand_j)
+            i, j = np.minimum(i, j), np.maximum(i, j)
+            distance = pair_distances(pos_array, i, j)
+            metrics.count('cross_shell_candidates', len(i))
+            selected, _ = greedy_b_matching(len(pos_array), i, j, distance, capacity)
+        metrics.count('isl_links', len(selected))
+        metrics.count('cross_shell_links', len(selected))
+        return i[selected], j[selected], distance[selected]
@@ -0,0 +1,251 @@
+# 02_Modeling_Code/Orbital_Catalog.py
+
+import os
+import glob
+import json
+import shutil
+from datetime import datetime
+import numpy as np
+from sgp4.api import Satrec
+from sgp4 import omm, exporter
+
+from Propagator import CATALOG_DTYPE, ELEMENT_FIELDS, SGP4_EPOCH_JD, load_tle_catalog, _file_sha1
+from Plane_Topology import MU_EARTH, RE_WGS72, SHELL_ALTITUDE_TOL_KM, SHELL_INCLINATION_TOL_DEG
+
+# --- CATALOG PHẦN TỬ QUỸ ĐẠO DẠNG CỘT (DÙNG CHUNG CHO PROPAGATOR VÀ DATA_ANALYZER) ---
+# Dựng một lần từ file TLE 3 dòng hoặc OMM JSON của CelesTrak, lưu thành một thư mục:
+#   <cột>.npy      mỗi cột một mảng NumPy (memory-map khi đọc)
+#   meta.json      nguồn (đường dẫn, SHA-1, định dạng), số vệ tinh, kiểu dữ liệu các cột
+# Cột lưu trữ: các trường của CATALOG_DTYPE (satnum, name, line1, line2, epoch và phần tử SGP4 theo rad, rad/phút
+# - đúng giá trị Propagator đưa vào sgp4init) và object_id (mã quốc tế, ví dụ 2019-010A).
+# Cột dẫn xuất (DERIVED_COLUMNS: độ, vòng/ngày, km) chỉ được tính trên các hàng cần đọc.
+# select(where) đẩy bộ lọc xuống (filter pushdown): các điều kiện được xét lần lượt, mỗi điều kiện chỉ đọc cột của
+# nó tại các hàng còn lại; đọc kết quả (read / records) chỉ chạm các cột và hàng được chọn.
+# Điều kiện: (cột, phép so sánh, giá trị), ví dụ ('altitude_km', 'between', (545, 555)) hoặc
+# ('name', 'startswith', 'STARLINK'); YAML dùng danh sách [cột, phép, giá trị].
+CATALOG_DIRNAME = '.orbital_catalog'  # Thư mục catalog dựng từ file nguồn (cạnh file nguồn, khóa theo hash nội dung)
+CATALOG_VERSION = 1
+META_FILENAME = 'meta.json'
+MINUTES_PER_DAY = 1440.0
+
+STORED_DTYPE = np.dtype(CATALOG_DTYPE.descr + [('object_id', 'S11')])
+
+def _semi_major_axis_km(no_kozai):
+    """Bán trục lớn (km) từ chuyển động trung bình (rad/phút, WGS72)."""
+    return np.cbrt(MU_EARTH / (np.asarray(no_kozai, dtype=np.float64) / 60.0) ** 2)
+
+# Cột dẫn xuất: tên -> (các cột lưu trữ cần đọc, hàm tính)
+DERIVED_COLUMNS = {
+    'norad_id': (('satnum',), lambda satnum: satnum),
+    'epoch_utc': (('epoch',), lambda epoch: np.datetime64('1949-12-31T00:00:00', 'us')
+                  + np.rint(epoch * 86400e6).astype('timedelta64[us]')),
+    'mean_motion': (('no_kozai',), lambda n: n * MINUTES_PER_DAY / (2.0 * np.pi)),  # vòng/ngày
+    'eccentricity': (('ecco',), lambda e: e),
+    'inclination_deg': (('inclo',), np.degrees),
+    'raan_deg': (('nodeo',), np.degrees),
+    'arg_perigee_deg': (('argpo',), np.degrees),
+    'mean_anomaly_deg': (('mo',), np.degrees),
+    'semi_major_axis_km': (('no_kozai',), _semi_major_axis_km),
+    'altitude_km': (('no_kozai',), lambda n: _semi_major_axis_km(n) - RE_WGS72),  # Độ cao trung bình
+    'perigee_alt_km': (('no_kozai', 'ecco'), lambda n, e: _semi_major_axis_km(n) * (1.0 - e) - RE_WGS72),
+    'apogee_alt_km': (('no_kozai', 'ecco'), lambda n, e: _semi_major_axis_km(n) * (1.0 + e) - RE_WGS72),
+}
+
+OPERATORS = {
+    '==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    'between': lambda values, bounds: (values >= bounds[0]) & (values <= bounds[1]),
+    'in': lambda values, options: np.isin(values, options),
+    'not in': lambda values, options: ~np.isin(values, options),
+    'startswith': lambda values, prefix: np.char.startswith(values, prefix),
+}
+
+def _object_id_from_tle(line1: bytes) -> bytes:
+    """Mã quốc tế dạng OMM (2019-010A) từ cột 10-17 của dòng 1 TLE ('19010A')."""
+    designator = line1[9:17].strip()
+    if len(designator) < 5:
+        return b''
+    year = int(designator[:2])
+    return b"%d-%s" % (year + (1900 if year >= 57 else 2000), designator[2:])
+
+def records_from_tle(filepath, cache_dir=None):
+    """Mảng STORED_DTYPE từ file TLE (qua bộ đệm phân tích của Propagator)."""
+    catalog = load_tle_catalog(filepath, cache_dir)
+    records = np.zeros(len(catalog), dtype=STORED_DTYPE)
+    for name in CATALOG_DTYPE.names:
+        records[name] = catalog[name]
+    records['object_id'] = [_object_id_from_tle(line1) for line1 in catalog['line1']]
+    return records
+
+def records_from_omm(filepath):
+    """Mảng STORED_DTYPE từ file OMM JSON (khởi tạo Satrec bằng sgp4.omm, dòng TLE sinh lại bằng exporter)."""
+    with open(filepath, 'r') as f:
+        entries = json.load(f)
+    rows = []
+    for entry in entries:
+        satrec = Satrec()
+        try:
+            omm.initialize(satrec, entry)
+            line1, line2 = exporter.export_tle(satrec)
+        except Exception:
+            continue  # Bỏ qua bản ghi thiếu trường / không hợp lệ
+        epoch = (satrec.jdsatepoch - SGP4_EPOCH_JD) + satrec.jdsatepochF
+        rows.append((satrec.satnum, entry.get('OBJECT_NAME', '').encode()[:24], line1.encode(), line2.encode(), epoch)
+                    + tuple(getattr(satrec, field) for field in ELEMENT_FIELDS)
+                    + (entry.get('OBJECT_ID', '').encode()[:11],))
+    return np.array(rows, dtype=STORED_DTYPE)
+
+def write_catalog(catalog_dir, records, source=None):
+    """Ghi catalog dạng cột (ghi vào thư mục tạm rồi đổi tên, an toàn khi nhiều tiến trình cùng dựng)."""
+    tmp_dir = f"{catalog_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        for name in STORED_DTYPE.names:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(records[name]))
+        meta = {
+            'version': CATALOG_VERSION,
+            'n_satellites': int(len(records)),
+            'created_at': datetime.now().isoformat(),
+            'source': source or {},
+            'dtypes': {name: records.dtype[name].str for name in STORED_DTYPE.names},
+        }
+        with open(os.path.join(tmp_dir, META_FILENAME), 'w') as f:
+            json.dump(meta, f, indent=2)
+        try:
+            os.replace(tmp_dir, catalog_dir)
+        except OSError:
+            pass  # Tiến trình khác đã dựng xong cùng catalog -> dùng bản đó
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return catalog_dir
+
+def open_catalog(source, cache_dir=None):
+    """
+    Mở catalog dạng cột từ source: thư mục catalog đã dựng, file OMM JSON (.json) hoặc file TLE.
+    File nguồn được dựng thành catalog một lần, lưu trong cache_dir (mặc định <thư mục nguồn>/.orbital_catalog)
+    theo hash nội dung; các lần sau chỉ memory-map lại.
+    """
+    if os.path.isdir(source):
+        return OrbitalCatalog(source)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(source)), CATALOG_DIRNAME)
+    sha1 = _file_sha1(source)
+    catalog_dir = os.path.join(cache_dir, f"{sha1}_v{CATALOG_VERSION}")
+    if not os.path.isfile(os.path.join(catalog_dir, META_FILENAME)):
+        source_format = 'OMM' if source.lower().endswith('.json') else 'TLE'
+        records = records_from_omm(source) if source_format == 'OMM' else records_from_tle(source)
+        os.makedirs(cache_dir, exist_ok=True)
+        write_catalog(catalog_dir, records, {'path': os.path.abspath(source), 'sha1': sha1, 'format': source_format})
+    return OrbitalCatalog(catalog_dir)
+
+def _latest_file(data_dir, pattern):
+    files = glob.glob(os.path.join(data_dir, pattern))
+    if not files:
+        raise FileNotFoundError(f"Không tìm thấy file nào khớp với pattern: {pattern}")
+    return max(files, key=os.path.getctime)
+
+def group_source(group, data_dir):
+    """
+    File nguồn của một nhóm catalog trong data_dir: file chuẩn của kho (data_collector, <NHÓM>_TLE.txt),
+    nếu không có thì file TLE có timestamp mới nhất, cuối cùng là OMM JSON mới nhất (FileNotFoundError nếu không có).
+    """
+    store_tle = os.path.join(data_dir, f"{group}_TLE.txt")
+    if os.path.exists(store_tle):
+        return store_tle
+    try:
+        return _latest_file(data_dir, f"{group}_TLE_*.txt")
+    except FileNotFoundError:
+        return _latest_file(data_dir, f"{group}_*.json")
+
+def load_ids(source):
+    """Tập ID NORAD (đã sắp xếp) của một catalog/file nguồn, ví dụ để loại các vệ tinh nhóm DECAYING."""
+    return np.unique(open_catalog(source).column('satnum'))
+
+def parse_where(spec):
+    """Chuẩn hóa bộ lọc (danh sách [cột, phép, giá trị], ví dụ từ YAML) thành danh sách tuple; kiểm tra tên."""
+    predicates = []
+    for item in spec or []:
+        if len(item) != 3:
+            raise ValueError(f"Điều kiện lọc catalog phải có dạng [cột, phép, giá trị]: {item}")
+        column, op, value = item
+        if column not in STORED_DTYPE.names and column not in DERIVED_COLUMNS:
+            raise ValueError(f"Cột catalog không tồn tại: {column}")
+        if op not in OPERATORS:
+            raise ValueError(f"Phép lọc không hỗ trợ: {op} (hỗ trợ: {', '.join(OPERATORS)})")
+        predicates.append((column, op, value))
+    return predicates
+
+def shell_filter(altitude_km, inclination_deg=None, altitude_tol_km=SHELL_ALTITUDE_TOL_KM,
+                 inclination_tol_deg=SHELL_INCLINATION_TOL_DEG):
+    """Bộ lọc một shell: độ cao trung bình (và góc nghiêng nếu có) trong ngưỡng gom shell của Plane_Topology."""
+    where = [('altitude_km', 'between', (altitude_km - altitude_tol_km, altitude_km + altitude_tol_km))]
+    if inclination_deg is not None:
+        where.append(('inclination_deg', 'between',
+                      (inclination_deg - inclination_tol_deg, inclination_deg + inclination_tol_deg)))
+    return where
+
+class OrbitalCatalog:
+    """Catalog dạng cột đã dựng (xem chú thích đầu module); các cột lưu trữ được memory-map khi cần."""
+
+    def __init__(self, catalog_dir):
+        self.catalog_dir = catalog_dir
+        with open(os.path.join(catalog_dir, META_FILENAME), 'r') as f:
+            self.meta = json.load(f)
+        self.n_satellites = self.meta['n_satellites']
+        self._columns = {}
+
+    def __len__(self):
+        return self.n_satellites
+
+    @property
+    def column_names(self):
+        """Tên các cột lưu trữ và dẫn xuất."""
+        return list(STORED_DTYPE.names) + list(DERIVED_COLUMNS)
+
+    def _stored(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.catalog_dir, f"{name}.npy"), mmap_mode='r')
+        return self._columns[name]
+
+    def column(self, name, rows=None):
+        """Giá trị cột name tại các hàng rows (mặc định mọi hàng); cột dẫn xuất chỉ tính trên các hàng đó."""
+        if name in DERIVED_COLUMNS:
+            dependencies, function = DERIVED_COLUMNS[name]
+            return function(*(self.column(dependency, rows) for dependency in dependencies))
+        if name not in STORED_DTYPE.names:
+            raise KeyError(f"Cột catalog không tồn tại: {name}")
+        values = self._stored(name)
+        return np.array(values if rows is None else values[rows])
+
+    def select(self, where=None, ids=None, exclude_ids=None):
+        """
+        Chỉ số (tăng dần) các hàng thỏa mọi điều kiện where, thuộc ids (nếu có) và không thuộc exclude_ids.
+        Mỗi điều kiện chỉ đọc cột của nó trên các hàng còn lại sau các điều kiện trước.
+        """
+        rows = np.arange(self.n_satellites)
+        if ids is not None:
+            rows = rows[np.isin(self.column('satnum', rows), np.asarray(ids, dtype=np.int64))]
+        if exclude_ids is not None:
+            rows = rows[~np.isin(self.column('satnum', rows), np.asarray(exclude_ids, dtype=np.int64))]
+        for column, op, value in parse_where(where):
+            values = self.column(column, rows)
+            if values.dtype.kind == 'S':
+                value = (np.char.encode(np.asarray(value, dtype=str)) if not isinstance(value, str)
+                         else value.encode())
+            rows = rows[OPERATORS[op](values, value)]
+        return rows
+
+    def read(self, columns, where=None, ids=None, exclude_ids=None, rows=None):
+        """Dict {cột: mảng} chỉ gồm các cột yêu cầu tại các hàng được chọn (rows hoặc theo bộ lọc)."""
+        if rows is None:
+            rows = self.select(where, ids, exclude_ids)
+        return {name: self.column(name, rows) for name in columns}
+
+    def records(self, rows=None):
+        """Mảng CATALOG_DTYPE (định dạng phần tử quỹ đạo của Propagator) của các hàng rows."""
+        rows = np.arange(self.n_satellites) if rows is None else np.asarray(rows, dtype=np.intp)
+        records = np.empty(len(rows), dtype=CATALOG_DTYPE)
+        for name in CATALOG_DTYPE.names:
+            records[name] = self.column(name, rows)
+        return records
+
+    def __repr__(self):
+        return f"OrbitalCatalog({self.n_satellites} vệ tinh, nguồn {self.meta['source'].get('path')})"
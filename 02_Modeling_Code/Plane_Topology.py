@@ -0,0 +1,240 @@
+# 02_Modeling_Code/Plane_Topology.py
+
+from datetime import datetime, timezone
+import numpy as np
+from typing import Dict, Any, List
+
+from Spatial_Index import pair_distances
+
+# --- HẰNG SỐ TRỌNG TRƯỜNG WGS72 (cùng mô hình với SGP4 trong Propagator) ---
+MU_EARTH = 398600.8      # km^3/s^2
+RE_WGS72 = 6378.135      # km
+J2 = 0.001082616
+
+# --- NGƯỠNG PHÂN CỤM (gom theo khoảng trống giữa các giá trị đã sắp xếp) ---
+SHELL_INCLINATION_TOL_DEG = 0.1   # Hai vệ tinh cùng shell nếu góc nghiêng chênh nhau không quá ngưỡng này...
+SHELL_ALTITUDE_TOL_KM = 5.0       # ...và độ cao trung bình chênh nhau không quá ngưỡng này
+PLANE_RAAN_TOL_DEG = 1.0          # Cùng mặt phẳng quỹ đạo nếu RAAN (đã quy về cùng thời điểm) đủ gần
+MAX_SHELL_REFINEMENTS = 8         # Số vòng tách xen kẽ góc nghiêng/độ cao tối đa khi gom shell
+SEAM_GAP_FACTOR = 2.0             # Khoảng RAAN giữa hai mặt phẳng > SEAM_GAP_FACTOR x trung vị -> đường nối (seam), không nối ISL
+
+SGP4_EPOCH = datetime(1949, 12, 31, tzinfo=timezone.utc)  # Mốc epoch của sgp4init (Propagator.SGP4_EPOCH_JD)
+
+def epoch_days(dt: datetime) -> float:
+    """Số ngày (UTC) kể từ mốc epoch của sgp4init, cùng đơn vị với cột 'epoch' của catalog TLE."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - SGP4_EPOCH).total_seconds() / 86400.0
+
+def secular_elements(inclo, nodeo, argpo, mo, no_kozai, ecco, epoch, ref_epoch):
+    """
+    Đưa các phần tử quỹ đạo trung bình (đơn vị như Satrec: rad, rad/phút, epoch theo ngày) về cùng
+    thời điểm ref_epoch bằng các tốc độ trôi thế kỷ do J2 (RAAN, cận điểm, dị thường trung bình).
+    Cần thiết vì mỗi TLE có epoch riêng: RAAN của Starlink trôi ~5 độ/ngày.
+    Trả về (inclination_deg, raan_deg, arg_latitude_deg, altitude_km).
+    """
+    n = np.asarray(no_kozai, dtype=np.float64) / 60.0                      # rad/s
+    ecc = np.asarray(ecco, dtype=np.float64)
+    a = np.cbrt(MU_EARTH / n ** 2)
+    p = a * (1.0 - ecc ** 2)
+    k = 0.75 * n * J2 * (RE_WGS72 / p) ** 2
+    cos_i = np.cos(inclo)
+    dt = (ref_epoch - np.asarray(epoch, dtype=np.float64)) * 86400.0
+    raan = nodeo - 2.0 * k * cos_i * dt
+    argp = argpo + k * (5.0 * cos_i ** 2 - 1.0) * dt
+    mean_anomaly = mo + (n + k * np.sqrt(1.0 - ecc ** 2) * (3.0 * cos_i ** 2 - 1.0)) * dt
+    # Quỹ đạo gần tròn: vị trí trong mặt phẳng ~ đối số vĩ độ u = cận điểm + dị thường trung bình
+    return (np.degrees(inclo), np.degrees(raan) % 360.0, np.degrees(argp + mean_anomaly) % 360.0,
+            a - RE_WGS72)
+
+def gap_clusters(values: np.ndarray, tol: float, period: float = None) -> np.ndarray:
+    """
+    Gom cụm 1 chiều: sắp xếp rồi tách tại các khoảng trống > tol (O(N log N)).
+    period: nếu là đại lượng tuần hoàn (góc), cụm đầu và cụm cuối được nối qua điểm 0/period.
+    Trả về nhãn cụm (0..K-1) theo thứ tự giá trị tăng dần.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.intp)
+    order = np.argsort(values, kind='stable')
+    sorted_values = values[order]
+    sorted_labels = np.r_[0, np.cumsum(np.diff(sorted_values) > tol)]
+    if period is not None and sorted_labels[-1] > 0 and sorted_values[0] + period - sorted_values[-1] <= tol:
+        sorted_labels[sorted_labels == sorted_labels[-1]] = 0
+    labels = np.empty(len(values), dtype=np.intp)
+    labels[order] = sorted_labels
+    return labels
+
+def _label_groups(labels: np.ndarray):
+    """Danh sách chỉ số thành viên của từng nhãn."""
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    return np.split(order, bounds) if len(order) else []
+
+def _split_groups(labels: np.ndarray, values: np.ndarray, tol: float):
+    """Tách mỗi nhóm hiện có theo khoảng trống của values (cập nhật labels tại chỗ)."""
+    n_labels = int(labels.max()) + 1 if len(labels) else 0
+    for members in _label_groups(labels.copy()):
+        sub = gap_clusters(values[members], tol)
+        labels[members[sub > 0]] = n_labels + sub[sub > 0] - 1
+        n_labels += int(sub.max())
+
+def detect_shells(inclination_deg, altitude_km, inclination_tol_deg=SHELL_INCLINATION_TOL_DEG,
+                  altitude_tol_km=SHELL_ALTITUDE_TOL_KM) -> np.ndarray:
+    """
+    Gom shell: tách xen kẽ theo góc nghiêng và độ cao tới khi ổn định, để các vệ tinh đang nâng/hạ quỹ đạo
+    (giá trị trung gian) không nối liền hai shell khác nhau thành một cụm. Trả về nhãn shell (0..K-1).
+    """
+    inclination_deg = np.asarray(inclination_deg, dtype=np.float64)
+    altitude_km = np.asarray(altitude_km, dtype=np.float64)
+    shell = np.zeros(len(inclination_deg), dtype=np.intp)
+    n_shells = min(len(shell), 1)
+    for _ in range(MAX_SHELL_REFINEMENTS):
+        n_before = n_shells
+        for values, tol in ((inclination_deg, inclination_tol_deg), (altitude_km, altitude_tol_km)):
+            _split_groups(shell, values, tol)
+            _, shell = np.unique(shell, return_inverse=True)
+            n_shells = int(shell.max()) + 1 if len(shell) else 0
+        if n_shells == n_before:
+            break
+    return shell.astype(np.intp)
+
+def _circular_mean_deg(angles_deg: np.ndarray) -> float:
+    rad = np.radians(angles_deg)
+    return float(np.degrees(np.arctan2(np.sin(rad).mean(), np.cos(rad).mean())) % 360.0)
+
+def _wrap_deg(delta: np.ndarray) -> np.ndarray:
+    """Quy hiệu góc về khoảng [-180, 180)."""
+    return (np.asarray(delta) + 180.0) % 360.0 - 180.0
+
+class PlaneGridTopology:
+    """
+    Topo ISL +Grid theo mặt phẳng quỹ đạo: mỗi vệ tinh có 2 ISL cùng mặt phẳng (trước/sau theo đối số vĩ độ)
+    và 2 ISL khác mặt phẳng (vệ tinh cùng pha ở mặt phẳng kề bên trái/phải trong cùng shell).
+    Các cặp được xác định một lần từ phần tử quỹ đạo (sắp xếp, O(N log N)) và giữ nguyên theo thời gian;
+    mỗi bước chỉ tính lại khoảng cách và bỏ các cặp vượt MAX_ISL_DISTANCE_KM.
+    Chỉ số node là thứ tự các phần tử truyền vào.
+    """
+
+    def __init__(self, inclination_deg, raan_deg, arg_latitude_deg, altitude_km,
+                 inclination_tol_deg=SHELL_INCLINATION_TOL_DEG, altitude_tol_km=SHELL_ALTITUDE_TOL_KM,
+                 raan_tol_deg=PLANE_RAAN_TOL_DEG):
+        self.inclination_deg = np.asarray(inclination_deg, dtype=np.float64)
+        self.raan_deg = np.asarray(raan_deg, dtype=np.float64)
+        self.arg_latitude_deg = np.asarray(arg_latitude_deg, dtype=np.float64)
+        self.altitude_km = np.asarray(altitude_km, dtype=np.float64)
+        self.n_nodes = len(self.inclination_deg)
+
+        # 1. Shell: gom theo góc nghiêng và độ cao (detect_shells)
+        self.shell = detect_shells(self.inclination_deg, self.altitude_km, inclination_tol_deg, altitude_tol_km)
+        self.n_shells = int(self.shell.max()) + 1 if self.n_nodes else 0
+
+        # 2. Mặt phẳng quỹ đạo: gom theo RAAN (tuần hoàn) trong mỗi shell
+        self.plane = np.empty(self.n_nodes, dtype=np.intp)
+        self.shell_planes: List[List[int]] = []  # Các mặt phẳng của mỗi shell, sắp theo RAAN
+        plane_raan = []
+        n_planes = 0
+        for members in _label_groups(self.shell):
+            raan_label = gap_clusters(self.raan_deg[members], raan_tol_deg, period=360.0)
+            _, raan_label = np.unique(raan_label, return_inverse=True)
+            self.plane[members] = n_planes + raan_label
+            means = [_circular_mean_deg(self.raan_deg[members[raan_label == p]]) for p in range(raan_label.max() + 1)]
+            self.shell_planes.append([n_planes + p for p in np.argsort(means)])
+            plane_raan.extend(means)
+            n_planes += len(means)
+        self.n_planes = n_planes
+        self.plane_raan_deg = np.asarray(plane_raan)
+
+        # 3. Gán cặp ISL cố định
+        intra = self._intra_plane_pairs()
+        inter = self._inter_plane_pairs()
+        pairs = np.concatenate([intra, inter]) if len(intra) or len(inter) else np.empty((0, 2), dtype=np.intp)
+        pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+        self.src, self.dst = pairs[:, 0], pairs[:, 1]
+        self.n_intra_pairs = len(intra)
+
+    def _intra_plane_pairs(self) -> np.ndarray:
+        """Nối mỗi vệ tinh với vệ tinh kế tiếp theo đối số vĩ độ trong cùng mặt phẳng (vòng kín)."""
+        order = np.lexsort((self.arg_latitude_deg, self.plane))
+        plane_sorted = self.plane[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(plane_sorted)) + 1]
+        sizes = np.diff(np.r_[starts, len(order)])
+        start_of = np.repeat(starts, sizes)
+        size_of = np.repeat(sizes, sizes)
+        position = np.arange(len(order)) - start_of
+        successor = order[start_of + (position + 1) % size_of]
+        keep = size_of >= 2
+        return np.stack([order[keep], successor[keep]], axis=1)
+
+    def _inter_plane_pairs(self) -> np.ndarray:
+        """
+        Nối mỗi vệ tinh với vệ tinh gần pha nhất ở mặt phẳng kế tiếp (theo RAAN) trong cùng shell.
+        Mỗi vệ tinh nhận tối đa một liên kết từ mặt phẳng trước (giữ cặp lệch pha nhỏ nhất), nên bậc <= 4.
+        Không nối qua các khoảng RAAN lớn bất thường (seam của chòm sao dạng Walker-star, shell chưa phóng đủ).
+        """
+        members_of = _label_groups(self.plane)
+        pairs = []
+        for planes in self.shell_planes:
+            if len(planes) < 2:
+                continue
+            raan = self.plane_raan_deg[planes]
+            gaps = np.r_[np.diff(raan), raan[0] + 360.0 - raan[-1]]
+            limit = SEAM_GAP_FACTOR * np.median(gaps)
+            for k, p in enumerate(planes):
+                if gaps[k] > limit or (len(planes) == 2 and k == 1):
+                    continue
+                q = planes[(k + 1) % len(planes)]
+                a, b = members_of[p], members_of[q]
+                b = b[np.argsort(self.arg_latitude_deg[b])]
+                u_b = self.arg_latitude_deg[b]
+                # Ứng viên: hai vệ tinh liền kề theo pha (vòng tròn) ở mặt phẳng q
+                pos = np.searchsorted(u_b, self.arg_latitude_deg[a])
+                cand = np.stack([pos % len(b), (pos - 1) % len(b)], axis=1)
+                phase = np.abs(_wrap_deg(u_b[cand] - self.arg_latitude_deg[a][:, None]))
+                best = np.argmin(phase, axis=1)
+                target = cand[np.arange(len(a)), best]
+                phase = phase[np.arange(len(a)), best]
+                # Mỗi vệ tinh ở q chỉ nhận một liên kết: giữ cặp có độ lệch pha nhỏ nhất
+                order = np.lexsort((phase, target))
+                first = np.r_[True, np.diff(target[order]) != 0]
+                chosen = order[first]
+                pairs.append(np.stack([a[chosen], b[target[chosen]]], axis=1))
+        return np.concatenate(pairs) if pairs else np.empty((0, 2), dtype=np.intp)
+
+    @classmethod
+    def from_catalog(cls, catalog: np.ndarray, ref_time: datetime, **kwargs):
+        """Tạo topo từ mảng phần tử quỹ đạo của Propagator (CATALOG_DTYPE), quy về thời điểm ref_time."""
+        return cls(*secular_elements(catalog['inclo'], catalog['nodeo'], catalog['argpo'], catalog['mo'],
+                                     catalog['no_kozai'], catalog['ecco'], catalog['epoch'],
+                                     epoch_days(ref_time)), **kwargs)
+
+    @classmethod
+    def from_omm(cls, records: List[Dict[str, Any]], ref_time: datetime, **kwargs):
+        """Tạo topo từ các bản ghi OMM JSON (INCLINATION, RA_OF_ASC_NODE, MEAN_ANOMALY, ...) của CelesTrak."""
+        def column(key):
+            return np.array([float(r[key]) for r in records], dtype=np.float64)
+        epoch = np.array([epoch_days(datetime.fromisoformat(r['EPOCH'])) for r in records], dtype=np.float64)
+        return cls(*secular_elements(
+            np.radians(column('INCLINATION')), np.radians(column('RA_OF_ASC_NODE')),
+            np.radians(column('ARG_OF_PERICENTER')), np.radians(column('MEAN_ANOMALY')),
+            column('MEAN_MOTION') * 2.0 * np.pi / 1440.0, column('ECCENTRICITY'), epoch,
+            epoch_days(ref_time)), **kwargs)
+
+    def edges(self, pos_array: np.ndarray, max_distance_km: float, node_index: np.ndarray = None):
+        """
+        Các cạnh ISL tại một bước thời gian.
+        pos_array: vị trí (M, 3) của các node có mặt; node_index: chỉ số node (theo thứ tự của topo) của
+        từng hàng (mặc định 0..M-1). Cặp có node vắng mặt / vị trí NaN / vượt max_distance_km bị bỏ.
+        Trả về (i, j, distance) là chỉ số hàng trong pos_array, giống LinkModel.compute_isl_edges.
+        """
+        pos_array = np.asarray(pos_array, dtype=np.float64).reshape(-1, 3)
+        if node_index is None:
+            node_index = np.arange(len(pos_array))
+        row_of = np.full(self.n_nodes, -1, dtype=np.intp)
+        row_of[node_index] = np.arange(len(node_index))
+        i, j = row_of[self.src], row_of[self.dst]
+        present = (i >= 0) & (j >= 0)
+        i, j = i[present], j[present]
+        distance = pair_distances(pos_array, i, j)
+        keep = distance <= max_distance_km  # NaN -> False
+        return i[keep], j[keep], distance[keep]
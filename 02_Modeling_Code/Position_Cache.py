@@ -0,0 +1,223 @@
+# 02_Modeling_Code/Position_Cache.py
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+
+# --- BỘ ĐỆM VỊ TRÍ DÙNG CHUNG (ON-DISK, MEMORY-MAPPED, LRU) ---
+# Các kịch bản cùng file TLE và cùng lưới thời gian (START_TIME, TIME_STEP_SECONDS, số bước, bộ cung cấp vị trí)
+# có cùng vị trí vệ tinh, chỉ khác tham số liên kết (MAX_ISL_*, SUBSET_SIZE, OBJECTIVE...). Vị trí của TOÀN BỘ
+# catalog trên cả lưới thời gian được tính một lần và lưu thành một mục trong thư mục bộ đệm:
+#   <key>/positions.npy   (n_sats, T, 3) float64, ECEF (km), NaN nếu lan truyền thất bại
+#   <key>/errors.npy      (n_sats, T) uint8, mã lỗi SGP4
+#   <key>/meta.json       khóa, kích thước, sai số nội suy đo được (HERMITE)
+# Các lần chạy sau (kể cả nhiều tiến trình cùng lúc) chỉ memory-map hai file .npy (chia sẻ page cache).
+# Mục được ghi vào thư mục tạm rồi đổi tên (nguyên tử). Khi tổng dung lượng vượt max_bytes, các mục ít được
+# dùng gần đây nhất (theo mtime của meta.json, được cập nhật mỗi lần dùng) bị xóa.
+POSITION_CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+META_FILENAME = 'meta.json'
+TIME_ALIGNMENT_TOLERANCE_S = 1e-6  # Thời điểm yêu cầu phải trùng lưới của bộ đệm trong ngưỡng này
+VELOCITY_STENCIL_POINTS = 5        # Số điểm lưới cho sai phân hữu hạn bậc 4 khi suy ra vận tốc (propagate_states)
+
+def content_sha1(filepath):
+    """Hash SHA-1 của nội dung file (đọc theo khối)."""
+    digest = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def position_cache_key(tle_path, start_time: datetime, time_step_s: float, n_steps: int, provider=None):
+    """
+    Khóa của một mục bộ đệm: nội dung file TLE + lưới thời gian + mô tả bộ cung cấp vị trí
+    (provider: dict nhỏ, ví dụ {'POSITION_PROVIDER': 'HERMITE', 'anchor_step_s': 24.0}).
+    Trả về (key, fields) với fields là các thành phần của khóa (lưu trong meta.json).
+    """
+    fields = {
+        'version': POSITION_CACHE_VERSION,
+        'tle_sha1': content_sha1(tle_path),
+        'start_time': start_time.astimezone(timezone.utc).isoformat(),
+        'time_step_s': float(time_step_s),
+        'n_steps': int(n_steps),
+        'provider': provider or {},
+    }
+    key = hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:20]
+    return key, fields
+
+class CachedPositions:
+    """
+    Vị trí đã tính sẵn trên lưới thời gian cố định (memory-mapped), cùng giao diện propagate_batch với
+    SatellitePropagator. Thời điểm không nằm trên lưới được chuyển cho bộ cung cấp gốc (fallback).
+    """
+
+    def __init__(self, positions, errors, start_time: datetime, time_step_s: float, meta=None, fallback=None):
+        self.positions = positions
+        self.errors = errors
+        self.start_time = start_time
+        self.time_step_s = float(time_step_s)
+        self.meta = dict(meta or {})
+        self.fallback = fallback
+        # Sai số nội suy (HERMITE) đo được khi tính mục bộ đệm; None với SGP4
+        self.error_bound_km = self.meta.get('error_bound_km')
+        self.measured_max_error_km = self.meta.get('measured_max_error_km')
+
+    @property
+    def n_satellites(self):
+        return self.positions.shape[0]
+
+    def _steps(self, times):
+        """Chỉ số bước trên lưới của bộ đệm, hoặc None nếu có thời điểm lệch lưới / ngoài lưới."""
+        seconds = np.array([(dt - self.start_time).total_seconds() for dt in times], dtype=np.float64)
+        steps = np.rint(seconds / self.time_step_s).astype(np.int64)
+        aligned = np.abs(steps * self.time_step_s - seconds) <= TIME_ALIGNMENT_TOLERANCE_S
+        if not aligned.all() or steps.min() < 0 or steps.max() >= self.positions.shape[1]:
+            return None
+        return steps
+
+    def propagate_batch(self, times, indices=None):
+        """Vị trí (n_sats, n_times, 3) và mã lỗi (n_sats, n_times), sao chép từ bộ đệm (chỉ các hàng cần)."""
+        steps = self._steps(times) if len(times) else np.empty(0, dtype=np.int64)
+        if steps is None:
+            if self.fallback is None:
+                raise KeyError("Thời điểm yêu cầu không nằm trên lưới thời gian của bộ đệm vị trí")
+            return self.fallback.propagate_batch(times, indices)
+        rows = slice(None) if indices is None else np.asarray(indices, dtype=np.intp)
+        if len(steps) and np.all(np.diff(steps) == 1):
+            # Cửa sổ liên tiếp: cắt (view) theo thời gian trước rồi mới lấy các hàng vệ tinh
+            window = slice(int(steps[0]), int(steps[-1]) + 1)
+            return np.array(self.positions[:, window][rows]), np.array(self.errors[:, window][rows])
+        return np.array(self.positions[:, steps][rows]), np.array(self.errors[:, steps][rows])
+
+    def propagate_states(self, times, indices=None):
+        """
+        Vị trí, vận tốc (km/s) và mã lỗi. Vận tốc lấy bằng sai phân hữu hạn bậc 4 trên lưới của bộ đệm
+        (VELOCITY_STENCIL_POINTS điểm, trung tâm hoặc lệch về phía trong ở hai đầu lưới), không lan truyền lại;
+        sai số ~ v (n * bước)^4 / 30, ví dụ ~1 cm/s với bước 60 s.
+        """
+        steps = self._steps(times) if len(times) else np.empty(0, dtype=np.int64)
+        n_grid = self.positions.shape[1]
+        if steps is None or n_grid < 2:
+            if self.fallback is None:
+                raise KeyError("Thời điểm yêu cầu không nằm trên lưới thời gian của bộ đệm vị trí")
+            return self.fallback.propagate_states(times, indices)
+        rows = slice(None) if indices is None else np.asarray(indices, dtype=np.intp)
+        positions = np.array(self.positions[:, steps][rows])
+        errors = np.array(self.errors[:, steps][rows])
+        velocities = np.empty(positions.shape, dtype=np.float64)
+        stencil_errors = np.zeros(errors.shape, dtype=errors.dtype)
+        n_points = min(VELOCITY_STENCIL_POINTS, n_grid)
+        for k, step in enumerate(steps):
+            # Cửa sổ n_points bước chứa step; trọng số đạo hàm bậc nhất: sum w_i o_i^p = [p == 1]
+            first = int(np.clip(step - n_points // 2, 0, n_grid - n_points))
+            offsets = np.arange(first, first + n_points) - step
+            weights = np.linalg.solve(np.vander(offsets, increasing=True).T.astype(np.float64),
+                                      np.eye(n_points)[1]) / self.time_step_s
+            window = slice(first, first + n_points)
+            velocities[:, k] = np.einsum('i,nic->nc', weights, self.positions[:, window][rows])
+            stencil_errors[:, k] = self.errors[:, window][rows].max(axis=1)
+        velocities[(errors != 0) | (stencil_errors != 0)] = np.nan
+        return positions, velocities, errors
+
+class PositionCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """Thư mục bộ đệm vị trí; max_bytes: dung lượng tối đa trước khi xóa các mục LRU."""
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, start_time, time_step_s, fallback=None):
+        """Mở một mục đã có (memory-map) và đánh dấu vừa dùng; None nếu chưa có hoặc hỏng."""
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, META_FILENAME)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            positions = np.load(os.path.join(entry, 'positions.npy'), mmap_mode='r')
+            errors = np.load(os.path.join(entry, 'errors.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        os.utime(meta_path)  # Cập nhật thời điểm dùng gần nhất (LRU)
+        return CachedPositions(positions, errors, start_time, time_step_s, meta, fallback)
+
+    def get_or_compute(self, key, fields, provider, times, n_satellites, chunk_steps, fallback=None):
+        """
+        Mục bộ đệm của khóa key; nếu chưa có thì tính vị trí toàn bộ n_satellites vệ tinh trên lưới times
+        bằng provider.propagate_batch theo từng cửa sổ chunk_steps bước (ghi thẳng vào .npy, bộ nhớ không
+        tăng theo độ dài kịch bản), lưu nguyên tử rồi xóa các mục LRU nếu vượt dung lượng.
+        """
+        start_time, time_step_s = times[0], fields['time_step_s']
+        cached = self.get(key, start_time, time_step_s, fallback)
+        if cached is not None:
+            print(f"Bộ đệm vị trí: dùng lại mục {key} ({cached.positions.shape[0]} vệ tinh x {len(times)} bước).")
+            return cached
+
+        t0 = time.perf_counter()
+        tmp_dir = f"{self._entry_dir(key)}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            positions = np.lib.format.open_memmap(os.path.join(tmp_dir, 'positions.npy'), mode='w+',
+                                                  dtype=np.float64, shape=(n_satellites, len(times), 3))
+            errors = np.lib.format.open_memmap(os.path.join(tmp_dir, 'errors.npy'), mode='w+',
+                                               dtype=np.uint8, shape=(n_satellites, len(times)))
+            indices = np.arange(n_satellites)
+            for start in range(0, len(times), chunk_steps):
+                window = slice(start, min(start + chunk_steps, len(times)))
+                positions[:, window], errors[:, window] = provider.propagate_batch(times[window], indices)
+            positions.flush()
+            errors.flush()
+            del positions, errors
+            meta = dict(fields, key=key, n_satellites=int(n_satellites),
+                        nbytes=int(n_satellites * len(times) * (3 * 8 + 1)),
+                        compute_time_s=time.perf_counter() - t0,
+                        error_bound_km=getattr(provider, 'error_bound_km', None),
+                        measured_max_error_km=getattr(provider, 'measured_max_error_km', None))
+            with open(os.path.join(tmp_dir, META_FILENAME), 'w') as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.replace(tmp_dir, self._entry_dir(key))
+            except OSError:
+                pass  # Tiến trình khác đã ghi xong cùng mục -> dùng mục đó
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        print(f"Bộ đệm vị trí: đã tính mục {key} ({n_satellites} vệ tinh x {len(times)} bước) "
+              f"trong {time.perf_counter() - t0:.2f} s.")
+        self.evict(keep=key)
+        return self.get(key, start_time, time_step_s, fallback)
+
+    def entries(self):
+        """Các mục hiện có: danh sách (key, thời điểm dùng gần nhất, số byte), cũ nhất trước."""
+        result = []
+        for name in os.listdir(self.cache_dir):
+            entry = self._entry_dir(name)
+            meta_path = os.path.join(entry, META_FILENAME)
+            if name.endswith('.tmp') or not os.path.isfile(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((name, os.path.getmtime(meta_path), size))
+        return sorted(result, key=lambda item: item[1])
+
+    def evict(self, keep=None):
+        """Xóa các mục ít được dùng gần đây nhất cho tới khi tổng dung lượng <= max_bytes (không xóa mục keep)."""
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        removed = []
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            removed.append(key)
+        if removed:
+            print(f"Bộ đệm vị trí: đã xóa {len(removed)} mục LRU (còn {total / 1024 ** 2:.1f} MB).")
+        return removed
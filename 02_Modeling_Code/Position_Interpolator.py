@@ -0,0 +1,221 @@
+# 02_Modeling_Code/Position_Interpolator.py
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+
+from Propagator import SatellitePropagator
+
+# --- THAM SỐ NỘI SUY MẶC ĐỊNH ---
+DEFAULT_MAX_ERROR_M = 1.0        # Sai số vị trí tối đa cho phép (mét) khi tự chọn bước neo
+MAX_ANCHOR_STEP_S = 300.0        # Giới hạn trên của bước neo (giây)
+VELOCITY_DELTA_S = 0.5           # Nửa bước sai phân trung tâm khi tính vận tốc tại mốc neo (giây)
+VALIDATION_FRACTION = 0.5 - np.sqrt(3.0) / 6.0  # Vị trí trong khoảng neo nơi sai số do sai lệch vận tốc lớn nhất
+MAX_CACHED_ANCHORS = 64          # Số mốc neo giữ lại giữa các lần gọi (cửa sổ thời gian liền kề dùng lại mốc neo biên)
+OMEGA_EARTH = 7.2921159e-5       # Tốc độ quay của Trái Đất (rad/s)
+MU_EARTH = 398600.8              # Hằng số hấp dẫn WGS72 (km^3/s^2)
+
+def hermite_anchor_step(max_error_km: float, mean_motion_rad_s: float, radius_km: float) -> float:
+    """
+    Bước neo lớn nhất (giây) để nội suy Hermite bậc 3 đạt sai số <= max_error_km.
+    Sai số Hermite bậc 3 trên một khoảng dài h: |e| <= h^4 / 384 * max|x''''|. Với quỹ đạo gần tròn
+    nhìn trong hệ ITRF (quay), |x''''| <= (n + omega_E)^4 * r, nên h = (384 e / ((n + omega_E)^4 r))^(1/4).
+    """
+    rate = mean_motion_rad_s + OMEGA_EARTH
+    return float((384.0 * max_error_km / (rate ** 4 * radius_km)) ** 0.25)
+
+def hermite_error_bound(anchor_step_s: float, mean_motion_rad_s: float, radius_km: float) -> float:
+    """Cận trên sai số (km) của nội suy Hermite bậc 3 với bước neo anchor_step_s (ngược của hermite_anchor_step)."""
+    rate = mean_motion_rad_s + OMEGA_EARTH
+    return float(anchor_step_s ** 4 / 384.0 * rate ** 4 * radius_km)
+
+def hermite_coefficients(p0, v0, p1, v1, h):
+    """
+    Hệ số đa thức Hermite bậc 3 theo thời gian chuẩn hóa s = (t - t0) / h trong [0, 1]:
+    x(s) = c0 + c1 s + c2 s^2 + c3 s^3. Trả về (c0, c1, c2, c3), cùng hình dạng với p0.
+    """
+    c1 = h * v0
+    c2 = 3.0 * (p1 - p0) - 2.0 * c1 - h * v1
+    c3 = 2.0 * (p0 - p1) + c1 + h * v1
+    return p0, c1, c2, c3
+
+class InterpolatingPropagator:
+    """
+    Bộ cung cấp vị trí nội suy cho bước thời gian mịn (<= vài giây): chỉ chạy SGP4 (vị trí + vận tốc)
+    tại các mốc neo cách nhau anchor_step_s, rồi nội suy Hermite bậc 3 cho mọi thời điểm ở giữa.
+    Vận tốc tại mốc neo lấy bằng sai phân trung tâm của vị trí SGP4 (±VELOCITY_DELTA_S): vận tốc giải tích
+    của SGP4 không khớp đạo hàm vị trí với vệ tinh chịu lực cản lớn (lệch tới ~0.4 m/s).
+    Có cùng giao diện propagate_batch với SatellitePropagator nên DynamicGraphGenerator dùng thay thế trực tiếp.
+    Lưới neo được căn theo origin (thường là START_TIME) nên kết quả không phụ thuộc cách chia cửa sổ thời gian;
+    trạng thái tại mốc neo được giữ lại giữa các lần gọi (theo chỉ số mốc neo), nên gọi theo từng cửa sổ ngắn
+    (CHUNK_STEPS) chỉ tốn SGP4 cho các mốc neo mới.
+    """
+
+    def __init__(self, propagator: SatellitePropagator, origin: datetime, anchor_step_s=None,
+                 max_error_m=DEFAULT_MAX_ERROR_M, indices=None, validate=True):
+        """
+        anchor_step_s: bước neo (giây); None = tự chọn từ max_error_m theo cận sai số lý thuyết.
+        indices: tập vệ tinh dùng để ước tính cận sai số (mặc định: tất cả).
+        validate: đo sai số thực tế so với SGP4 tại một điểm của mỗi khoảng neo mới (thêm 1 mốc SGP4, tối đa một lần
+        mỗi lần gọi và một lần mỗi khoảng neo).
+        """
+        self.propagator = propagator
+        self.origin = origin
+        self.validate = validate
+
+        # Vệ tinh "nhanh" nhất (mean motion lớn nhất) quyết định cận sai số
+        catalog = propagator.catalog if indices is None else propagator.catalog[np.asarray(indices)]
+        if len(catalog):
+            n = catalog['no_kozai'] / 60.0
+            radius = np.cbrt(MU_EARTH / n ** 2) * (1.0 + catalog['ecco'])
+            worst = int(np.argmax((n + OMEGA_EARTH) ** 4 * radius))
+            self._mean_motion, self._radius = float(n[worst]), float(radius[worst])
+        else:
+            self._mean_motion, self._radius = 0.0, 0.0
+
+        if anchor_step_s is None:
+            anchor_step_s = min(MAX_ANCHOR_STEP_S,
+                                hermite_anchor_step(max_error_m / 1000.0, self._mean_motion, self._radius))
+        self.anchor_step_s = float(anchor_step_s)
+        self.error_bound_km = hermite_error_bound(self.anchor_step_s, self._mean_motion, self._radius)
+        self.measured_max_error_km = 0.0
+        self.n_sgp4_times = 0
+
+        # Bộ đệm trạng thái mốc neo {chỉ số mốc neo: (vị trí, vận tốc, mã lỗi)} cho tập vệ tinh _cached_indices,
+        # và các khoảng neo đã kiểm tra sai số
+        self._anchor_cache = OrderedDict()
+        self._cached_indices = None
+        self._validated = set()
+
+    @property
+    def catalog(self):
+        return self.propagator.catalog
+
+    @property
+    def n_satellites(self):
+        return self.propagator.n_satellites
+
+    def _seconds(self, times) -> np.ndarray:
+        return np.array([(dt - self.origin).total_seconds() for dt in times], dtype=np.float64)
+
+    def propagate_batch(self, times, indices=None):
+        """
+        Vị trí nội suy (n_sats, n_times, 3) và mã lỗi (n_sats, n_times), giống SatellitePropagator.propagate_batch.
+        Thời điểm có mốc neo lân cận bị lỗi SGP4 được trả về NaN kèm mã lỗi của mốc neo đó.
+        """
+        positions, _, error_codes = self._evaluate(times, indices, with_velocity=False)
+        return positions, error_codes
+
+    def propagate_states(self, times, indices=None):
+        """Vị trí, vận tốc (đạo hàm của cùng đa thức Hermite, km/s) và mã lỗi, giống SatellitePropagator.propagate_states."""
+        return self._evaluate(times, indices, with_velocity=True)
+
+    def _evaluate(self, times, indices, with_velocity):
+        if indices is None:
+            indices = np.arange(self.n_satellites)
+        indices = np.asarray(indices, dtype=np.intp)
+        if len(indices) == 0 or len(times) == 0:
+            if with_velocity:
+                return self.propagator.propagate_states(times, indices)
+            positions, error_codes = self.propagator.propagate_batch(times, indices)
+            return positions, None, error_codes
+
+        # 1. Các mốc neo bao phủ toàn bộ khoảng thời gian yêu cầu
+        seconds = self._seconds(times)
+        h = self.anchor_step_s
+        first = int(np.floor(seconds.min() / h))
+        last = max(int(np.ceil(seconds.max() / h)), first + 1)
+        anchor_index = np.arange(first, last + 1)
+        anchor_pos, anchor_vel, anchor_err = self._cached_anchor_states(anchor_index, indices)
+
+        # 2. Nội suy Hermite bậc 3 trong khoảng neo chứa mỗi thời điểm
+        positions, error_codes = self._interpolate(seconds, anchor_index, anchor_pos, anchor_vel, anchor_err)
+        velocities = (self._interpolate_velocity(seconds, anchor_index, anchor_pos, anchor_vel, error_codes)
+                      if with_velocity else None)
+
+        unchecked = [m for m in anchor_index[:-1].tolist() if m not in self._validated]
+        if self.validate and unchecked:
+            # Đo sai số tại điểm VALIDATION_FRACTION của khoảng neo đầu tiên chưa kiểm tra (sai lệch vận tốc không bị
+            # triệt tiêu như ở điểm giữa)
+            self._validated.add(unchecked[0])
+            check_s = np.array([(unchecked[0] + VALIDATION_FRACTION) * h])
+            approx, _ = self._interpolate(check_s, anchor_index, anchor_pos, anchor_vel, anchor_err)
+            exact, _ = self.propagator.propagate_batch([self.origin + timedelta(seconds=float(check_s[0]))], indices)
+            self.n_sgp4_times += 1
+            error = np.linalg.norm(approx[:, 0] - exact[:, 0], axis=1)
+            if np.any(np.isfinite(error)):
+                self.measured_max_error_km = max(self.measured_max_error_km, float(np.nanmax(error)))
+        return positions, velocities, error_codes
+
+    def _interpolate(self, seconds, anchor_index, anchor_pos, anchor_vel, anchor_err):
+        """Đa thức Hermite bậc 3 (vị trí + vận tốc ở hai mốc neo kề nhau), vector hóa theo vệ tinh và thời điểm."""
+        h = self.anchor_step_s
+        k = np.clip(np.floor(seconds / h).astype(np.int64) - anchor_index[0], 0, len(anchor_index) - 2)
+        s = (seconds / h - anchor_index[k])[None, :, None]
+        h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+        h10 = s ** 3 - 2 * s ** 2 + s
+        h01 = -2 * s ** 3 + 3 * s ** 2
+        h11 = s ** 3 - s ** 2
+        positions = (h00 * anchor_pos[:, k] + h10 * h * anchor_vel[:, k]
+                     + h01 * anchor_pos[:, k + 1] + h11 * h * anchor_vel[:, k + 1])
+        error_codes = np.maximum(anchor_err[:, k], anchor_err[:, k + 1])
+        positions[error_codes != 0] = np.nan
+        return positions, error_codes
+
+    def _interpolate_velocity(self, seconds, anchor_index, anchor_pos, anchor_vel, error_codes):
+        """Đạo hàm theo thời gian của đa thức Hermite trong _interpolate (km/s)."""
+        h = self.anchor_step_s
+        k = np.clip(np.floor(seconds / h).astype(np.int64) - anchor_index[0], 0, len(anchor_index) - 2)
+        s = (seconds / h - anchor_index[k])[None, :, None]
+        d00 = 6 * s ** 2 - 6 * s
+        d10 = 3 * s ** 2 - 4 * s + 1
+        d01 = -6 * s ** 2 + 6 * s
+        d11 = 3 * s ** 2 - 2 * s
+        velocities = ((d00 * anchor_pos[:, k] + d01 * anchor_pos[:, k + 1]) / h
+                      + d10 * anchor_vel[:, k] + d11 * anchor_vel[:, k + 1])
+        velocities[error_codes != 0] = np.nan
+        return velocities
+
+    def _cached_anchor_states(self, anchor_index, indices):
+        """
+        Trạng thái tại các mốc neo anchor_index (xếp theo trục thời gian như anchor_states): chỉ chạy SGP4 cho các
+        mốc neo chưa có trong bộ đệm. Bộ đệm được làm mới khi tập vệ tinh thay đổi.
+        """
+        cache = self._anchor_cache
+        if self._cached_indices is None or not np.array_equal(indices, self._cached_indices):
+            cache.clear()
+            self._validated.clear()
+            self._cached_indices = indices.copy()
+        missing = [m for m in anchor_index.tolist() if m not in cache]
+        if missing:
+            anchor_times = [self.origin + timedelta(seconds=float(m * self.anchor_step_s)) for m in missing]
+            pos, vel, err = self.anchor_states(anchor_times, indices)
+            for c, m in enumerate(missing):
+                cache[m] = (pos[:, c], vel[:, c], err[:, c])
+        for m in anchor_index.tolist():
+            cache.move_to_end(m)
+        while len(cache) > max(MAX_CACHED_ANCHORS, len(anchor_index)):
+            cache.popitem(last=False)
+        states = [cache[m] for m in anchor_index.tolist()]
+        return tuple(np.stack([state[part] for state in states], axis=1) for part in range(3))
+
+    def anchor_states(self, anchor_times, indices):
+        """Vị trí SGP4 tại các mốc neo và vận tốc bằng sai phân trung tâm (một lời gọi SGP4 cho 3 lưới)."""
+        delta = timedelta(seconds=VELOCITY_DELTA_S)
+        n = len(anchor_times)
+        grid = list(anchor_times) + [t - delta for t in anchor_times] + [t + delta for t in anchor_times]
+        pos, err = self.propagator.propagate_batch(grid, indices)
+        self.n_sgp4_times += len(grid)
+        velocities = (pos[:, 2 * n:] - pos[:, n:2 * n]) / (2.0 * VELOCITY_DELTA_S)
+        error_codes = np.maximum(err[:, :n], np.maximum(err[:, n:2 * n], err[:, 2 * n:]))
+        return pos[:, :n], velocities, error_codes
+
+    def report(self) -> str:
+        """Mô tả ngắn cấu hình và sai số (ước tính lý thuyết, đo được) của bộ nội suy."""
+        text = (f"Nội suy Hermite: bước neo {self.anchor_step_s:.1f} s, "
+                f"cận sai số lý thuyết {self.error_bound_km * 1000.0:.3f} m")
+        if self.n_sgp4_times == 0:
+            return text + "."
+        if self.validate:
+            text += f", sai số đo được tối đa {self.measured_max_error_km * 1000.0:.3f} m"
+        return text + f", {self.n_sgp4_times} mốc SGP4."
@@ -2,49 +2,189 @@
 
 import os
 import glob
+import hashlib
 from skyfield.api import load, EarthSatellite, Topos
+from skyfield.framelib import itrs
+from skyfield.sgp4lib import theta_GMST1982
+from sgp4.api import Satrec, SatrecArray, WGS72
 from datetime import datetime, timedelta
 import numpy as np
 
+from Instrumentation import NULL_METRICS, STAGE_PARSE, STAGE_PROPAGATE
+
 # Định nghĩa hằng số vật lý
 C_LIGHT = 299792.458  # Tốc độ ánh sáng (km/s)
+R_EARTH = 6378.137    # Bán kính xích đạo Trái Đất (WGS84, km)
+DAY_S = 86400.0       # Số giây trong một ngày
+
+# --- BỘ ĐỆM TLE ĐÃ PHÂN TÍCH (ON-DISK CACHE) ---
+# Các phần tử quỹ đạo đã phân tích được lưu thành một mảng NumPy có cấu trúc (.npy), khóa theo
+# hash nội dung file TLE. Lần chạy sau chỉ cần đọc mảng này (vài ms) thay vì phân tích lại từng dòng
+# và tạo hàng nghìn đối tượng EarthSatellite.
+TLE_CACHE_DIRNAME = '.tle_cache'
+TLE_CACHE_VERSION = 1
+SGP4_EPOCH_JD = 2433281.5  # 1949-12-31 00:00 UT, mốc epoch của sgp4init
+
+ELEMENT_FIELDS = ['bstar', 'ndot', 'nddot', 'ecco', 'argpo', 'inclo', 'mo', 'no_kozai', 'nodeo']
+CATALOG_DTYPE = np.dtype(
+    [('satnum', np.int64), ('name', 'S24'), ('line1', 'S69'), ('line2', 'S69'), ('epoch', np.float64)]
+    + [(field, np.float64) for field in ELEMENT_FIELDS]
+)
+
+def _file_sha1(filepath):
+    """Hash SHA-1 của nội dung file (khóa của bộ đệm)."""
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def parse_tle_file(filepath, reference=None):
+    """
+    Phân tích file TLE 3 dòng thành mảng phần tử quỹ đạo CATALOG_DTYPE (bỏ qua TLE không hợp lệ).
+    reference: catalog đã phân tích trước đó (ví dụ phiên bản trước của kho catalog); TLE trùng nguyên văn
+    (dòng 1, dòng 2) được lấy lại từ đó, chỉ các vệ tinh mới/thay đổi mới phải phân tích lại.
+    """
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+    
+    known = {}
+    if reference is not None:
+        known = {(line1, line2): k for k, (line1, line2) in enumerate(zip(reference['line1'], reference['line2']))}
+    rows = []
+    # TLE phải có 3 dòng (Name, Line 1, Line 2)
+    for i in range(0, len(lines), 3):
+        if i + 2 < len(lines):
+            name = lines[i].strip()
+            line1 = lines[i+1].strip()
+            line2 = lines[i+2].strip()
+            
+            k = known.get((line1.encode(), line2.encode()))
+            if k is not None:
+                row = reference[k].item()
+                rows.append((row[0], name.encode()[:24]) + row[2:])
+                continue
+            try:
+                satrec = Satrec.twoline2rv(line1, line2)
+            except Exception:
+                # Bỏ qua nếu TLE không hợp lệ (ví dụ: các mảnh vỡ rất cũ)
+                continue
+            epoch = (satrec.jdsatepoch - SGP4_EPOCH_JD) + satrec.jdsatepochF
+            rows.append((satrec.satnum, name.encode()[:24], line1.encode(), line2.encode(), epoch)
+                        + tuple(getattr(satrec, field) for field in ELEMENT_FIELDS))
+    return np.array(rows, dtype=CATALOG_DTYPE)
+
+def _latest_cached_catalog(cache_dir):
+    """Catalog đã phân tích gần nhất trong bộ đệm (tham chiếu cho phân tích tăng dần), None nếu chưa có."""
+    paths = glob.glob(os.path.join(cache_dir, f"*_v{TLE_CACHE_VERSION}.npy"))
+    for path in sorted(paths, key=os.path.getmtime, reverse=True):
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            continue
+    return None
+
+def load_tle_catalog(filepath, cache_dir=None):
+    """
+    Đọc file TLE qua bộ đệm: nếu nội dung file đã được phân tích trước đó thì nạp trực tiếp mảng
+    phần tử quỹ đạo từ .npy, ngược lại phân tích và ghi bộ đệm (ghi nguyên tử, an toàn khi nhiều job chạy song song).
+    Khi file thay đổi (ví dụ kho catalog vừa cập nhật), các TLE không đổi được lấy lại từ catalog đệm gần nhất.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(filepath)), TLE_CACHE_DIRNAME)
+    cache_path = os.path.join(cache_dir, f"{_file_sha1(filepath)}_v{TLE_CACHE_VERSION}.npy")
+    if os.path.exists(cache_path):
+        try:
+            return np.load(cache_path)
+        except (OSError, ValueError):
+            pass  # File đệm hỏng -> phân tích lại
+    
+    catalog = parse_tle_file(filepath, _latest_cached_catalog(cache_dir))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, catalog)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Không ghi được bộ đệm TLE ({e}), tiếp tục không dùng bộ đệm.")
+    return catalog
 
 class SatellitePropagator:
-    def __init__(self, tle_data_path):
+    def __init__(self, tle_data_path, cache_dir=None, metrics=None, where=None, exclude_ids=None):
         """
-        Khởi tạo Propagator. Tải dữ liệu TLE và Astronomical Data (SPICE kernels).
+        Khởi tạo Propagator. Tải dữ liệu TLE (qua bộ đệm đã phân tích).
+        Astronomical Data (SPICE kernels) và các đối tượng Satrec/EarthSatellite chỉ được tạo khi cần.
+        metrics: bộ đo đạc (Instrumentation.Metrics); mặc định tắt.
+        where / exclude_ids: bộ lọc catalog (Orbital_Catalog), chỉ nạp các vệ tinh được chọn.
         """
+        self.metrics = metrics or NULL_METRICS
+        self._set_catalog(self.load_tle_data(tle_data_path, cache_dir, where, exclude_ids))
+
+    @classmethod
+    def from_catalog(cls, catalog, metrics=None):
+        """Propagator trên mảng phần tử quỹ đạo có sẵn (CATALOG_DTYPE), ví dụ ghép từ catalog của nhiều chòm sao."""
+        propagator = cls.__new__(cls)
+        propagator.metrics = metrics or NULL_METRICS
+        propagator._set_catalog(catalog)
+        return propagator
+
+    def _set_catalog(self, catalog):
         self.ts = load.timescale()
-        self.eph = load('de421.bsp') # Tải dữ liệu thiên văn cơ bản
-        self.satellites = self.load_tle_data(tle_data_path)
-        print(f"Propagator đã tải {len(self.satellites)} vệ tinh.")
+        self._eph = None
+        self.catalog = catalog
+        self.sat_ids = self.catalog['satnum']
+        self.n_satellites = len(self.catalog)
+        self._satrecs = [None] * self.n_satellites
+        self._satellites = None
+        self._satrec_array_cache = {}
+        print(f"Propagator đã tải {self.n_satellites} vệ tinh.")
+
+    @property
+    def eph(self):
+        """Dữ liệu thiên văn cơ bản (de421.bsp), chỉ tải ở lần truy cập đầu tiên."""
+        if self._eph is None:
+            self._eph = load('de421.bsp')
+        return self._eph
+
+    @property
+    def sat_names(self):
+        """Tên các vệ tinh (theo thứ tự catalog)."""
+        return [name.decode().strip() for name in self.catalog['name']]
+
+    @property
+    def satellites(self):
+        """Danh sách EarthSatellite của Skyfield (tạo lười, chỉ cho các API tương thích cũ)."""
+        if self._satellites is None:
+            self._satellites = [
+                EarthSatellite(row['line1'].decode(), row['line2'].decode(), row['name'].decode(), self.ts)
+                for row in self.catalog
+            ]
+        return self._satellites
 
-    def load_tle_data(self, filepath):
-        """Đọc file TLE và tạo ra các đối tượng EarthSatellite của Skyfield."""
+    def load_tle_data(self, filepath, cache_dir=None, where=None, exclude_ids=None):
+        """
+        Đọc file TLE thành mảng phần tử quỹ đạo (dùng bộ đệm theo hash nội dung file).
+        File OMM JSON, thư mục catalog dạng cột, hoặc khi có bộ lọc: đọc qua Orbital_Catalog (chỉ các hàng được chọn).
+        """
         try:
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
-            
-            satellites = []
-            
-            # Skyfield yêu cầu TLE phải có 3 dòng (Name, Line 1, Line 2)
-            for i in range(0, len(lines), 3):
-                if i + 2 < len(lines):
-                    name = lines[i].strip()
-                    line1 = lines[i+1].strip()
-                    line2 = lines[i+2].strip()
-                    
-                    try:
-                        sat = EarthSatellite(line1, line2, name, self.ts)
-                        satellites.append(sat)
-                    except Exception as e:
-                        # Bỏ qua nếu TLE không hợp lệ (ví dụ: các mảnh vỡ rất cũ)
-                        # print(f"Lỗi TLE cho {name}: {e}")
-                        continue
-            return satellites
+            with self.metrics.stage(STAGE_PARSE):
+                if where or exclude_ids is not None or os.path.isdir(filepath) or filepath.lower().endswith('.json'):
+                    # Import muộn: Orbital_Catalog dùng các hàm phân tích TLE của module này
+                    from Orbital_Catalog import open_catalog
+                    catalog = open_catalog(filepath)
+                    return catalog.records(catalog.select(where, exclude_ids=exclude_ids))
+                return load_tle_catalog(filepath, cache_dir)
         except Exception as e:
             print(f"Lỗi khi đọc file TLE: {e}")
-            return []
+            return np.empty(0, dtype=CATALOG_DTYPE)
+
+    def _satrec(self, k):
+        """Tạo (lười) đối tượng Satrec của sgp4 cho vệ tinh thứ k trực tiếp từ phần tử quỹ đạo."""
+        satrec = self._satrecs[k]
+        if satrec is None:
+            row = self.catalog[k]
+            satrec = Satrec()
+            satrec.sgp4init(WGS72, 'i', int(row['satnum']), float(row['epoch']),
+                            *(float(row[field]) for field in ELEMENT_FIELDS))
+            self._satrecs[k] = satrec
+        return satrec
 
     def get_position_at_time(self, dt: datetime, sat: EarthSatellite):
         """Tính toán vị trí (x, y, z) của vệ tinh tại thời điểm dt trong hệ tọa độ ECEF (ITRF)."""
@@ -55,30 +195,110 @@ class SatellitePropagator:
         # 2. Tính toán vị trí trong hệ tọa độ Trái Đất Cố định (ITRF - tương đương ECEF)
         # Hệ tọa độ này là bắt buộc để tính khoảng cách giữa các vệ tinh (vì các vệ tinh đều quay cùng Trái Đất)
         geocentric = sat.at(t)
-        pos = geocentric.frame_xyz(self.eph.itrs).km
+        pos = geocentric.frame_xyz(itrs).km
         
         # pos là một tuple (x, y, z) tính bằng km
         return pos
 
+    def _get_satrec_array(self, indices):
+        """Tạo (và lưu đệm) SatrecArray của sgp4 cho một tập vệ tinh (chỉ số trong catalog)."""
+        key = indices.tobytes()
+        sat_array = self._satrec_array_cache.get(key)
+        if sat_array is None:
+            sat_array = SatrecArray([self._satrec(k) for k in indices])
+            self._satrec_array_cache = {key: sat_array}
+        return sat_array
+
+    def propagate_batch(self, times, indices=None):
+        """
+        Lan truyền SGP4 vector hóa cho cả tập vệ tinh trên cả lưới thời gian.
+        times: danh sách datetime (UTC). indices: chỉ số vệ tinh trong catalog (mặc định: tất cả).
+        Trả về (positions, error_codes):
+          - positions: mảng (n_sats, n_times, 3) tọa độ ECEF/ITRF (km), NaN nếu lỗi.
+          - error_codes: mảng (n_sats, n_times) mã lỗi SGP4 (0 = thành công).
+        """
+        positions, _, error_codes = self._propagate_counted(times, indices, with_velocity=False)
+        return positions, error_codes
+
+    def propagate_states(self, times, indices=None):
+        """
+        Như propagate_batch nhưng trả thêm vận tốc: (positions, velocities, error_codes).
+        velocities: (n_sats, n_times, 3) vận tốc trong hệ ECEF/ITRF (km/s) - vận tốc giải tích của SGP4 quay sang
+        hệ quay cùng Trái Đất (thêm -omega x r), không tốn thêm lời gọi SGP4.
+        """
+        return self._propagate_counted(times, indices, with_velocity=True)
+
+    def _propagate_counted(self, times, indices, with_velocity):
+        with self.metrics.stage(STAGE_PROPAGATE):
+            positions, velocities, error_codes = self._propagate_batch(times, indices, with_velocity)
+        if self.metrics.enabled:
+            # Lỗi SGP4 (vệ tinh đã rơi, phần tử suy biến) bị loại khỏi snapshot -> đếm lại để không mất dấu
+            self.metrics.count('sgp4_evaluations', error_codes.size)
+            self.metrics.count('propagation_failures', np.count_nonzero(error_codes))
+        return positions, velocities, error_codes
+
+    def _propagate_batch(self, times, indices, with_velocity=False):
+        if indices is None:
+            indices = np.arange(self.n_satellites)
+        indices = np.asarray(indices, dtype=np.intp)
+        n_times = len(times)
+        if len(indices) == 0 or n_times == 0:
+            return (np.empty((len(indices), n_times, 3)),
+                    np.empty((len(indices), n_times, 3)) if with_velocity else None,
+                    np.zeros((len(indices), n_times), dtype=np.uint8))
+
+        # 1. Một đối tượng thời gian Skyfield duy nhất cho cả lưới thời gian
+        t = self.ts.utc(
+            [dt.year for dt in times], [dt.month for dt in times], [dt.day for dt in times],
+            [dt.hour for dt in times], [dt.minute for dt in times],
+            [dt.second + dt.microsecond / 1e6 for dt in times],
+        )
+        # SGP4 coi epoch của TLE là UTC (giống EarthSatellite của Skyfield)
+        jd = np.asarray(t.whole, dtype=np.float64)
+        fr = np.asarray(t.tai_fraction - t._leap_seconds() / DAY_S, dtype=np.float64)
+
+        # 2. Lan truyền toàn bộ (n_sats x n_times) trong một lời gọi C
+        error_codes, r_teme, v_teme = self._get_satrec_array(indices).sgp4(jd, fr)
+
+        # 3. Quay TEME -> ITRF (PEF) theo GMST 1982, vector hóa theo thời gian
+        theta, theta_dot = theta_GMST1982(jd, np.asarray(t.ut1_fraction, dtype=np.float64))
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        positions = np.empty_like(r_teme)
+        positions[..., 0] = cos_t * r_teme[..., 0] + sin_t * r_teme[..., 1]
+        positions[..., 1] = -sin_t * r_teme[..., 0] + cos_t * r_teme[..., 1]
+        positions[..., 2] = r_teme[..., 2]
+        velocities = None
+        if with_velocity:
+            # v_ITRF = R v_TEME - omega x r_ITRF (omega = tốc độ quay GMST, rad/ngày -> rad/s)
+            omega = theta_dot / DAY_S
+            velocities = np.empty_like(v_teme)
+            velocities[..., 0] = cos_t * v_teme[..., 0] + sin_t * v_teme[..., 1] + omega * positions[..., 1]
+            velocities[..., 1] = -sin_t * v_teme[..., 0] + cos_t * v_teme[..., 1] - omega * positions[..., 0]
+            velocities[..., 2] = v_teme[..., 2]
+            velocities[error_codes != 0] = np.nan
+
+        # Che (mask) các kết quả lỗi thay vì bỏ qua trong im lặng
+        positions[error_codes != 0] = np.nan
+        return positions, velocities, error_codes.astype(np.uint8)
+
     def get_all_positions(self, dt: datetime):
         """Tính toán vị trí (ECEF) cho TẤT CẢ vệ tinh tại thời điểm dt."""
         
         positions = {}
-        for sat in self.satellites:
-            try:
-                pos = self.get_position_at_time(dt, sat)
-                positions[sat.model.satnum] = {
-                    'name': sat.name.strip(),
-                    'pos_km': pos,
-                }
-            except Exception as e:
-                # print(f"Lỗi tính toán vị trí cho {sat.name}: {e}")
+        pos_batch, error_codes = self.propagate_batch([dt])
+        for k, (sat_id, name) in enumerate(zip(self.sat_ids, self.sat_names)):
+            if error_codes[k, 0] != 0:
+                # Lan truyền thất bại (ví dụ: vệ tinh đã rơi) -> bỏ qua
                 continue
+            positions[int(sat_id)] = {
+                'name': name,
+                'pos_km': pos_batch[k, 0],
+            }
         return positions
 
 # --- Ví dụ minh họa ---
 def main_propagator():
-    DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.getcwd()), '01_Data_Source')
+    DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_Data_Source')
     
     # Tìm file TLE mới nhất cho Starlink
     starlink_files = glob.glob(os.path.join(DATA_SOURCE_DIR, "STARLINK_TLE_*.txt"))
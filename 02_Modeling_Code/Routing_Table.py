@@ -0,0 +1,172 @@
+# 02_Modeling_Code/Routing_Table.py
+
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from Instrumentation import NULL_METRICS
+
+# --- BẢNG ĐỊNH TUYẾN THEO SNAPSHOT (ĐƯỜNG ĐI NGẮN NHẤT THEO ĐỘ TRỄ) ---
+# Với mỗi node nguồn s trong tập nguồn, lưu cây đường đi ngắn nhất tới mọi node v:
+#   dist[s, v]     độ trễ nhỏ nhất (giây), inf nếu không tới được
+#   next_hop[s, v] node kề của v trên đường ngắn nhất từ v về s (đồ thị vô hướng -> chính là cha của v trong
+#                  cây gốc s), NO_NEXT_HOP nếu v = s hoặc không tới được
+# Chế độ nguồn (khóa ROUTING_SOURCES của kịch bản):
+ROUTING_NONE = 'NONE'      # Không tính bảng định tuyến
+ROUTING_GROUND = 'GROUND'  # Nguồn là các trạm mặt đất (bảng S x N nhỏ)
+ROUTING_ALL = 'ALL'        # Mọi node (all-pairs, N x N mỗi snapshot: ~N^2 * 8 byte, chỉ dùng với N nhỏ)
+
+NO_NEXT_HOP = -1
+FULL_RECOMPUTE_FRACTION = 0.25  # Sửa cây chạm tới hơn tỉ lệ này số (nguồn, node) -> tính lại toàn bộ bằng Dijkstra
+RELAX_TOLERANCE_S = 1e-12       # Chỉ coi là cải thiện nếu giảm hơn ngưỡng này (tránh dao động do sai số làm tròn)
+SOURCE_BLOCK = 64               # Số nguồn xử lý cùng lúc khi sửa cây (giới hạn bộ nhớ tạm S x E)
+PROBE_INTERVAL = 16             # Cứ sau số bước này thử lại phương pháp đang chậm hơn (chi phí có thể thay đổi theo topo)
+COST_SMOOTHING = 0.3            # Hệ số làm mượt (EMA) của chi phí đo được mỗi nguồn
+
+def delay_graph(n_nodes: int, src: np.ndarray, dst: np.ndarray, delay: np.ndarray) -> csr_matrix:
+    """Ma trận kề thưa (CSR, đối xứng) của snapshot với trọng số là độ trễ; chỉ số cột đã sắp xếp theo hàng."""
+    rows = np.concatenate([src, dst]).astype(np.int64)
+    cols = np.concatenate([dst, src]).astype(np.int64)
+    graph = csr_matrix((np.concatenate([delay, delay]).astype(np.float64), (rows, cols)), shape=(n_nodes, n_nodes))
+    graph.sum_duplicates()
+    return graph
+
+class RoutingTables:
+    """
+    Tính bảng định tuyến (khoảng cách + next hop) cho tập nguồn trên từng snapshot.
+    Bước đầu tiên dùng Dijkstra của scipy.sparse.csgraph. Các bước sau tái sử dụng cây của bước trước:
+      1. Tính lại độ dài đường đi trên cây cũ với trọng số mới (nhảy con trỏ, vector hóa); node có cạnh cây
+         bị mất nhận inf. Các nhãn này là độ dài của đường đi có thật nên là cận trên của khoảng cách đúng.
+      2. Nới lỏng (relax) theo frontier: chỉ các cạnh vi phạm d[u] + w < d[v] và lan ra từ các node vừa được
+         cải thiện. Khi không còn cạnh vi phạm, nhãn bằng đúng khoảng cách ngắn nhất (theo RELAX_TOLERANCE_S).
+    Nếu phần bị ảnh hưởng quá lớn (nhiều cạnh đổi), khối nguồn đó được tính lại toàn bộ bằng Dijkstra.
+    Việc sửa cây chỉ có lợi khi ít cạnh thay đổi (ví dụ topo +Grid với bước thời gian nhỏ); với topo láng giềng
+    gần nhất hàng trăm cạnh đổi mỗi giây. Vì vậy mỗi bước chọn phương pháp có chi phí đo được (mỗi nguồn) thấp hơn,
+    và định kỳ thử lại phương pháp còn lại. Kết quả như nhau với cả hai phương pháp.
+    """
+
+    def __init__(self, n_nodes: int, sources, full_recompute_fraction=FULL_RECOMPUTE_FRACTION, metrics=None):
+        self.n_nodes = int(n_nodes)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.full_recompute_fraction = full_recompute_fraction
+        self.metrics = metrics or NULL_METRICS
+        self._dist = None  # (S, N) float64 của bước trước
+        self._pred = None  # (S, N) int64, NO_NEXT_HOP ở gốc / node không tới được
+        self.n_full = 0      # Số khối nguồn đã tính lại toàn bộ
+        self.n_repaired = 0  # Số khối nguồn đã sửa tăng dần
+        self._cost = {'full': None, 'repair': None}  # Chi phí trung bình (giây / nguồn) của mỗi phương pháp
+        self._n_updates = 0
+
+    def update(self, src: np.ndarray, dst: np.ndarray, delay: np.ndarray):
+        """
+        Bảng định tuyến của snapshot có các cạnh (src, dst, delay) (chỉ số node, vô hướng).
+        Trả về (dist float32 (S, N), next_hop int32 (S, N)).
+        """
+        graph = delay_graph(self.n_nodes, np.asarray(src), np.asarray(dst), np.asarray(delay))
+        n_sources = len(self.sources)
+        if self._dist is None:
+            self._dist = np.empty((n_sources, self.n_nodes))
+            self._pred = np.empty((n_sources, self.n_nodes), dtype=np.int64)
+            warm = False
+        else:
+            warm = True
+
+        method = self._choose_method() if warm else 'full'
+        self._n_updates += 1
+        t0 = time.perf_counter()
+        for start in range(0, n_sources, SOURCE_BLOCK):
+            block = slice(start, min(start + SOURCE_BLOCK, n_sources))
+            if not (method == 'repair' and self._repair(graph, block)):
+                self._full(graph, block)
+        self._record_cost(method, (time.perf_counter() - t0) / max(n_sources, 1))
+        return self._dist.astype(np.float32), self._pred.astype(np.int32)
+
+    def _choose_method(self):
+        """Phương pháp cho bước này: rẻ hơn theo chi phí đo được, thỉnh thoảng thử lại phương pháp kia."""
+        full, repair = self._cost['full'], self._cost['repair']
+        if repair is None:
+            return 'repair'
+        cheaper = 'repair' if repair <= full else 'full'
+        if self._n_updates % PROBE_INTERVAL == 0:
+            return 'full' if cheaper == 'repair' else 'repair'
+        return cheaper
+
+    def _record_cost(self, method, seconds_per_source):
+        previous = self._cost[method]
+        self._cost[method] = (seconds_per_source if previous is None
+                              else (1.0 - COST_SMOOTHING) * previous + COST_SMOOTHING * seconds_per_source)
+
+    def _full(self, graph, block):
+        """Dijkstra đầy đủ (C) cho một khối nguồn."""
+        dist, pred = dijkstra(graph, directed=True, indices=self.sources[block], return_predecessors=True)
+        pred[pred < 0] = NO_NEXT_HOP
+        self._dist[block], self._pred[block] = dist, pred
+        self.n_full += 1
+        self.metrics.count('routing_full_recomputes')
+
+    def _repair(self, graph, block) -> bool:
+        """Sửa cây của bước trước cho một khối nguồn; trả về False nếu nên tính lại toàn bộ."""
+        n = self.n_nodes
+        sources = self.sources[block]
+        n_block = len(sources)
+        size = n_block * n
+        pred = self._pred[block].reshape(-1)
+        base = np.repeat(np.arange(n_block, dtype=np.int64) * n, n)  # Vị trí đầu hàng của nguồn trong mảng phẳng
+        indptr, indices, weights = graph.indptr, graph.indices.astype(np.int64), graph.data
+        edge_src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        keys = edge_src * n + indices  # Tăng dần (CSR đã sắp xếp)
+
+        # 1. Độ dài đường đi trên cây cũ với trọng số mới (inf nếu cạnh cây đã mất).
+        #    Tra cạnh (v, cha của v) theo khóa v*N + cha: tăng dần theo v trong mỗi nguồn nên searchsorted nhanh.
+        has_pred = pred >= 0
+        node = np.arange(size, dtype=np.int64) - base
+        step = np.full(size + 1, np.inf)
+        step[size] = 0.0  # Phần tử giả: tổ tiên của gốc, độ dài 0
+        step[sources + base[::n]] = 0.0
+        if len(keys):
+            edge_key = node[has_pred] * n + pred[has_pred]
+            pos = np.minimum(np.searchsorted(keys, edge_key), len(keys) - 1)
+            step[:size][has_pred] = np.where(keys[pos] == edge_key, weights[pos], np.inf)
+        ancestor = np.full(size + 1, size, dtype=np.int64)
+        ancestor[:size][has_pred] = pred[has_pred] + base[has_pred]
+        # Nhảy con trỏ (list ranking): cộng dồn đoạn đường tới tổ tiên rồi nhảy lên gấp đôi
+        while np.any(ancestor[:size] != size):
+            step = step + step[ancestor]
+            ancestor = ancestor[ancestor]
+        dist = step[:size]
+        pred = np.where(np.isfinite(dist), pred, NO_NEXT_HOP)
+
+        # 2. Nới lỏng theo frontier, bắt đầu từ đầu mút của các cạnh vi phạm d[u] + w < d[v]
+        budget = self.full_recompute_fraction * size
+        dist_rows = dist.reshape(n_block, n)
+        rows, cols = np.nonzero(dist_rows[:, edge_src] + weights < dist_rows[:, indices] - RELAX_TOLERANCE_S)
+        active = np.unique(rows * n + edge_src[cols])
+        touched = 0
+        while len(active):
+            touched += len(active)
+            if touched > budget:
+                return False
+            u = active - base[active]
+            degree = indptr[u + 1] - indptr[u]
+            total = int(degree.sum())
+            owner = np.repeat(np.arange(len(active)), degree)
+            edge = indptr[u][owner] + np.arange(total) - np.repeat(np.cumsum(degree) - degree, degree)
+            target = base[active][owner] + indices[edge]
+            candidate = dist[active[owner]] + weights[edge]
+            better = candidate < dist[target] - RELAX_TOLERANCE_S
+            target, candidate, via = target[better], candidate[better], u[owner[better]]
+            if not len(target):
+                break
+            # Mỗi node đích chỉ nhận ứng viên tốt nhất
+            order = np.lexsort((candidate, target))
+            first = order[np.r_[True, target[order][1:] != target[order][:-1]]]
+            dist[target[first]] = candidate[first]
+            pred[target[first]] = via[first]
+            active = target[first]
+
+        self._dist[block] = dist.reshape(n_block, n)
+        self._pred[block] = pred.reshape(n_block, n)
+        self.n_repaired += 1
+        self.metrics.count('routing_repaired_nodes', touched)
+        return True
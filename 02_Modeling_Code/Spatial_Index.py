@@ -0,0 +1,165 @@
+# 02_Modeling_Code/Spatial_Index.py
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Instrumentation import NULL_METRICS, STAGE_CANDIDATE_SEARCH, STAGE_EDGE_SELECTION
+
+# Hệ số nới bán kính khi truy vấn cây k-d, để sai số làm tròn không làm mất cặp nằm đúng biên.
+# Khoảng cách chính xác luôn được tính lại bằng np.linalg.norm và lọc theo bán kính thật.
+RADIUS_SLACK = 1e-9
+
+def pair_distances(positions: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Khoảng cách Euclidean (km) cho các cặp chỉ số (i, j), vector hóa."""
+    delta = positions[i] - positions[j]
+    return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+def find_pairs_kdtree(positions: np.ndarray, max_distance_km: float):
+    """
+    Tìm mọi cặp node (i < j) có khoảng cách <= max_distance_km bằng cây k-d.
+    positions: mảng (N, 3) tọa độ ECEF (km).
+    Trả về (i, j, distance) dưới dạng các mảng NumPy song song.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    if len(positions) < 2:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty, np.empty(0)
+    tree = cKDTree(positions)
+    pairs = tree.query_pairs(max_distance_km * (1.0 + RADIUS_SLACK), output_type='ndarray')
+    i, j = pairs[:, 0].astype(np.intp), pairs[:, 1].astype(np.intp)
+    distance = pair_distances(positions, i, j)
+    keep = distance <= max_distance_km
+    return i[keep], j[keep], distance[keep]
+
+def forward_nearest_kdtree(positions: np.ndarray, max_distance_km: float, k: int, k_initial: int = 16,
+                           metrics=NULL_METRICS):
+    """
+    Với mỗi node i, tìm tối đa k node j > i gần nhất trong bán kính max_distance_km
+    (đúng quy tắc chọn ISL gốc của LinkModel), bằng truy vấn k-láng-giềng theo lô trên cây k-d.
+    Các hàng chưa đủ k láng giềng j > i được truy vấn lại với số láng giềng gấp đôi,
+    nên chi phí tỉ lệ với số láng giềng thực sự cần xét thay vì mọi cặp trong bán kính.
+    metrics: bộ đo đạc (Instrumentation) cho thời gian tìm ứng viên / chọn cạnh và số cặp đã xét.
+    Trả về (i, j, distance), sắp xếp theo (i, khoảng cách).
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    n = len(positions)
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2 or k <= 0:
+        return empty, empty, np.empty(0)
+    with metrics.stage(STAGE_CANDIDATE_SEARCH):
+        i, j = _forward_nearest_candidates(positions, max_distance_km, k, k_initial, metrics)
+    
+    with metrics.stage(STAGE_EDGE_SELECTION):
+        distance = pair_distances(positions, i, j)
+        keep = distance <= max_distance_km
+        i, j, distance = i[keep], j[keep], distance[keep]
+        order = np.lexsort((distance, i))
+    return i[order], j[order], distance[order]
+
+def _forward_nearest_candidates(positions, max_distance_km, k, k_initial, metrics):
+    """Vòng truy vấn k-láng-giềng tăng dần của forward_nearest_kdtree: trả về các cặp (i, j) ứng viên."""
+    n = len(positions)
+    tree = cKDTree(positions)
+    radius = max_distance_km * (1.0 + RADIUS_SLACK)
+    
+    rows = np.arange(n)
+    n_query = min(max(k_initial, k + 1), n)
+    i_parts, j_parts = [], []
+    while len(rows):
+        metrics.count('pairs_tested', len(rows) * n_query)
+        _, nbr = tree.query(positions[rows], k=n_query, distance_upper_bound=radius)
+        nbr = nbr.reshape(len(rows), n_query)
+        # Láng giềng không tồn tại được cây k-d đánh dấu bằng chỉ số n
+        forward = (nbr > rows[:, None]) & (nbr < n)
+        rank = np.cumsum(forward, axis=1)
+        keep = forward & (rank <= k)
+        
+        # Hàng đã đủ k láng giềng, hoặc đã hết láng giềng trong bán kính -> hoàn tất
+        exhausted = (nbr[:, -1] >= n) | (n_query >= n)
+        done = (rank[:, -1] >= k) | exhausted
+        r_idx, c_idx = np.nonzero(keep & done[:, None])
+        i_parts.append(rows[r_idx])
+        j_parts.append(nbr[r_idx, c_idx])
+        
+        rows = rows[~done]
+        n_query = min(2 * n_query, n)
+    
+    return np.concatenate(i_parts).astype(np.intp), np.concatenate(j_parts).astype(np.intp)
+
+def count_pairs_in_range(positions: np.ndarray, max_distance_km: float) -> int:
+    """Số cặp node (i < j) có khoảng cách <= max_distance_km (chỉ đếm, không liệt kê cặp)."""
+    positions = np.asarray(positions, dtype=np.float64)
+    if len(positions) < 2:
+        return 0
+    tree = cKDTree(positions)
+    counts = tree.query_ball_point(positions, max_distance_km, return_length=True)
+    return int((np.sum(counts) - len(positions)) // 2)
+
+def forward_candidates_kdtree(positions: np.ndarray, max_distance_km: float, k: int, skin_km: float,
+                              k_initial: int = 32):
+    """
+    Danh sách ứng viên có lớp đệm (skin) cho cập nhật topo tăng dần: với mỗi node i, trả về mọi
+    node j > i có khoảng cách <= min(D_i + skin_km, max_distance_km + skin_km / 2), trong đó D_i là
+    khoảng cách tới láng giềng thứ k (j > i) trong bán kính max_distance_km (vô cùng nếu thiếu).
+    Chỉ một lượt truy vấn k-láng-giềng tăng dần trên cây k-d.
+    Trả về (i, j, distance), sắp xếp theo i.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    n = len(positions)
+    empty = np.empty(0, dtype=np.intp)
+    if n < 2:
+        return empty, empty, np.empty(0)
+    tree = cKDTree(positions)
+    outer = max_distance_km + skin_km / 2.0
+    
+    rows = np.arange(n)
+    n_query = min(k_initial, n)
+    i_parts, j_parts = [], []
+    while len(rows):
+        dist, nbr = tree.query(positions[rows], k=n_query, distance_upper_bound=outer * (1.0 + RADIUS_SLACK))
+        dist, nbr = dist.reshape(len(rows), n_query), nbr.reshape(len(rows), n_query)
+        forward = (nbr > rows[:, None]) & (nbr < n)
+        
+        # D_i: khoảng cách tới láng giềng j > i thứ k (nếu đã thấy và nằm trong tầm)
+        rank = np.cumsum(forward, axis=1)
+        kth_col = np.argmax(forward & (rank == k), axis=1)
+        has_kth = rank[:, -1] >= k
+        kth_distance = np.where(has_kth, dist[np.arange(len(rows)), kth_col], np.inf)
+        kth_distance[kth_distance > max_distance_km] = np.inf
+        radius = np.minimum(kth_distance + skin_km, outer) * (1.0 + RADIUS_SLACK)
+        
+        # Hoàn tất khi láng giềng xa nhất đã vượt bán kính của hàng (hoặc đã xét hết)
+        done = (dist[:, -1] > radius) | (n_query >= n)
+        keep = forward & (dist <= radius[:, None]) & done[:, None]
+        r_idx, c_idx = np.nonzero(keep)
+        i_parts.append(rows[r_idx])
+        j_parts.append(nbr[r_idx, c_idx])
+        
+        rows = rows[~done]
+        n_query = min(2 * n_query, n)
+    
+    i = np.concatenate(i_parts).astype(np.intp)
+    j = np.concatenate(j_parts).astype(np.intp)
+    order = np.argsort(i, kind='stable')
+    i, j = i[order], j[order]
+    return i, j, pair_distances(positions, i, j)
+
+def select_forward_nearest(i: np.ndarray, j: np.ndarray, distance: np.ndarray, k: int):
+    """
+    Từ các cặp ứng viên (i < j), giữ lại tối đa k cặp có khoảng cách nhỏ nhất cho mỗi i.
+    Trả về (i, j, distance), sắp xếp theo (i, khoảng cách).
+    """
+    if len(i) == 0:
+        return i, j, distance
+    # Khóa sắp xếp gộp (i, khoảng cách): một lần argsort thay cho lexsort nhiều khóa
+    scale = float(np.max(distance)) + 1.0
+    order = np.argsort(i * scale + distance, kind='stable')
+    i, j, distance = i[order], j[order], distance[order]
+    
+    # Thứ hạng của mỗi cặp trong nhóm cùng i
+    group_start = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+    group_size = np.diff(np.r_[group_start, len(i)])
+    rank = np.arange(len(i)) - np.repeat(group_start, group_size)
+    
+    keep = rank < k
+    return i[keep], j[keep], distance[keep]
@@ -0,0 +1,189 @@
+# 02_Modeling_Code/Sweep_Runner.py
+
+import io
+import os
+import json
+import time
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import yaml
+
+from Graph_Generator import DynamicGraphGenerator, BASE_DIR, SCENARIOS_DIR, OUTPUT_DATASET_DIR
+
+# --- CHẠY NHIỀU KỊCH BẢN (SWEEP) VỚI BỘ ĐỆM VỊ TRÍ DÙNG CHUNG ---
+# Đầu vào: danh sách file kịch bản YAML và/hoặc một lưới tham số (mọi tổ hợp giá trị của các khóa cấu hình).
+# 1. Các biến thể có cùng file TLE và lưới thời gian dùng chung một mục Position_Cache: vị trí được tính đúng một
+#    lần (trong tiến trình chính) cho mỗi nhóm.
+# 2. Các biến thể (xây dựng liên kết, ghi dataset) chạy song song trên các tiến trình, mỗi tiến trình chỉ
+#    memory-map vị trí từ bộ đệm, không lan truyền lại.
+# File sweep (YAML, xem 03_Scenarios/Sweeps):
+#   SWEEP_NAME: tên sweep (tên file tổng kết)
+#   SCENARIOS:  danh sách file kịch bản (tương đối theo 03_Scenarios)
+#   GRID:       {KHÓA: [giá trị, ...]} - tích Descartes, áp dụng cho mọi kịch bản
+#   OVERRIDES:  {KHÓA: giá trị} - ghi đè chung cho mọi biến thể
+DEFAULT_POSITION_CACHE_DIR = os.path.join(OUTPUT_DATASET_DIR, '.position_cache')
+DEFAULT_SWEEP_NAME = 'Sweep'
+
+# Các khóa quyết định vị trí vệ tinh: biến thể trùng các khóa này dùng chung một mục bộ đệm
+POSITION_KEYS = ['TLE_FILE', 'CONSTELLATION', 'START_TIME', 'DURATION_MINUTES', 'TIME_STEP_SECONDS',
+                 'POSITION_PROVIDER', 'INTERPOLATION_MAX_ERROR_M', 'INTERPOLATION_ANCHOR_SECONDS',
+                 'CATALOG_FILTER', 'CATALOG_EXCLUDE_GROUPS']
+
+def expand_grid(grid):
+    """Mọi tổ hợp của lưới tham số {khóa: [giá trị]} -> danh sách dict ghi đè (thứ tự khóa theo tên)."""
+    if not grid:
+        return [{}]
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+def _variant_name(base_name, grid_overrides):
+    """Tên biến thể: tên kịch bản + các giá trị lưới (dùng làm SCENARIO_NAME, tức tên thư mục dataset)."""
+    if not grid_overrides:
+        return base_name
+    return base_name + '__' + '__'.join(f"{key}-{value}" for key, value in grid_overrides.items())
+
+def build_variants(scenario_paths, grid=None, overrides=None):
+    """Danh sách biến thể {'name', 'config_path', 'overrides'} cho mọi (kịch bản, tổ hợp lưới)."""
+    variants = []
+    for config_path in scenario_paths:
+        with open(config_path, 'r') as f:
+            base_name = yaml.safe_load(f)['SCENARIO_NAME']
+        for grid_overrides in expand_grid(grid):
+            name = _variant_name(base_name, grid_overrides)
+            variants.append({
+                'name': name,
+                'config_path': config_path,
+                'overrides': {**(overrides or {}), **grid_overrides, 'SCENARIO_NAME': name},
+            })
+    names = [variant['name'] for variant in variants]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Trùng tên biến thể (SCENARIO_NAME): {duplicates}")
+    return variants
+
+def _position_group(variant):
+    """Khóa nhóm bộ đệm (rẻ, chỉ từ cấu hình) của một biến thể."""
+    with open(variant['config_path'], 'r') as f:
+        config = yaml.safe_load(f)
+    config.update(variant['overrides'])
+    group = [config.get(key) for key in POSITION_KEYS]
+    if config.get('POSITION_PROVIDER') == 'HERMITE' and config.get('INTERPOLATION_ANCHOR_SECONDS') is None:
+        group.append(config['SUBSET_SIZE'])  # Bước neo tự chọn phụ thuộc tập vệ tinh
+    return json.dumps(group, default=str)
+
+def _run_variant(variant, quiet=True):
+    """Chạy một biến thể trong tiến trình worker (dataset, luồng delta hoặc contact plan theo TOPOLOGY_MODE)."""
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        generator = DynamicGraphGenerator(variant['config_path'], variant['overrides'])
+        topology_mode = generator.effective_topology_mode()
+        if topology_mode == 'INCREMENTAL':
+            n_steps = sum(1 for _ in generator.stream_deltas())
+            output = generator.deltas_path
+        elif topology_mode == 'CONTACT_PLAN':
+            generator.generate_contact_plan()
+            n_steps = None
+            output = os.path.join(generator.output_dir, f"{generator.scenario_name}_contact_plan.npz")
+        else:
+            output = generator.generate_dataset()
+            n_steps = generator.duration // generator.time_step + 1
+    return {'name': variant['name'], 'topology_mode': topology_mode, 'n_steps': n_steps, 'output': output,
+            'elapsed_s': time.perf_counter() - t0}
+
+def run_sweep(variants, workers=1, cache_dir=DEFAULT_POSITION_CACHE_DIR, cache_max_gb=None, quiet=True):
+    """
+    Chạy toàn bộ biến thể: tính bộ đệm vị trí một lần cho mỗi nhóm (file TLE, lưới thời gian) rồi phân phối
+    các biến thể cho workers tiến trình. Trả về danh sách kết quả (theo thứ tự biến thể); lỗi của một biến thể
+    được ghi vào 'error' thay vì dừng cả sweep.
+    """
+    cache_overrides = {'POSITION_CACHE_DIR': os.path.abspath(cache_dir), 'POSITION_CACHE_MAX_GB': cache_max_gb,
+                       'PARALLEL_WORKERS': 1}  # Song song theo biến thể, không lồng thêm process pool
+    variants = [dict(variant, overrides={**variant['overrides'], **cache_overrides}) for variant in variants]
+
+    # 1. Tính trước bộ đệm vị trí: một lần cho mỗi nhóm
+    groups = {}
+    for variant in variants:
+        groups.setdefault(_position_group(variant), variant)
+    print(f"Sweep: {len(variants)} biến thể, {len(groups)} nhóm vị trí (file TLE, lưới thời gian).")
+    t0 = time.perf_counter()
+    for variant in groups.values():
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            DynamicGraphGenerator(variant['config_path'], variant['overrides'])
+    print(f"Bộ đệm vị trí sẵn sàng sau {time.perf_counter() - t0:.2f} s.")
+
+    # 2. Chạy song song các biến thể trên bộ đệm
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(_run_variant, variant, quiet) for variant in variants]
+        for variant, future in zip(variants, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'name': variant['name'], 'error': f"{type(e).__name__}: {e}"}
+            results.append(result)
+            if 'error' in result:
+                print(f"  [LỖI] {result['name']}: {result['error']}")
+            else:
+                print(f"  [OK] {result['name']}: {result['elapsed_s']:.2f} s -> {result['output']}")
+    return results
+
+def load_sweep_file(path):
+    """Đọc file sweep YAML -> (tên sweep, danh sách đường dẫn kịch bản, lưới, ghi đè chung)."""
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f)
+    scenarios = [os.path.join(SCENARIOS_DIR, name) for name in spec.get('SCENARIOS', [])]
+    return spec.get('SWEEP_NAME', DEFAULT_SWEEP_NAME), scenarios, spec.get('GRID') or {}, spec.get('OVERRIDES') or {}
+
+def _parse_grid_arg(text):
+    """'KHÓA=v1,v2,...' -> (khóa, [giá trị]) (giá trị được đọc như YAML: số, chuỗi, True/False...)."""
+    key, _, values = text.partition('=')
+    if not key or not values:
+        raise argparse.ArgumentTypeError(f"Tham số lưới không hợp lệ (cần KHÓA=v1,v2): {text}")
+    return key, [yaml.safe_load(value) for value in values.split(',')]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chạy nhiều kịch bản / lưới tham số với bộ đệm vị trí dùng chung.")
+    parser.add_argument('scenarios', nargs='*', help="Các file kịch bản YAML")
+    parser.add_argument('--sweep', default=None, help="File sweep YAML (SCENARIOS, GRID, OVERRIDES)")
+    parser.add_argument('--grid', type=_parse_grid_arg, action='append', default=[],
+                        help="Lưới tham số KHÓA=v1,v2 (lặp lại cho nhiều khóa)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Số tiến trình chạy biến thể")
+    parser.add_argument('--cache-dir', default=DEFAULT_POSITION_CACHE_DIR, help="Thư mục bộ đệm vị trí")
+    parser.add_argument('--cache-max-gb', type=float, default=None, help="Dung lượng tối đa của bộ đệm vị trí (GB)")
+    parser.add_argument('--verbose', action='store_true', help="Không ẩn các dòng print của pipeline")
+    return parser.parse_args()
+
+def main_sweep():
+    args = parse_args()
+    sweep_name, scenarios, grid, overrides = DEFAULT_SWEEP_NAME, [], {}, {}
+    if args.sweep:
+        sweep_name, scenarios, grid, overrides = load_sweep_file(args.sweep)
+    scenarios += args.scenarios
+    grid.update(dict(args.grid))
+    if not scenarios:
+        print("Lỗi: cần ít nhất một file kịch bản (tham số hoặc SCENARIOS trong file sweep).")
+        return
+
+    variants = build_variants(scenarios, grid, overrides)
+    t0 = time.perf_counter()
+    results = run_sweep(variants, args.workers, os.path.abspath(args.cache_dir), args.cache_max_gb,
+                        quiet=not args.verbose)
+
+    output_dir = os.path.join(BASE_DIR, overrides.get('OUTPUT_DIR') or OUTPUT_DATASET_DIR)
+    summary_path = os.path.join(output_dir, f"{sweep_name}_sweep.json")
+    os.makedirs(output_dir, exist_ok=True)
+    with open(summary_path, 'w') as f:
+        json.dump({'sweep_name': sweep_name, 'created_at': datetime.now().isoformat(),
+                   'wall_time_s': time.perf_counter() - t0, 'grid': grid, 'overrides': overrides,
+                   'variants': [dict(variant, result=result) for variant, result in zip(variants, results)]},
+                  f, indent=2, default=str)
+    n_failed = sum('error' in result for result in results)
+    print(f"\n--- HOÀN TẤT SWEEP ---")
+    print(f"{len(results) - n_failed}/{len(results)} biến thể thành công trong {time.perf_counter() - t0:.2f} s.")
+    print(f"Tổng kết lưu tại: {summary_path}")
+
+if __name__ == "__main__":
+    main_sweep()
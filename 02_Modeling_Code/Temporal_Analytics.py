@@ -0,0 +1,370 @@
+# 02_Modeling_Code/Temporal_Analytics.py
+
+import os
+import csv
+import time
+import argparse
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+
+from Graph_Dataset import GraphDatasetReader
+from Graph_Snapshot import EDGE_TYPES, EDGE_ISL, EDGE_GSL
+from Routing_Table import delay_graph
+
+# --- PHÂN TÍCH MẠNG THEO THỜI GIAN TRÊN DATASET ĐÃ TẠO (STREAMING, BỘ NHỚ GIỚI HẠN) ---
+# Duyệt dataset (Graph_Dataset) theo cửa sổ window_steps bước; mỗi cửa sổ chỉ đọc các cột cạnh (memory-map) của
+# các bước đó và tính vector hóa cho cả cửa sổ. Trạng thái mang sang cửa sổ sau chỉ gồm các liên kết đang tồn tại
+# (mã cạnh + bước bắt đầu), nên bộ nhớ không phụ thuộc số bước T. Kết quả là các bảng nhỏ:
+#   steps               mỗi bước một dòng: số cạnh, node hoạt động, bậc, thành phần liên thông, phân vị độ trễ, churn
+#   degree_histogram    (T, MAX_DEGREE_BIN + 1) số node theo bậc (cột cuối: bậc >= MAX_DEGREE_BIN)
+#   link_lifetimes      số liên kết theo thời gian sống liên tục (bước), ISL/GSL, kể cả bị cắt ở cuối dataset
+#   nodes               mỗi node: tỉ lệ thời gian hoạt động, bậc trung bình, betweenness (lấy mẫu) trung bình/lớn nhất
+# Mã cạnh vô hướng: min(u, v) * N + max(u, v) (chỉ số node theo node_ids của dataset).
+DEFAULT_WINDOW_STEPS = 32         # Số bước mỗi cửa sổ đọc (bộ nhớ đỉnh ~ window_steps x N)
+MAX_DEGREE_BIN = 32               # Cột cuối của histogram bậc gộp mọi bậc >= giá trị này
+DELAY_QUANTILES = (0.5, 0.9, 0.99)  # Phân vị độ trễ cạnh mỗi bước (thêm min/max)
+DEFAULT_BETWEENNESS_EVERY = 10    # Lấy mẫu betweenness mỗi số bước này (0 = tắt)
+DEFAULT_BETWEENNESS_SOURCES = 32  # Số node nguồn ngẫu nhiên mỗi lần lấy mẫu (ước lượng Brandes)
+
+STEP_COLUMNS = (['time_step', 'timestamp_us', 'n_edges', 'n_isl', 'n_gsl', 'n_active_nodes', 'mean_degree',
+                 'max_degree', 'n_components', 'giant_component_fraction', 'delay_min_s']
+                + [f"delay_p{int(round(q * 100))}_s" for q in DELAY_QUANTILES]
+                + ['delay_max_s', 'edges_added', 'edges_removed', 'churn_rate', 'betweenness_max'])
+
+def window_quantiles(values, offsets, quantiles):
+    """
+    Phân vị (nội suy tuyến tính như np.quantile) của values theo từng bước: (n_steps, len(quantiles)).
+    offsets: np.r_[0, ...] ranh giới các bước. Mỗi đoạn được sắp xếp riêng (nhanh hơn nhiều so với lexsort
+    cả cửa sổ), sau đó các phân vị được lấy vector hóa cho mọi bước.
+    """
+    sorted_values = np.empty(len(values), dtype=np.float64)
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        sorted_values[start:end] = np.sort(values[start:end])
+    counts = np.diff(offsets)
+    last = np.maximum(counts - 1, 0)[:, None]
+    position = np.asarray(quantiles)[None, :] * last
+    lo = np.floor(position).astype(np.int64)
+    hi = np.minimum(lo + 1, last)
+    result = np.full((len(counts), len(quantiles)), np.nan)
+    has = counts > 0
+    if len(sorted_values):
+        a = sorted_values[(offsets[:-1, None] + lo)[has]]
+        b = sorted_values[(offsets[:-1, None] + hi)[has]]
+        result[has] = a + (position[has] - lo[has]) * (b - a)
+    return result
+
+def sampled_betweenness(n_nodes, src, dst, delay, sources):
+    """
+    Tổng phụ thuộc Brandes (betweenness chưa chuẩn hóa) từ các node nguồn, trên đồ thị có trọng số độ trễ.
+    Độ trễ là số thực nên đường đi ngắn nhất coi như duy nhất: phụ thuộc được cộng dồn trên cây đường đi ngắn
+    nhất, từ tầng sâu nhất về gốc, vector hóa cho mọi nguồn cùng lúc. Trả về mảng (n_nodes,).
+    """
+    graph = delay_graph(n_nodes, src, dst, delay)
+    _, pred = dijkstra(graph, directed=True, indices=sources, return_predecessors=True)
+    n_sources = len(sources)
+    size = n_sources * n_nodes
+    base = np.repeat(np.arange(n_sources, dtype=np.int64) * n_nodes, n_nodes)
+    pred = pred.reshape(-1).astype(np.int64)
+    in_tree = pred >= 0
+    parent = np.full(size, -1, dtype=np.int64)
+    parent[in_tree] = pred[in_tree] + base[in_tree]
+
+    # Độ sâu trong cây (nhảy con trỏ, phần tử giả ở vị trí size có độ sâu 0)
+    depth = np.zeros(size + 1, dtype=np.int64)
+    depth[:size][in_tree] = 1
+    ancestor = np.full(size + 1, size, dtype=np.int64)
+    ancestor[:size][in_tree] = parent[in_tree]
+    while np.any(ancestor[:size] != size):
+        depth = depth + depth[ancestor]
+        ancestor = ancestor[ancestor]
+    depth = depth[:size]
+
+    delta = np.zeros(size)
+    members = np.flatnonzero(in_tree)
+    members = members[np.argsort(-depth[members], kind='stable')]
+    boundaries = np.flatnonzero(np.diff(depth[members])) + 1
+    for level in np.split(members, boundaries):
+        delta += np.bincount(parent[level], weights=1.0 + delta[level], minlength=size)
+    delta[np.asarray(sources, dtype=np.int64) + np.arange(n_sources) * n_nodes] = 0.0  # Bỏ phần của chính nguồn
+    return delta.reshape(n_sources, n_nodes).sum(axis=0)
+
+class TemporalAnalytics:
+    """
+    Bộ phân tích streaming trên một dataset (xem chú thích đầu module).
+    Gọi run() một lần; kết quả ở thuộc tính report (AnalyticsReport).
+    """
+
+    def __init__(self, dataset_dir, window_steps=DEFAULT_WINDOW_STEPS, betweenness_every=DEFAULT_BETWEENNESS_EVERY,
+                 betweenness_sources=DEFAULT_BETWEENNESS_SOURCES, seed=0):
+        self.reader = GraphDatasetReader(dataset_dir)
+        self.window_steps = int(window_steps)
+        self.betweenness_every = int(betweenness_every)
+        self.betweenness_sources = int(betweenness_sources)
+        self.rng = np.random.default_rng(seed)
+        n_nodes, n_steps = self.reader.n_nodes, self.reader.n_steps
+
+        self.steps = {name: np.zeros(n_steps, dtype=np.float64) for name in STEP_COLUMNS}
+        self.steps['betweenness_max'][:] = np.nan
+        self.degree_histogram = np.zeros((n_steps, MAX_DEGREE_BIN + 1), dtype=np.int64)
+        self.lifetime_counts = np.zeros((len(EDGE_TYPES), n_steps + 1), dtype=np.int64)
+        self.censored_counts = np.zeros((len(EDGE_TYPES), n_steps + 1), dtype=np.int64)
+        self.node_active_steps = np.zeros(n_nodes, dtype=np.int64)
+        self.node_degree_sum = np.zeros(n_nodes, dtype=np.int64)
+        self.node_betweenness_sum = np.zeros(n_nodes)
+        self.node_betweenness_max = np.zeros(n_nodes)
+        self.n_betweenness_samples = 0
+
+        # Trạng thái mang sang cửa sổ sau: các liên kết tồn tại ở bước cuối (mã đã sắp xếp, bước bắt đầu, loại)
+        self._open_codes = np.empty(0, dtype=np.int64)
+        self._open_start = np.empty(0, dtype=np.int64)
+        self._open_type = np.empty(0, dtype=np.uint8)
+
+    def run(self):
+        """Duyệt toàn bộ dataset theo cửa sổ và trả về AnalyticsReport."""
+        t_start = time.perf_counter()
+        for t0 in range(0, self.reader.n_steps, self.window_steps):
+            self._process_window(t0, min(t0 + self.window_steps, self.reader.n_steps))
+        # Liên kết còn tồn tại ở bước cuối: thời gian sống bị cắt (right-censored)
+        lifetimes = self.reader.n_steps - self._open_start
+        np.add.at(self.censored_counts, (self._open_type, lifetimes), 1)
+        self.report = AnalyticsReport(self, time.perf_counter() - t_start)
+        return self.report
+
+    def _process_window(self, t0, t1):
+        n_nodes, n_window = self.reader.n_nodes, t1 - t0
+        data = self.reader.time_slice(t0, t1)
+        offsets = data['edge_offsets']
+        counts = np.diff(offsets)
+        step = np.repeat(np.arange(n_window, dtype=np.int64), counts)
+        src = np.asarray(data['src'], dtype=np.int64)
+        dst = np.asarray(data['dst'], dtype=np.int64)
+        delay = np.asarray(data['weight_delay'], dtype=np.float64)
+        edge_type = np.asarray(data['type'], dtype=np.uint8)
+        columns = self.steps
+        rows = slice(t0, t1)
+        columns['time_step'][rows] = np.arange(t0, t1)
+        columns['timestamp_us'][rows] = data['timestamps']
+        columns['n_edges'][rows] = counts
+        columns['n_isl'][rows] = np.bincount(step[edge_type == EDGE_ISL], minlength=n_window)
+        columns['n_gsl'][rows] = np.bincount(step[edge_type == EDGE_GSL], minlength=n_window)
+
+        # 1. Bậc: ma trận (bước, node) qua bincount trên khóa phẳng
+        degree = np.bincount(np.concatenate([step * n_nodes + src, step * n_nodes + dst]),
+                             minlength=n_window * n_nodes).reshape(n_window, n_nodes)
+        active = degree > 0
+        n_active = active.sum(axis=1)
+        columns['n_active_nodes'][rows] = n_active
+        columns['mean_degree'][rows] = np.where(n_active > 0, 2.0 * counts / np.maximum(n_active, 1), 0.0)
+        columns['max_degree'][rows] = degree.max(axis=1) if n_nodes else 0
+        clipped = np.minimum(degree, MAX_DEGREE_BIN)
+        flat = (np.arange(n_window)[:, None] * (MAX_DEGREE_BIN + 1) + clipped)[active]
+        self.degree_histogram[rows] = np.bincount(flat, minlength=n_window * (MAX_DEGREE_BIN + 1)).reshape(
+            n_window, MAX_DEGREE_BIN + 1)
+        self.node_active_steps += active.sum(axis=0)
+        self.node_degree_sum += degree.sum(axis=0)
+        del degree, clipped
+
+        # 2. Thành phần liên thông: một đồ thị rời rạc gồm mọi bước của cửa sổ (node = bước * N + chỉ số node)
+        total = n_window * n_nodes
+        graph = coo_matrix((np.ones(len(src), dtype=np.int8), (step * n_nodes + src, step * n_nodes + dst)),
+                           shape=(total, total)).tocsr()
+        _, labels = connected_components(graph, directed=False)
+        active_flat = np.flatnonzero(active.reshape(-1))
+        component_size = np.bincount(labels[active_flat])
+        component_labels = np.flatnonzero(component_size)
+        component_step = np.zeros(len(component_size), dtype=np.int64)
+        component_step[labels[active_flat]] = active_flat // max(n_nodes, 1)
+        columns['n_components'][rows] = np.bincount(component_step[component_labels], minlength=n_window)
+        giant = np.zeros(n_window, dtype=np.int64)
+        np.maximum.at(giant, component_step[component_labels], component_size[component_labels])
+        columns['giant_component_fraction'][rows] = np.where(n_active > 0, giant / np.maximum(n_active, 1), 0.0)
+        del graph, labels
+
+        # 3. Phân vị độ trễ theo bước
+        q = window_quantiles(delay, offsets, (0.0,) + tuple(DELAY_QUANTILES) + (1.0,))
+        for k, name in enumerate(['delay_min_s'] + [f"delay_p{int(round(x * 100))}_s" for x in DELAY_QUANTILES]
+                                 + ['delay_max_s']):
+            columns[name][rows] = q[:, k]
+
+        # 4. Churn và thời gian sống liên kết (so khớp mã cạnh giữa các bước liên tiếp)
+        self._churn_and_lifetimes(t0, n_window, step, src, dst, edge_type, counts)
+
+        # 5. Betweenness lấy mẫu
+        if self.betweenness_every > 0:
+            for local in range(n_window):
+                if (t0 + local) % self.betweenness_every == 0 and counts[local] > 0:
+                    sl = slice(offsets[local], offsets[local + 1])
+                    self._sample_betweenness(t0 + local, src[sl], dst[sl], delay[sl], active[local])
+
+    def _churn_and_lifetimes(self, t0, n_window, step, src, dst, edge_type, counts):
+        n_nodes = self.reader.n_nodes
+        span = n_nodes * n_nodes  # Khoảng mã cạnh của một bước
+        code = np.minimum(src, dst) * n_nodes + np.maximum(src, dst)
+        key = step * span + code
+        order = np.argsort(key, kind='stable')
+        key, code, step, edge_type = key[order], code[order], step[order], edge_type[order]
+
+        # Có mặt ở bước trước / bước sau (bước trước của bước đầu cửa sổ: các liên kết mở mang sang)
+        prev_key = key - span
+        in_prev = np.zeros(len(key), dtype=bool)
+        inner = step > 0
+        pos = np.minimum(np.searchsorted(key, prev_key[inner]), max(len(key) - 1, 0))
+        in_prev[inner] = key[pos] == prev_key[inner] if len(key) else False
+        first = ~inner
+        carry_pos = np.minimum(np.searchsorted(self._open_codes, code[first]), max(len(self._open_codes) - 1, 0))
+        if len(self._open_codes):
+            in_prev[first] = self._open_codes[carry_pos] == code[first]
+        next_key = key + span
+        pos = np.minimum(np.searchsorted(key, next_key), max(len(key) - 1, 0))
+        in_next = (key[pos] == next_key) if len(key) else np.zeros(0, dtype=bool)
+
+        # Churn: thêm = có ở t nhưng không ở t-1; bớt tại t = có ở t-1 nhưng không ở t
+        added = np.bincount(step[~in_prev], minlength=n_window)
+        last = step == n_window - 1
+        removed_after = np.bincount(step[~in_next & ~last] + 1, minlength=n_window)
+        # Liên kết mở (bước cuối cửa sổ trước) không còn ở bước đầu cửa sổ này
+        still_open = np.isin(self._open_codes, code[first], assume_unique=True)
+        removed_after[0] += np.count_nonzero(~still_open)
+        previous_edges = np.r_[len(self._open_codes) if t0 > 0 else 0, counts[:-1]]
+        union = previous_edges + added
+        columns = self.steps
+        columns['edges_added'][t0:t0 + n_window] = added
+        columns['edges_removed'][t0:t0 + n_window] = removed_after
+        columns['churn_rate'][t0:t0 + n_window] = np.where(union > 0, (added + removed_after) / np.maximum(union, 1), 0.0)
+
+        # Liên kết kết thúc ngay trước cửa sổ (mở ở bước cuối cửa sổ trước nhưng không còn ở bước đầu)
+        closed = ~still_open
+        np.add.at(self.lifetime_counts, (self._open_type[closed], t0 - self._open_start[closed]), 1)
+
+        # Mỗi đoạn tồn tại liên tục có một đầu (không có ở t-1) và một đuôi (không có ở t+1, hoặc ở bước cuối cửa sổ).
+        # Sắp xếp đầu và đuôi theo (mã, bước) thì chúng ghép cặp đúng thứ tự.
+        head = ~in_prev | (first & in_prev)
+        head_start = step[head] + t0
+        continuing = first & in_prev
+        if np.any(continuing):
+            carry_index = np.searchsorted(self._open_codes, code[continuing])
+            head_start[continuing[head]] = self._open_start[carry_index]
+        head_code = code[head]
+        head_order = np.lexsort((head_start, head_code))
+        tail = ~in_next | last
+        tail_order = np.lexsort((step[tail], code[tail]))
+        tail_step = step[tail][tail_order] + t0
+        tail_code = code[tail][tail_order]
+        tail_type = edge_type[tail][tail_order]
+        tail_open = last[tail][tail_order]
+        start = head_start[head_order]
+        lifetimes = tail_step - start + 1
+        np.add.at(self.lifetime_counts, (tail_type[~tail_open], lifetimes[~tail_open]), 1)
+
+        # Liên kết còn mở ở bước cuối cửa sổ -> mang sang cửa sổ sau (đã sắp xếp theo mã)
+        self._open_codes = tail_code[tail_open]
+        self._open_start = start[tail_open]
+        self._open_type = tail_type[tail_open]
+
+    def _sample_betweenness(self, t, src, dst, delay, active):
+        active_nodes = np.flatnonzero(active)
+        n_active = len(active_nodes)
+        if n_active <= 2:
+            return
+        k = min(self.betweenness_sources, n_active)
+        sources = np.sort(self.rng.choice(active_nodes, size=k, replace=False))
+        raw = sampled_betweenness(self.reader.n_nodes, src, dst, delay, sources)
+        # Chuẩn hóa như networkx.betweenness_centrality(normalized=True, k=k) trên đồ thị các node hoạt động
+        betweenness = raw * (n_active / k) / ((n_active - 1) * (n_active - 2))
+        self.node_betweenness_sum += betweenness
+        np.maximum(self.node_betweenness_max, betweenness, out=self.node_betweenness_max)
+        self.n_betweenness_samples += 1
+        self.steps['betweenness_max'][t] = betweenness.max()
+
+class AnalyticsReport:
+    """Các bảng kết quả của TemporalAnalytics, lưu ra CSV và .npz."""
+
+    def __init__(self, analytics: TemporalAnalytics, elapsed_s: float):
+        reader = analytics.reader
+        self.elapsed_s = elapsed_s
+        self.time_step_s = reader.meta.get('time_step_seconds')
+        self.steps = analytics.steps
+        self.degree_histogram = analytics.degree_histogram
+        n_samples = max(analytics.n_betweenness_samples, 1)
+        self.nodes = {
+            'node_id': np.asarray(reader.node_ids, dtype=np.int64),
+            'active_fraction': analytics.node_active_steps / max(reader.n_steps, 1),
+            'mean_degree': analytics.node_degree_sum / max(reader.n_steps, 1),
+            'mean_betweenness': analytics.node_betweenness_sum / n_samples,
+            'max_betweenness': analytics.node_betweenness_max,
+        }
+        # Bảng thời gian sống: chỉ các độ dài có ít nhất một liên kết
+        counts = np.concatenate([analytics.lifetime_counts, analytics.censored_counts])
+        lengths = np.flatnonzero(counts.sum(axis=0))
+        self.link_lifetimes = {'lifetime_steps': lengths}
+        if self.time_step_s is not None:
+            self.link_lifetimes['lifetime_s'] = lengths * self.time_step_s
+        for k, name in enumerate(EDGE_TYPES):
+            self.link_lifetimes[f"count_{name.lower()}"] = analytics.lifetime_counts[k, lengths]
+            self.link_lifetimes[f"censored_{name.lower()}"] = analytics.censored_counts[k, lengths]
+
+    def summary(self) -> str:
+        """Tóm tắt vài dòng (trung bình theo thời gian)."""
+        steps = self.steps
+        lifetimes = self.link_lifetimes
+        total = sum(lifetimes[f"count_{name.lower()}"].sum() for name in EDGE_TYPES)
+        mean_life = (sum((lifetimes['lifetime_steps'] * lifetimes[f"count_{name.lower()}"]).sum() for name in EDGE_TYPES)
+                     / total) if total else float('nan')
+        return (f"{len(steps['time_step'])} bước trong {self.elapsed_s:.2f} s: "
+                f"trung bình {steps['n_edges'].mean():.0f} cạnh, bậc {steps['mean_degree'].mean():.2f}, "
+                f"{steps['n_components'].mean():.2f} thành phần liên thông, "
+                f"độ trễ trung vị {np.nanmean(steps['delay_p50_s']) * 1000:.3f} ms, "
+                f"churn {steps['churn_rate'][1:].mean() if len(steps['churn_rate']) > 1 else 0.0:.4f}/bước, "
+                f"thời gian sống liên kết trung bình {mean_life:.1f} bước ({total} liên kết đã kết thúc).")
+
+    @staticmethod
+    def _write_csv(filepath, table):
+        names = list(table)
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(np.asarray(table[name]).tolist() for name in names)))
+
+    def save(self, output_dir):
+        """Ghi steps.csv, degree_histogram.csv, link_lifetimes.csv, nodes.csv và analytics.npz vào output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        degree_table = {'time_step': self.steps['time_step'].astype(np.int64)}
+        for d in range(MAX_DEGREE_BIN + 1):
+            degree_table[f"deg_{d}" if d < MAX_DEGREE_BIN else f"deg_{d}_plus"] = self.degree_histogram[:, d]
+        steps = {name: (values.astype(np.int64) if name in ('time_step', 'timestamp_us', 'n_edges', 'n_isl', 'n_gsl',
+                                                               'n_active_nodes', 'max_degree', 'n_components',
+                                                               'edges_added', 'edges_removed') else values)
+                 for name, values in self.steps.items()}
+        tables = {'steps': steps, 'degree_histogram': degree_table, 'link_lifetimes': self.link_lifetimes,
+                  'nodes': self.nodes}
+        for name, table in tables.items():
+            self._write_csv(os.path.join(output_dir, f"{name}.csv"), table)
+        np.savez_compressed(os.path.join(output_dir, 'analytics.npz'),
+                            **{f"{name}.{column}": np.asarray(values)
+                               for name, table in tables.items() for column, values in table.items()})
+        return output_dir
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Phân tích mạng theo thời gian (streaming) trên dataset đồ thị đã tạo.")
+    parser.add_argument('dataset', help="Thư mục dataset (chứa meta.json)")
+    parser.add_argument('--output', default=None, help="Thư mục bảng kết quả (mặc định <dataset>/analytics)")
+    parser.add_argument('--window-steps', type=int, default=DEFAULT_WINDOW_STEPS, help="Số bước mỗi cửa sổ đọc")
+    parser.add_argument('--betweenness-every', type=int, default=DEFAULT_BETWEENNESS_EVERY,
+                        help="Lấy mẫu betweenness mỗi số bước này (0 = tắt)")
+    parser.add_argument('--betweenness-sources', type=int, default=DEFAULT_BETWEENNESS_SOURCES,
+                        help="Số node nguồn mỗi lần lấy mẫu betweenness")
+    parser.add_argument('--seed', type=int, default=0, help="Hạt giống chọn node nguồn")
+    return parser.parse_args()
+
+def main_analytics():
+    args = parse_args()
+    analytics = TemporalAnalytics(args.dataset, args.window_steps, args.betweenness_every,
+                                  args.betweenness_sources, args.seed)
+    report = analytics.run()
+    output_dir = report.save(args.output or os.path.join(args.dataset, 'analytics'))
+    print(report.summary())
+    print(f"Bảng phân tích lưu tại: {output_dir}")
+
+if __name__ == "__main__":
+    main_analytics()
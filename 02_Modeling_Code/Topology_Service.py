@@ -0,0 +1,497 @@
+# 02_Modeling_Code/Topology_Service.py
+
+import os
+import json
+import signal
+import socket
+import asyncio
+import argparse
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from Graph_Dataset import GraphDatasetReader
+from Graph_Snapshot import GraphSnapshot, EDGE_TYPES
+from Routing_Table import delay_graph
+
+# --- DỊCH VỤ TRUY VẤN TOPO CỤC BỘ (SNAPSHOT / LÁNG GIỀNG / THUỘC TÍNH CẠNH / ĐƯỜNG ĐI) ---
+# Mở dataset (Graph_Dataset) một lần và trả lời truy vấn tại thời điểm bất kỳ trong khoảng thời gian của dataset:
+#   Thời điểm nằm giữa hai bước đã lưu t_k <= t < t_k+1: tập cạnh giữ nguyên theo bước t_k (topo lấy mẫu), còn độ
+#   trễ, khoảng cách, các thuộc tính cạnh (số thực) của những cạnh có ở cả hai bước và vị trí node được nội suy
+#   tuyến tính theo t. Đường đi ngắn nhất (theo độ trễ) được tính trên trọng số đã nội suy.
+# Các "khung nhìn" topo (cạnh trong RAM, danh sách kề, đồ thị độ trễ CSR) của các thời điểm được hỏi gần đây nằm
+# trong một bộ đệm LRU giới hạn số khung nhìn; truy vấn theo lô gom các truy vấn đường đi cùng thời điểm vào một
+# lần Dijkstra (mỗi node nguồn một lần).
+# Dùng trực tiếp trong tiến trình (TopologyService) hoặc qua socket (serve / TopologyClient): một server giữ bản topo
+# "ấm" dùng chung cho nhiều tiến trình tối ưu (ACO/Q-ACO). Giao thức JSON Lines: mỗi dòng một truy vấn (dict) hoặc
+# một lô (danh sách truy vấn), mỗi dòng một phản hồi.
+# Truy vấn: {'op': ..., 'time': ISO-8601 hoặc 'step': chỉ số bước (có thể lẻ, ví dụ 12.5)}, node theo ID của dataset
+# (NORAD; trạm mặt đất ID âm):
+#   info                                  thông tin dataset và bộ đệm
+#   snapshot   [positions: bool]          mọi cạnh (và vị trí node) tại thời điểm
+#   neighbors  node                       các láng giềng của node cùng thuộc tính cạnh
+#   edge       u, v                       thuộc tính cạnh (u, v), null nếu không có cạnh
+#   route      src, dst                   đường đi độ trễ nhỏ nhất từ src tới dst
+DEFAULT_CACHE_SNAPSHOTS = 32        # Số khung nhìn topo tối đa trong bộ đệm LRU
+STEP_TOLERANCE_US = 1               # Thời điểm cách một bước đã lưu không quá ngưỡng này được coi là đúng bước đó
+MAX_REQUEST_BYTES = 64 * 1024 ** 2  # Độ dài tối đa một dòng truy vấn gửi tới server (lô lớn)
+
+def _time_us(value) -> int:
+    """Thời điểm (datetime hoặc chuỗi ISO-8601, UTC nếu không có múi giờ) thành micro giây kể từ Unix epoch."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(round(value.timestamp() * 1e6))
+
+def _error_message(error):
+    """Thông báo lỗi của truy vấn (KeyError: bỏ dấu nháy mà str() thêm vào)."""
+    return str(error.args[0]) if isinstance(error, KeyError) and error.args else str(error)
+
+def _jsonable(value):
+    """Chuyển kết quả (mảng / số NumPy, datetime) thành kiểu JSON."""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+class TopologyView:
+    """
+    Topo tại một thời điểm: cạnh (chỉ số node theo node_ids của dataset), trọng số, thuộc tính và vị trí node,
+    tất cả nằm trong RAM. Danh sách kề và đồ thị độ trễ được dựng khi cần lần đầu.
+    """
+
+    def __init__(self, n_nodes, time_step, timestamp, positions, src, dst, delay, distance, edge_type,
+                 attributes=None):
+        self.n_nodes = int(n_nodes)
+        self.time_step = float(time_step)  # Chỉ số bước (lẻ nếu nội suy)
+        self.timestamp = timestamp
+        self.positions = positions
+        self.src = src
+        self.dst = dst
+        self.delay = delay
+        self.distance = distance
+        self.edge_type = edge_type
+        self.attributes = dict(attributes or {})
+        # Khóa vô hướng của cạnh (min * N + max) sắp tăng dần -> tra cạnh bằng searchsorted
+        keys = np.minimum(src, dst) * self.n_nodes + np.maximum(src, dst)
+        self._key_order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._key_order]
+        self._adjacency = None
+        self._graph = None
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    def find_edges(self, u, v):
+        """Chỉ số cạnh (u, v) (mảng, vô hướng), -1 nếu không có cạnh."""
+        u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+        keys = np.minimum(u, v) * self.n_nodes + np.maximum(u, v)
+        if len(self._sorted_keys) == 0:
+            return np.full(keys.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+        return np.where(self._sorted_keys[pos] == keys, self._key_order[pos], -1)
+
+    def neighbors(self, u):
+        """Các node kề của u và chỉ số cạnh tương ứng."""
+        if self._adjacency is None:
+            # Danh sách kề dạng CSR: với mỗi đầu mút, (node bên kia, chỉ số cạnh), sắp theo đầu mút
+            ends = np.concatenate([self.src, self.dst])
+            order = np.argsort(ends, kind='stable')
+            indptr = np.r_[0, np.cumsum(np.bincount(ends, minlength=self.n_nodes))]
+            others = np.concatenate([self.dst, self.src])[order]
+            edge_ids = np.tile(np.arange(self.n_edges), 2)[order]
+            self._adjacency = (indptr, others, edge_ids)
+        indptr, others, edge_ids = self._adjacency
+        return others[indptr[u]:indptr[u + 1]], edge_ids[indptr[u]:indptr[u + 1]]
+
+    def shortest_paths(self, sources):
+        """Dijkstra theo độ trễ từ các node nguồn: (dist (S, N), pred (S, N), -9999 ở gốc / node không tới được)."""
+        if self._graph is None:
+            self._graph = delay_graph(self.n_nodes, self.src, self.dst, self.delay)
+        return dijkstra(self._graph, directed=True, indices=sources, return_predecessors=True)
+
+    def edge_records(self, edge_ids):
+        """Thuộc tính của các cạnh edge_ids (mảng song song)."""
+        records = {
+            'delay_s': self.delay[edge_ids],
+            'distance_km': self.distance[edge_ids],
+            'type': np.asarray(EDGE_TYPES)[self.edge_type[edge_ids]],
+        }
+        for name, values in self.attributes.items():
+            records[name] = values[edge_ids]
+        return records
+
+    @classmethod
+    def interpolate(cls, before, after, alpha, timestamp):
+        """
+        Khung nhìn tại thời điểm giữa hai bước: tập cạnh của before, trọng số/thuộc tính của các cạnh có ở cả hai
+        bước và vị trí node nội suy tuyến tính (alpha = 0 -> before, 1 -> after).
+        """
+        matched = after.find_edges(before.src, before.dst)
+        found = matched >= 0
+
+        def blend(a, b):
+            values = np.array(a, dtype=np.float64)
+            values[found] += alpha * (b[matched[found]] - a[found])
+            return values
+
+        return cls(before.n_nodes, before.time_step + alpha, timestamp,
+                   (1.0 - alpha) * before.positions + alpha * after.positions,
+                   before.src, before.dst, blend(before.delay, after.delay),
+                   blend(before.distance, after.distance), before.edge_type,
+                   {name: blend(values, after.attributes[name]) for name, values in before.attributes.items()})
+
+class TopologyService:
+    """
+    Truy vấn snapshot / láng giềng / thuộc tính cạnh / đường đi trên một dataset đã tạo, tại thời điểm bất kỳ
+    (xem đầu module). Dùng trực tiếp trong tiến trình hoặc qua serve() cho nhiều tiến trình.
+    cache_snapshots: số khung nhìn topo tối đa giữ trong bộ đệm LRU.
+    """
+
+    def __init__(self, dataset_dir, cache_snapshots=DEFAULT_CACHE_SNAPSHOTS):
+        self.dataset_dir = dataset_dir
+        self.reader = GraphDatasetReader(dataset_dir)
+        self.n_nodes = self.reader.n_nodes
+        self.n_steps = self.reader.n_steps
+        if self.n_steps == 0:
+            raise ValueError(f"Dataset rỗng: {dataset_dir}")
+        self.node_ids = np.asarray(self.reader.node_ids, dtype=np.int64)
+        self._id_order = np.argsort(self.node_ids)
+        self.timestamps = np.asarray(self.reader.timestamps, dtype=np.int64)
+        self.cache_snapshots = max(int(cache_snapshots), 1)
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # --- Thời điểm, node, bộ đệm ---
+    def resolve(self, time=None, step=None):
+        """Vị trí của thời điểm trong dataset: (k, alpha) với t = t_k + alpha * (t_k+1 - t_k), 0 <= alpha < 1."""
+        last = self.n_steps - 1
+        if step is not None:
+            step = float(step)
+            if not 0.0 <= step <= last:
+                raise ValueError(f"Bước {step} nằm ngoài dataset (0..{last})")
+            k = min(int(np.floor(step)), last)
+            return k, step - k
+        if time is None:
+            raise ValueError("Truy vấn cần 'time' hoặc 'step'")
+        t_us = _time_us(time)
+        if not self.timestamps[0] - STEP_TOLERANCE_US <= t_us <= self.timestamps[-1] + STEP_TOLERANCE_US:
+            raise ValueError(f"Thời điểm {time} nằm ngoài dataset "
+                             f"({self.reader.timestamp(0).isoformat()} .. {self.reader.timestamp(last).isoformat()})")
+        k = int(np.clip(np.searchsorted(self.timestamps, t_us + STEP_TOLERANCE_US, side='right') - 1, 0, last))
+        offset = t_us - int(self.timestamps[k])
+        if k == last or offset <= STEP_TOLERANCE_US:
+            return k, 0.0
+        return k, offset / float(self.timestamps[k + 1] - self.timestamps[k])
+
+    def node_index(self, node_ids):
+        """Chỉ số node (theo node_ids của dataset) của các ID node; KeyError nếu ID không có trong dataset."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.node_ids[self._id_order], node_ids), self.n_nodes - 1)
+        index = self._id_order[pos]
+        unknown = self.node_ids[index] != node_ids
+        if np.any(unknown):
+            raise KeyError(f"Node không có trong dataset: {np.atleast_1d(node_ids)[np.atleast_1d(unknown)].tolist()}")
+        return index
+
+    def _cached(self, key, build):
+        """Lấy khung nhìn theo khóa từ bộ đệm LRU, dựng (build()) và đưa vào nếu chưa có."""
+        view = self._cache.get(key)
+        if view is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return view
+        self.misses += 1
+        view = build()
+        self._cache[key] = view
+        while len(self._cache) > self.cache_snapshots:
+            self._cache.popitem(last=False)
+        return view
+
+    def _load_step(self, k):
+        """Khung nhìn của bước đã lưu k (đọc các cột của bước k từ memory-map vào RAM)."""
+        edges = self.reader.edges(k)
+        return TopologyView(
+            self.n_nodes, k, self.reader.timestamp(k), np.array(self.reader.positions[k], dtype=np.float64),
+            np.array(edges['src'], dtype=np.int64), np.array(edges['dst'], dtype=np.int64),
+            np.array(edges['weight_delay'], dtype=np.float64), np.array(edges['distance_km'], dtype=np.float64),
+            np.array(edges['type']), {name: np.array(edges[name], dtype=np.float64)
+                                      for name in self.reader.edge_attributes})
+
+    def view(self, time=None, step=None):
+        """Khung nhìn topo (TopologyView) tại thời điểm time (datetime / ISO-8601) hoặc chỉ số bước step."""
+        k, alpha = self.resolve(time, step)
+        if alpha == 0.0:
+            return self._cached((k, 0.0), lambda: self._load_step(k))
+
+        def build():
+            before = self._cached((k, 0.0), lambda: self._load_step(k))
+            after = self._cached((k + 1, 0.0), lambda: self._load_step(k + 1))
+            t0, t1 = int(self.timestamps[k]), int(self.timestamps[k + 1])
+            timestamp = datetime.fromtimestamp((t0 + alpha * (t1 - t0)) / 1e6, tz=timezone.utc)
+            return TopologyView.interpolate(before, after, alpha, timestamp)
+
+        return self._cached((k, alpha), build)
+
+    def cache_info(self):
+        return {'size': len(self._cache), 'capacity': self.cache_snapshots, 'hits': self.hits, 'misses': self.misses}
+
+    # --- Truy vấn ---
+    def snapshot(self, time=None, step=None):
+        """Snapshot tại thời điểm dạng GraphSnapshot (giống GraphDatasetReader.graph_snapshot, bỏ node cô lập)."""
+        view = self.view(time, step)
+        return GraphSnapshot.from_edges(
+            self.node_ids, self.reader.node_names or None, view.positions, view.src, view.dst, view.delay,
+            view.distance, view.edge_type, graph={'time_step': view.time_step, 'timestamp': view.timestamp.isoformat()},
+            edge_attributes=view.attributes)
+
+    def edges(self, time=None, step=None, positions=False):
+        """Mọi cạnh tại thời điểm theo ID node (mảng song song), kèm vị trí node nếu positions=True."""
+        view = self.view(time, step)
+        result = {'time_step': view.time_step, 'timestamp': view.timestamp,
+                  'src': self.node_ids[view.src], 'dst': self.node_ids[view.dst]}
+        result.update(view.edge_records(np.arange(view.n_edges)))
+        if positions:
+            result['node_ids'] = self.node_ids
+            result['positions'] = view.positions
+        return result
+
+    def neighbors(self, node, time=None, step=None):
+        """Các láng giềng của node (ID) tại thời điểm, cùng thuộc tính của cạnh nối tới từng láng giềng."""
+        view = self.view(time, step)
+        others, edge_ids = view.neighbors(int(self.node_index(node)))
+        result = {'time_step': view.time_step, 'timestamp': view.timestamp, 'node': int(node),
+                  'neighbors': self.node_ids[others]}
+        result.update(view.edge_records(edge_ids))
+        return result
+
+    def edge(self, u, v, time=None, step=None):
+        """Thuộc tính cạnh (u, v) (ID node) tại thời điểm, None nếu hai node không có liên kết."""
+        view = self.view(time, step)
+        edge_id = int(view.find_edges(self.node_index(u), self.node_index(v)))
+        if edge_id < 0:
+            return None
+        result = {'time_step': view.time_step, 'timestamp': view.timestamp, 'u': int(u), 'v': int(v)}
+        result.update({name: values[0] for name, values in view.edge_records([edge_id]).items()})
+        return result
+
+    def routes(self, pairs, time=None, step=None):
+        """
+        Đường đi độ trễ nhỏ nhất cho nhiều cặp (src, dst) (ID node) tại cùng thời điểm: một lần Dijkstra cho mỗi
+        node nguồn khác nhau. Mỗi kết quả: path (danh sách ID, [] nếu không tới được), delay_s, distance_km, hops.
+        """
+        view = self.view(time, step)
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        src, dst = self.node_index(pairs[:, 0]), self.node_index(pairs[:, 1])
+        sources, source_row = np.unique(src, return_inverse=True)
+        dist, pred = view.shortest_paths(sources) if len(sources) else (None, None)
+        results = []
+        for (src_id, dst_id), s, u, v in zip(pairs.tolist(), source_row, src, dst):
+            result = {'time_step': view.time_step, 'timestamp': view.timestamp, 'src': src_id, 'dst': dst_id,
+                      'path': [], 'delay_s': None, 'distance_km': None, 'hops': None}
+            if np.isfinite(dist[s, v]):
+                path = [v]
+                while path[-1] != u:
+                    path.append(pred[s, path[-1]])
+                path = np.asarray(path[::-1], dtype=np.int64)
+                result.update(path=self.node_ids[path].tolist(), delay_s=float(dist[s, v]), hops=len(path) - 1,
+                              distance_km=float(np.sum(view.distance[view.find_edges(path[:-1], path[1:])])))
+            results.append(result)
+        return results
+
+    def route(self, src, dst, time=None, step=None):
+        """Đường đi độ trễ nhỏ nhất từ src tới dst (ID node) tại thời điểm (xem routes)."""
+        return self.routes([(src, dst)], time, step)[0]
+
+    def info(self):
+        return {'dataset_dir': self.dataset_dir, 'scenario_name': self.reader.meta.get('scenario_name'),
+                'n_nodes': self.n_nodes, 'n_steps': self.n_steps,
+                'start_time': self.reader.timestamp(0), 'end_time': self.reader.timestamp(self.n_steps - 1),
+                'edge_attributes': self.reader.edge_attributes, 'cache': self.cache_info()}
+
+    @staticmethod
+    def _op(request):
+        """Tên thao tác của một truy vấn; TypeError nếu truy vấn không phải dict (object JSON)."""
+        if not isinstance(request, dict):
+            raise TypeError(f"Truy vấn phải là object JSON, nhận được {type(request).__name__}")
+        return request.get('op')
+
+    def query(self, request):
+        """Trả lời một truy vấn dạng dict (xem đầu module)."""
+        op = self._op(request)
+        when = {'time': request.get('time'), 'step': request.get('step')}
+        if op == 'info':
+            return self.info()
+        if op == 'snapshot':
+            return self.edges(positions=bool(request.get('positions', False)), **when)
+        if op == 'neighbors':
+            return self.neighbors(request['node'], **when)
+        if op == 'edge':
+            return self.edge(request['u'], request['v'], **when)
+        if op == 'route':
+            return self.route(request['src'], request['dst'], **when)
+        raise ValueError(f"Truy vấn không hợp lệ: op = {op}")
+
+    def batch(self, requests):
+        """
+        Trả lời một lô truy vấn theo đúng thứ tự. Các truy vấn route cùng thời điểm được gom lại (một lần Dijkstra
+        mỗi nguồn); truy vấn lỗi trả về {'error': thông báo} mà không làm hỏng cả lô.
+        """
+        results = [None] * len(requests)
+        route_groups = {}
+        for k, request in enumerate(requests):
+            try:
+                if self._op(request) == 'route':
+                    key = self.resolve(request.get('time'), request.get('step'))
+                    route_groups.setdefault(key, []).append(k)
+                else:
+                    results[k] = self.query(request)
+            except (KeyError, ValueError, TypeError) as e:
+                results[k] = {'error': _error_message(e)}
+        for (k_step, alpha), members in route_groups.items():
+            try:
+                pairs = [(requests[k]['src'], requests[k]['dst']) for k in members]
+                for k, result in zip(members, self.routes(pairs, step=k_step + alpha)):
+                    results[k] = result
+            except (KeyError, ValueError, TypeError):
+                # Có cặp lỗi trong nhóm -> trả lời từng truy vấn riêng để chỉ truy vấn lỗi nhận thông báo lỗi
+                for k in members:
+                    try:
+                        results[k] = self.query(requests[k])
+                    except (KeyError, ValueError, TypeError) as e:
+                        results[k] = {'error': _error_message(e)}
+        return results
+
+    # --- Server (JSON Lines qua Unix socket hoặc TCP cục bộ) ---
+    async def _handle_connection(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                response = self.batch(request) if isinstance(request, list) else self.query(request)
+            except (KeyError, ValueError, TypeError) as e:
+                response = {'error': _error_message(e)}
+            except Exception as e:  # Lỗi không lường trước: vẫn trả lời để không đóng kết nối dùng chung
+                response = {'error': f"{type(e).__name__}: {_error_message(e)}"}
+            writer.write((json.dumps(_jsonable(response)) + '\n').encode())
+            await writer.drain()
+        writer.close()
+
+    async def _serve(self, socket_path=None, host='127.0.0.1', port=None):
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)  # Socket cũ của server trước
+            server = await asyncio.start_unix_server(self._handle_connection, path=socket_path,
+                                                     limit=MAX_REQUEST_BYTES)
+        else:
+            server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_REQUEST_BYTES)
+        # SIGTERM / SIGINT dừng server gọn gàng (serve() xóa file socket)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):  # Nền tảng không hỗ trợ (Windows)
+                pass
+        async with server:
+            await stop.wait()
+
+    def serve(self, socket_path=None, host='127.0.0.1', port=None):
+        """Chạy server (chặn tới khi bị ngắt): Unix socket tại socket_path, hoặc TCP host:port nếu không có."""
+        try:
+            asyncio.run(self._serve(socket_path, host, port))
+        finally:
+            if socket_path and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+class TopologyClient:
+    """
+    Client đồng bộ của server TopologyService (mỗi tiến trình tối ưu một kết nối). Các hàm trả về dict JSON như
+    TopologyService.query; truy vấn lỗi ném RuntimeError (batch trả về {'error': ...} tại vị trí tương ứng).
+    """
+
+    def __init__(self, socket_path=None, host='127.0.0.1', port=None):
+        if socket_path:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+        else:
+            self._socket = socket.create_connection((host, port))
+        self._file = self._socket.makefile('rwb')
+
+    def _call(self, payload):
+        self._file.write((json.dumps(_jsonable(payload)) + '\n').encode())
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Server đã đóng kết nối")
+        return json.loads(line)
+
+    def query(self, request):
+        response = self._call(request)
+        if isinstance(response, dict) and 'error' in response:
+            raise RuntimeError(response['error'])
+        return response
+
+    def batch(self, requests):
+        return self._call(list(requests))
+
+    def info(self):
+        return self.query({'op': 'info'})
+
+    def snapshot(self, time=None, step=None, positions=False):
+        return self.query({'op': 'snapshot', 'time': time, 'step': step, 'positions': positions})
+
+    def neighbors(self, node, time=None, step=None):
+        return self.query({'op': 'neighbors', 'node': node, 'time': time, 'step': step})
+
+    def edge(self, u, v, time=None, step=None):
+        return self.query({'op': 'edge', 'u': u, 'v': v, 'time': time, 'step': step})
+
+    def route(self, src, dst, time=None, step=None):
+        return self.query({'op': 'route', 'src': src, 'dst': dst, 'time': time, 'step': step})
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dịch vụ truy vấn topo cục bộ trên dataset đồ thị đã tạo.")
+    parser.add_argument('dataset', help="Thư mục dataset (chứa meta.json)")
+    parser.add_argument('--socket', default=None, help="Đường dẫn Unix socket (mặc định <dataset>/topology.sock)")
+    parser.add_argument('--port', type=int, default=None, help="Lắng nghe TCP trên 127.0.0.1:<port> thay cho Unix socket")
+    parser.add_argument('--cache-snapshots', type=int, default=DEFAULT_CACHE_SNAPSHOTS,
+                        help="Số khung nhìn topo tối đa trong bộ đệm LRU")
+    return parser.parse_args()
+
+def main_service():
+    args = parse_args()
+    service = TopologyService(args.dataset, args.cache_snapshots)
+    socket_path = None if args.port else (args.socket or os.path.join(args.dataset, 'topology.sock'))
+    info = service.info()
+    print(f"Dataset {info['scenario_name']}: {info['n_nodes']} node, {info['n_steps']} bước "
+          f"({info['start_time'].isoformat()} .. {info['end_time'].isoformat()})")
+    print(f"Lắng nghe tại: {socket_path or f'127.0.0.1:{args.port}'} (Ctrl+C để dừng)")
+    service.serve(socket_path, port=args.port)
+    print("Đã dừng server.")
+
+if __name__ == "__main__":
+    main_service()
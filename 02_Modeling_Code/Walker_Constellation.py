@@ -0,0 +1,109 @@
+# 02_Modeling_Code/Walker_Constellation.py
+
+import os
+import math
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+from typing import List, Tuple
+
+from Plane_Topology import MU_EARTH, RE_WGS72
+
+# --- CHÒM SAO WALKER-DELTA TỔNG HỢP (KHÔNG CẦN MẠNG) ---
+# Sinh file TLE 3 dòng hợp lệ (đúng cột, đúng checksum) cho chòm sao Walker-delta i:t/p/f, dùng để chạy
+# benchmark offline và ở kích thước lớn hơn catalog thực. Quỹ đạo gần tròn, không có lực cản (B* = 0).
+DEFAULT_INCLINATION_DEG = 53.0   # Giống shell chính của Starlink
+DEFAULT_ALTITUDE_KM = 550.0
+DEFAULT_ECCENTRICITY = 1.0e-4
+PLANE_ASPECT = 72.0 / 22.0       # Tỉ lệ số mặt phẳng / số vệ tinh mỗi mặt phẳng (shell 72 x 22 của Starlink)
+FIRST_SATNUM = 1                 # Số NORAD tổng hợp bắt đầu từ đây (file riêng, không trộn với catalog thật)
+MAX_SATNUM = 99999               # Định dạng TLE chỉ có 5 chữ số
+DAY_S = 86400.0
+
+def tle_checksum(line: str) -> int:
+    """Checksum TLE: tổng các chữ số, mỗi dấu '-' tính là 1, lấy modulo 10."""
+    return sum(int(c) if c.isdigit() else (1 if c == '-' else 0) for c in line[:68]) % 10
+
+def mean_motion_rev_per_day(altitude_km: float) -> float:
+    """Chuyển động trung bình (vòng/ngày) của quỹ đạo tròn ở độ cao altitude_km (WGS72)."""
+    a = RE_WGS72 + altitude_km
+    return math.sqrt(MU_EARTH / a ** 3) * DAY_S / (2.0 * math.pi)
+
+def walker_delta(total: int, planes: int, phasing: int, inclination_deg: float = DEFAULT_INCLINATION_DEG):
+    """
+    Phần tử góc của chòm sao Walker-delta i:t/p/f. Trả về (inclination, raan, mean_anomaly) theo độ, mỗi mảng (t,).
+    RAAN của mặt phẳng j là 360 j / p; vệ tinh k trong mặt phẳng có M = 360 k / s + 360 f j / t.
+    """
+    if planes <= 0 or total % planes:
+        raise ValueError(f"Walker-delta cần t chia hết cho p (t={total}, p={planes})")
+    per_plane = total // planes
+    plane, slot = np.divmod(np.arange(total), per_plane)
+    raan = 360.0 * plane / planes
+    mean_anomaly = (360.0 * slot / per_plane + 360.0 * phasing * plane / total) % 360.0
+    return np.full(total, float(inclination_deg)), raan, mean_anomaly
+
+def walker_for_size(n_satellites: int) -> Tuple[int, int]:
+    """Chọn (t, p) gần n_satellites nhất với tỉ lệ mặt phẳng giống Starlink; t = p * ceil(n / p) >= n."""
+    planes = max(1, min(n_satellites, int(round(math.sqrt(n_satellites * PLANE_ASPECT)))))
+    return planes * math.ceil(n_satellites / planes), planes
+
+def format_tle(satnum: int, name: str, epoch: datetime, inclination_deg: float, raan_deg: float,
+               eccentricity: float, arg_perigee_deg: float, mean_anomaly_deg: float, mean_motion: float) -> List[str]:
+    """Ba dòng TLE (tên, dòng 1, dòng 2) theo đúng định dạng cột của NORAD."""
+    epoch = epoch.astimezone(timezone.utc)
+    start_of_year = datetime(epoch.year, 1, 1, tzinfo=timezone.utc)
+    day_of_year = 1.0 + (epoch - start_of_year).total_seconds() / DAY_S
+    intl = f"{epoch.year % 100:02d}{(satnum - FIRST_SATNUM) % 1000:03d}A"
+    line1 = (f"1 {satnum:05d}U {intl:<8} {epoch.year % 100:02d}{day_of_year:012.8f} "
+             f" .00000000  00000-0  00000-0 0  999")
+    line2 = (f"2 {satnum:05d} {inclination_deg:8.4f} {raan_deg % 360.0:8.4f} "
+             f"{int(round(eccentricity * 1e7)):07d} {arg_perigee_deg % 360.0:8.4f} "
+             f"{mean_anomaly_deg % 360.0:8.4f} {mean_motion:11.8f}{0:5d}")
+    return [name, line1 + str(tle_checksum(line1)), line2 + str(tle_checksum(line2))]
+
+def write_walker_tle(filepath, n_satellites: int, epoch: datetime, planes: int = None, phasing: int = 1,
+                     inclination_deg: float = DEFAULT_INCLINATION_DEG, altitude_km: float = DEFAULT_ALTITUDE_KM):
+    """
+    Ghi file TLE cho một shell Walker-delta (đúng n_satellites vệ tinh nếu chỉ định planes và n chia hết cho planes,
+    ngược lại t = p * ceil(n / p)). Epoch của mọi TLE là epoch (nên đặt bằng START_TIME của kịch bản).
+    Trả về số vệ tinh đã ghi.
+    """
+    if planes is None:
+        total, planes = walker_for_size(n_satellites)
+    else:
+        total = planes * math.ceil(n_satellites / planes)
+    if total > MAX_SATNUM - FIRST_SATNUM + 1:
+        raise ValueError(f"Tối đa {MAX_SATNUM - FIRST_SATNUM + 1} vệ tinh tổng hợp (định dạng TLE 5 chữ số)")
+
+    inclination, raan, mean_anomaly = walker_delta(total, planes, phasing % planes, inclination_deg)
+    mean_motion = mean_motion_rev_per_day(altitude_km)
+    per_plane = total // planes
+    lines = []
+    for k in range(total):
+        plane, slot = divmod(k, per_plane)
+        lines += format_tle(FIRST_SATNUM + k, f"WALKER-P{plane:03d}-S{slot:03d}", epoch, inclination[k], raan[k],
+                            DEFAULT_ECCENTRICITY, 0.0, mean_anomaly[k], mean_motion)
+
+    os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+    with open(filepath, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return total
+
+def main_walker():
+    parser = argparse.ArgumentParser(description='Sinh file TLE cho chòm sao Walker-delta tổng hợp.')
+    parser.add_argument('output', help='Đường dẫn file TLE đầu ra')
+    parser.add_argument('--satellites', type=int, default=1584, help='Số vệ tinh (t)')
+    parser.add_argument('--planes', type=int, default=None, help='Số mặt phẳng quỹ đạo (p); mặc định tự chọn')
+    parser.add_argument('--phasing', type=int, default=1, help='Hệ số pha Walker (f)')
+    parser.add_argument('--inclination', type=float, default=DEFAULT_INCLINATION_DEG, help='Góc nghiêng (độ)')
+    parser.add_argument('--altitude', type=float, default=DEFAULT_ALTITUDE_KM, help='Độ cao (km)')
+    parser.add_argument('--epoch', default='2025-12-07T19:00:00Z', help='Epoch của TLE (UTC ISO)')
+    args = parser.parse_args()
+
+    epoch = datetime.fromisoformat(args.epoch.replace('Z', '+00:00'))
+    total = write_walker_tle(args.output, args.satellites, epoch, args.planes, args.phasing,
+                             args.inclination, args.altitude)
+    print(f"Đã ghi {total} TLE Walker-delta vào {args.output}")
+
+if __name__ == "__main__":
+    main_walker()
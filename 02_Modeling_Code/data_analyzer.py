@@ -1,26 +1,26 @@
 # 02_Modeling_Code/data_analyzer.py
 
-import json
 import os
-import glob
 import pandas as pd
 
+from Orbital_Catalog import open_catalog, load_ids, shell_filter, group_source
+
 # Đường dẫn tới thư mục dữ liệu nguồn
-DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.getcwd()), '01_Data_Source')
+DATA_SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_Data_Source')
 
 def find_latest_file(group_name):
-    """Tìm file JSON mới nhất cho một nhóm cụ thể."""
-    pattern = os.path.join(DATA_SOURCE_DIR, f"{group_name}_*.json")
-    list_of_files = glob.glob(pattern)
-    if not list_of_files:
+    """File nguồn của một nhóm (như Graph_Generator): file chuẩn của kho, TLE mới nhất, hoặc OMM JSON mới nhất."""
+    try:
+        return group_source(group_name, DATA_SOURCE_DIR)
+    except FileNotFoundError:
         print(f"Không tìm thấy file nào cho nhóm: {group_name}")
         return None
-    # Sắp xếp theo tên (timestamp) và lấy file mới nhất
-    latest_file = max(list_of_files, key=os.path.getctime)
-    return latest_file
 
-def analyze_omm_structure(filepath):
-    """Đọc và phân tích cấu trúc của file OMM JSON."""
+def analyze_omm_structure(filepath, where=None, exclude_ids=None):
+    """
+    Phân tích catalog của một file OMM JSON / TLE qua catalog dạng cột (Orbital_Catalog, dựng một lần):
+    chỉ đọc các cột và vệ tinh cần thiết (where / exclude_ids: bộ lọc đẩy xuống).
+    """
     if not filepath:
         return
         
@@ -28,55 +28,57 @@ def analyze_omm_structure(filepath):
     print(f"ĐANG PHÂN TÍCH CẤU TRÚC: {os.path.basename(filepath)}")
     print(f"=======================================================")
     
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-        
-    if not data:
-        print("File JSON rỗng hoặc không hợp lệ.")
+    catalog = open_catalog(filepath)
+    rows = catalog.select(where, exclude_ids=exclude_ids)
+    if len(rows) == 0:
+        print("Catalog rỗng hoặc không có vệ tinh nào thỏa bộ lọc.")
         return
 
-    # Lấy mẫu một vệ tinh (element)
-    sample_element = data[0]
-    
-    print(f"Tổng số phần tử (vệ tinh): {len(data)}")
-    print("\n--- CÁC TRƯỜNG DỮ LIỆU CHÍNH (KEY) TRONG OMM ---")
+    print(f"Tổng số phần tử (vệ tinh): {len(rows)} / {len(catalog)}")
+    if where:
+        print(f"Bộ lọc: {where}")
+    print("\n--- CÁC CỘT CỦA CATALOG ---")
     
-    # Hiển thị các key của phần tử mẫu
-    for key in sample_element.keys():
+    # Hiển thị các cột (lưu trữ + dẫn xuất)
+    for key in catalog.column_names:
         print(f"  - {key}")
 
-    print("\n--- PHÂN TÍCH CÁC TRƯỜNG DỮ LIỆU QUỸ ĐẠO (SGP4 INPUTS) ---")
+    print("\n--- PHẦN TỬ QUỸ ĐẠO CỦA VỆ TINH ĐẦU TIÊN (SGP4 INPUTS) ---")
     
-    # Các trường quan trọng cho SGP4 (dùng để tính toán vị trí 3D):
-    omm_keys_for_sgp4 = [
-        "OBJECT_NAME", "OBJECT_ID", "EPOCH", "MEAN_MOTION", 
-        "ECCENTRICITY", "INCLINATION", "RA_OF_ASC_NODE", 
-        "ARG_OF_PERICENTER", "MEAN_ANOMALY", "BSTAR", 
-        "CATALOG_NUMBER"
+    # Các trường quan trọng cho SGP4 (dùng để tính toán vị trí 3D), đọc đúng một hàng:
+    sgp4_columns = [
+        "name", "object_id", "epoch_utc", "mean_motion",
+        "eccentricity", "inclination_deg", "raan_deg",
+        "arg_perigee_deg", "mean_anomaly_deg", "bstar",
+        "norad_id"
     ]
-    
-    for key in omm_keys_for_sgp4:
-        if key in sample_element:
-            print(f"  {key:<20}: {sample_element[key]}")
-        else:
-            print(f"  {key:<20}: [KHÔNG TÌM THẤY]")
+    sample = catalog.read(sgp4_columns, rows=rows[:1])
+    for key in sgp4_columns:
+        value = sample[key][0]
+        print(f"  {key:<20}: {value.decode() if isinstance(value, bytes) else value}")
 
-    # Chuyển sang DataFrame để phân tích thống kê cơ bản
-    df = pd.DataFrame(data)
+    # Thống kê cơ bản chỉ trên các cột cần dùng
+    df = pd.DataFrame(catalog.read(['mean_motion', 'inclination_deg', 'altitude_km'], rows=rows))
     
-    if "MEAN_MOTION" in df.columns:
-        print("\n--- THỐNG KÊ CƠ BẢN (MEAN_MOTION - Tốc độ) ---")
-        print(df['MEAN_MOTION'].describe())
+    print("\n--- THỐNG KÊ CƠ BẢN (MEAN_MOTION - Tốc độ, vòng/ngày) ---")
+    print(df['mean_motion'].describe())
+
+    print("\n--- THỐNG KÊ CƠ BẢN (INCLINATION - Góc nghiêng) ---")
+    print(df['inclination_deg'].describe())
 
-    if "INCLINATION" in df.columns:
-        print("\n--- THỐNG KÊ CƠ BẢN (INCLINATION - Góc nghiêng) ---")
-        print(df['INCLINATION'].describe())
+    print("\n--- THỐNG KÊ CƠ BẢN (ALTITUDE - Độ cao trung bình, km) ---")
+    print(df['altitude_km'].describe())
 
 if __name__ == "__main__":
     # Phân tích Starlink (chòm sao cốt lõi)
     starlink_file = find_latest_file("STARLINK")
     analyze_omm_structure(starlink_file)
     
+    # Shell 550 km của Starlink, bỏ các vệ tinh đang rơi (nhóm DECAYING)
+    decaying_file = find_latest_file("DECAYING")
+    analyze_omm_structure(starlink_file, where=shell_filter(550.0),
+                          exclude_ids=load_ids(decaying_file) if decaying_file else None)
+    
     # Phân tích các node đặc biệt (trạm)
     stations_file = find_latest_file("STATIONS")
     analyze_omm_structure(stations_file)
@@ -3,7 +3,11 @@
 import requests
 import json
 import os
-from datetime import datetime
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 import time
 
 # --- Định nghĩa các nguồn dữ liệu và định dạng ---
@@ -31,7 +35,7 @@ DATA_SOURCES = {
     }
 }
 
-OUTPUT_DIR = os.path.join(os.path.dirname(os.getcwd()), '01_Data_Source')
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '01_Data_Source')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def download_and_save_data(source_name, url, file_format):
@@ -74,13 +78,314 @@ def download_and_save_data(source_name, url, file_format):
         
     return False
 
+# --- KHO CATALOG CHUẨN (GỘP THEO NORAD ID) ---
+# Mỗi nguồn có đúng một file chuẩn trong OUTPUT_DIR, cập nhật tại chỗ thay vì một file mới mỗi lần tải:
+#   <NGUỒN>.txt (TLE 3 dòng) hoặc <NGUỒN>.json (danh sách OMM), ví dụ STARLINK_TLE.txt
+# Phần tử quỹ đạo mới được gộp theo NORAD ID: giữ nguyên thứ tự các vệ tinh đã có (chỉ số vệ tinh và
+# SUBSET_SIZE ổn định giữa các lần cập nhật), chỉ thay khi epoch mới hơn, thêm vệ tinh mới vào cuối.
+# Phản hồi GROUP của Celestrak là toàn bộ nhóm, nên vệ tinh không còn trong phản hồi (đã rơi, rời nhóm) bị
+# loại (drop_missing). Trạng thái tải (ETag / Last-Modified cho yêu cầu có điều kiện) lưu ở STORE_STATE_FILENAME.
+STORE_STATE_FILENAME = 'catalog_state.json'
+MAX_CONCURRENCY = 2          # Số yêu cầu đồng thời tối đa
+MIN_REQUEST_INTERVAL_S = 2.0  # Khoảng cách tối thiểu giữa hai lần bắt đầu yêu cầu tới cùng một máy chủ (giây)
+REQUEST_TIMEOUT_S = 30
+
+def store_path(source_name, file_format, store_dir=OUTPUT_DIR):
+    """Đường dẫn file chuẩn của một nguồn trong kho catalog."""
+    return os.path.join(store_dir, f"{source_name}.{'json' if file_format == 'json' else 'txt'}")
+
+def _tle_epoch(line1):
+    """Epoch của TLE (dòng 1, cột 19-32: YYDDD.DDDDDDDD) dạng (năm, ngày trong năm) để so sánh."""
+    year = int(line1[18:20])
+    return (year + (1900 if year >= 57 else 2000), float(line1[20:32]))
+
+def _split_tle(text):
+    """Tách văn bản TLE 3 dòng -> danh sách (NORAD ID, (tên, dòng 1, dòng 2)) (bỏ bộ không hợp lệ)."""
+    lines = [line.rstrip() for line in text.splitlines() if line.strip()]
+    entries = []
+    for i in range(0, len(lines) - 2, 3):
+        name, line1, line2 = lines[i].strip(), lines[i + 1], lines[i + 2]
+        if line1.startswith('1 ') and line2.startswith('2 '):
+            entries.append((int(line1[2:7]), (name, line1, line2)))
+    return entries
+
+def merge_entries(existing, incoming, epoch_of, drop_missing=True):
+    """
+    Gộp hai danh sách (NORAD ID, bản ghi) theo NORAD ID (xem chú thích kho catalog).
+    Trả về (danh sách đã gộp, thống kê added/updated/unchanged/stale/removed).
+    """
+    incoming = dict(incoming)
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'stale': 0, 'removed': 0}
+    merged, seen = [], set()
+    for norad_id, record in existing:
+        seen.add(norad_id)
+        new = incoming.get(norad_id)
+        if new is None:
+            if drop_missing:
+                stats['removed'] += 1
+                continue
+            merged.append((norad_id, record))
+        elif new == record:
+            stats['unchanged'] += 1
+            merged.append((norad_id, record))
+        elif epoch_of(new) >= epoch_of(record):
+            stats['updated'] += 1
+            merged.append((norad_id, new))
+        else:
+            stats['stale'] += 1  # Phần tử cũ hơn bản đang lưu (ví dụ phản hồi từ cache trung gian) -> bỏ qua
+            merged.append((norad_id, record))
+    for norad_id, record in incoming.items():
+        if norad_id not in seen:
+            stats['added'] += 1
+            merged.append((norad_id, record))
+    return merged, stats
+
+def merge_tle_text(existing_text, incoming_text, drop_missing=True):
+    """Gộp hai văn bản TLE theo NORAD ID -> (văn bản TLE đã gộp, thống kê)."""
+    merged, stats = merge_entries(_split_tle(existing_text or ''), _split_tle(incoming_text),
+                                  lambda record: _tle_epoch(record[1]), drop_missing)
+    return ''.join(f"{name}\n{line1}\n{line2}\n" for _, (name, line1, line2) in merged), stats
+
+def merge_omm_records(existing, incoming, drop_missing=True):
+    """Gộp hai danh sách OMM (JSON) theo NORAD_CAT_ID -> (danh sách đã gộp, thống kê)."""
+    merged, stats = merge_entries([(int(r['NORAD_CAT_ID']), r) for r in existing or []],
+                                  [(int(r['NORAD_CAT_ID']), r) for r in incoming],
+                                  lambda record: record.get('EPOCH', ''), drop_missing)
+    return [record for _, record in merged], stats
+
+def _write_atomic(filepath, text):
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, filepath)
+
+class CatalogFetcher:
+    """
+    Tải các nguồn catalog bằng asyncio: một requests.Session dùng chung (pool kết nối keep-alive) được gọi trên
+    luồng phụ, tối đa max_concurrency yêu cầu đồng thời, và các yêu cầu tới cùng máy chủ bắt đầu cách nhau ít nhất
+    min_interval_s giây. Yêu cầu có điều kiện (If-None-Match / If-Modified-Since): 304 nghĩa là không đổi,
+    không tải lại. Gặp 403 (Celestrak chặn) thì bỏ qua các nguồn còn lại trên máy chủ đó.
+    """
+
+    def __init__(self, sources=None, store_dir=OUTPUT_DIR, max_concurrency=MAX_CONCURRENCY,
+                 min_interval_s=MIN_REQUEST_INTERVAL_S, timeout=REQUEST_TIMEOUT_S, force=False):
+        """sources: dict giống DATA_SOURCES (mặc định DATA_SOURCES); force: bỏ qua ETag/Last-Modified đã lưu."""
+        self.sources = dict(DATA_SOURCES if sources is None else sources)
+        self.store_dir = store_dir
+        self.max_concurrency = max_concurrency
+        self.min_interval_s = min_interval_s
+        self.timeout = timeout
+        self.force = force
+        os.makedirs(store_dir, exist_ok=True)
+        self.state_path = os.path.join(store_dir, STORE_STATE_FILENAME)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                self.state = json.load(f)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_next_start = {}
+        self._blocked_hosts = set()
+
+    async def _wait_turn(self, host, lock):
+        """Giữ khoảng cách min_interval_s giữa các lần bắt đầu yêu cầu tới cùng máy chủ."""
+        async with lock:
+            loop = asyncio.get_running_loop()
+            delay = self._host_next_start.get(host, 0.0) - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._host_next_start[host] = loop.time() + self.min_interval_s
+
+    async def _fetch(self, name, params, semaphore, host_locks):
+        url, file_format = params['url'], params['format']
+        host = urlsplit(url).netloc
+        lock = host_locks.setdefault(host, asyncio.Lock())
+        async with semaphore:
+            await self._wait_turn(host, lock)
+            if host in self._blocked_hosts:
+                return {'source': name, 'status': 'skipped'}
+            headers = {}
+            validators = {} if self.force else self.state.get(name, {})
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+            try:
+                response = await asyncio.to_thread(self.session.get, url, headers=headers, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                return {'source': name, 'status': 'error', 'error': str(e)}
+
+        if response.status_code == 304:
+            return {'source': name, 'status': 'not_modified'}
+        if response.status_code == 403:
+            self._blocked_hosts.add(host)
+            return {'source': name, 'status': 'blocked'}
+        if response.status_code != 200:
+            return {'source': name, 'status': 'error', 'error': f"HTTP {response.status_code}: {response.text[:200]}"}
+        try:
+            stats = self._merge_into_store(name, file_format, response, params.get('drop_missing', True))
+        except (ValueError, KeyError) as e:
+            return {'source': name, 'status': 'error', 'error': f"Phản hồi không hợp lệ: {e}"}
+        self.state[name] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': datetime.now(timezone.utc).isoformat(),
+            'url': url,
+        }
+        return {'source': name, 'status': 'updated', **stats}
+
+    def _merge_into_store(self, name, file_format, response, drop_missing):
+        """Gộp phản hồi vào file chuẩn của nguồn (ghi nguyên tử, chỉ khi có thay đổi)."""
+        filepath = store_path(name, file_format, self.store_dir)
+        if file_format == 'json':
+            existing = None
+            if os.path.exists(filepath):
+                with open(filepath, 'r') as f:
+                    existing = json.load(f)
+            merged, stats = merge_omm_records(existing, response.json(), drop_missing)
+            text = json.dumps(merged, indent=4)
+        else:
+            existing = None
+            if os.path.exists(filepath):
+                with open(filepath, 'r') as f:
+                    existing = f.read()
+            text, stats = merge_tle_text(existing, response.text, drop_missing)
+            if not text:
+                raise ValueError("không có TLE hợp lệ nào")
+        if stats['added'] or stats['updated'] or stats['removed'] or not os.path.exists(filepath):
+            _write_atomic(filepath, text)
+        stats['path'] = filepath
+        return stats
+
+    async def fetch_all(self):
+        """Tải mọi nguồn (đồng thời trong giới hạn) và lưu trạng thái; trả về danh sách kết quả theo nguồn."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_locks = {}
+        try:
+            results = await asyncio.gather(*(self._fetch(name, params, semaphore, host_locks)
+                                             for name, params in self.sources.items()))
+        finally:
+            self.session.close()
+        _write_atomic(self.state_path, json.dumps(self.state, indent=2))
+        return results
+
+def fetch_catalogs(sources=None, store_dir=OUTPUT_DIR, **kwargs):
+    """Hàm đồng bộ bao quanh CatalogFetcher.fetch_all (dùng từ code không chạy asyncio)."""
+    return asyncio.run(CatalogFetcher(sources, store_dir, **kwargs).fetch_all())
+
+# --- Tự kiểm tra CatalogFetcher với máy chủ HTTP cục bộ (không gọi Celestrak) ---
+SELFCHECK_TLE = ("ISS (ZARYA)",
+                 "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927",
+                 "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537")
+
+def _tle_checksum(line):
+    """Chữ số kiểm tra của một dòng TLE (tổng các chữ số, '-' tính là 1, mod 10)."""
+    return str(sum(int(c) if c.isdigit() else c == '-' for c in line[:68]) % 10)
+
+def _selfcheck_tle(norad_id, epoch_offset_days=0.0):
+    """Bộ TLE 3 dòng của SELFCHECK_TLE với NORAD ID khác và epoch lùi/tiến epoch_offset_days ngày."""
+    name, line1, line2 = SELFCHECK_TLE
+    day = float(line1[20:32]) + epoch_offset_days
+    line1 = f"{line1[:2]}{norad_id:05d}{line1[7:20]}{day:012.8f}{line1[32:68]}"
+    line2 = f"{line2[:2]}{norad_id:05d}{line2[7:68]}"
+    return f"{name} {norad_id}\n{line1}{_tle_checksum(line1)}\n{line2}{_tle_checksum(line2)}\n"
+
+def main_fetcher_selfcheck():
+    """
+    Chạy CatalogFetcher với http.server trên một thư mục tạm: lần tải đầu (200) gộp vào kho, lần thứ hai nhận 304,
+    sau khi sửa file được phục vụ thì thống kê added/updated/removed đúng và kho chứa đúng các vệ tinh mới.
+    """
+    import tempfile
+    import threading
+    from functools import partial
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        served_dir, store_dir = os.path.join(tmp_dir, 'served'), os.path.join(tmp_dir, 'store')
+        os.makedirs(served_dir)
+        served_path = os.path.join(served_dir, 'group.txt')
+
+        def serve(tles, mtime):
+            with open(served_path, 'w') as f:
+                f.write(''.join(tles))
+            os.utime(served_path, (mtime, mtime))
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=served_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        sources = {'SELFCHECK_TLE': {'url': f"http://127.0.0.1:{server.server_port}/group.txt", 'format': 'tle'}}
+
+        def fetch():
+            return fetch_catalogs(sources, store_dir, min_interval_s=0.0)[0]
+
+        try:
+            now = time.time()
+            serve([_selfcheck_tle(norad_id) for norad_id in range(90001, 90006)], now - 60)
+            result = fetch()
+            assert result['status'] == 'updated' and result['added'] == 5, result
+            print(f"200: +{result['added']} mới -> {os.path.basename(result['path'])}")
+
+            result = fetch()
+            assert result['status'] == 'not_modified', result
+            print("304: không thay đổi")
+
+            # Bỏ 90001, epoch mới hơn cho 90002, thêm 90006
+            serve([_selfcheck_tle(90002, 0.5)] + [_selfcheck_tle(norad_id) for norad_id in range(90003, 90007)], now)
+            result = fetch()
+            expected = {'added': 1, 'updated': 1, 'removed': 1, 'unchanged': 3, 'stale': 0}
+            assert result['status'] == 'updated' and all(result[k] == v for k, v in expected.items()), result
+            with open(store_path('SELFCHECK_TLE', 'tle', store_dir), 'r') as f:
+                stored = _split_tle(f.read())
+            assert [norad_id for norad_id, _ in stored] == list(range(90002, 90007)), stored
+            assert stored[0][1][1] == _selfcheck_tle(90002, 0.5).splitlines()[1]
+            print(f"200 sau khi sửa: +{result['added']} mới, ~{result['updated']} cập nhật, "
+                  f"-{result['removed']} bị loại, {result['unchanged']} không đổi")
+        finally:
+            server.shutdown()
+            server.server_close()
+    print("CatalogFetcher hoạt động đúng (200 gộp vào kho, 304, thống kê gộp).")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Tải catalog Celestrak vào kho catalog chuẩn (gộp theo NORAD ID).")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help="Số yêu cầu đồng thời tối đa")
+    parser.add_argument('--force', action='store_true', help="Bỏ qua ETag/Last-Modified, luôn tải toàn bộ")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="Chế độ cũ: tải tuần tự và ghi file mới có timestamp cho mỗi nguồn")
+    parser.add_argument('--self-check', action='store_true',
+                        help="Tự kiểm tra CatalogFetcher với máy chủ HTTP cục bộ (không tải từ Celestrak)")
+    return parser.parse_args()
+
 def main_downloader():
+    args = parse_args()
+    if args.self_check:
+        main_fetcher_selfcheck()
+        return
     print("BẮT ĐẦU TẢI DỮ LIỆU TỪ CELESTRAK...")
     
-    for name, params in DATA_SOURCES.items():
-        download_and_save_data(name, params['url'], params['format'])
-        # Tạm dừng 2 giây giữa các lần tải để tuân thủ quy tắc sử dụng
-        time.sleep(2) 
+    if args.snapshot:
+        for name, params in DATA_SOURCES.items():
+            download_and_save_data(name, params['url'], params['format'])
+            # Tạm dừng 2 giây giữa các lần tải để tuân thủ quy tắc sử dụng
+            time.sleep(2)
+        print("\nQuá trình tải dữ liệu hoàn tất.")
+        return
+    
+    for result in fetch_catalogs(max_concurrency=args.concurrency, force=args.force):
+        status = result['status']
+        if status == 'updated':
+            print(f"-> {result['source']}: +{result['added']} mới, ~{result['updated']} cập nhật, "
+                  f"-{result['removed']} bị loại, {result['unchanged']} không đổi ({result['path']})")
+        elif status == 'not_modified':
+            print(f"-> {result['source']}: không thay đổi (304)")
+        elif status in ('blocked', 'skipped'):
+            print(f"LỖI 403: {result['source']} bị chặn/bỏ qua. Vui lòng đợi 2 giờ trước khi thử lại.")
+        else:
+            print(f"LỖI {result['source']}: {result['error']}")
         
     print("\nQuá trình tải dữ liệu hoàn tất.")
 